@@ -0,0 +1,358 @@
+"""Lazily evaluated, memoized analyzer outputs with precise invalidation
+
+PortfolioAnalyzer runs its nine steps in a fixed order, every one of them,
+before anything can be shown. LazyAnalysis exposes the same outputs
+(``holdings``, ``split_adjusted_trades``, ``currency_rates``,
+``historical_prices``, ``portfolio_values``, ``xirr_results``, ...) as
+attributes that are computed on first access, together with only the
+outputs they depend on, and then kept:
+
+    lazy = LazyAnalysis(['Stock_trading_2023.csv', 'Stock_trading_2024.csv'])
+    lazy.holdings          # loads the trades and nets them; no market data without a lot method
+    lazy.stock_splits      # fetches market data for the symbols held in the price window
+    lazy.xirr_results      # adds FX rates and the solve; holdings are reused
+
+Each output records the versions of its inputs when it was computed and is
+recomputed only when one of them has changed since. Some outputs are
+summaries whose value often survives a change upstream: the held symbols,
+or the currencies and start date the FX history needs. When such a summary
+comes out equal to before it keeps its version, so new trades in symbols
+already held refetch no market data, and new trades in known currencies
+leave the FX table alone. A change of lot method rematches the lots only.
+
+``refresh()`` re-reads the input files' fingerprints and moves the price
+window to today, which refetches market data (splits included) once a day;
+the setters change the analyzer options.
+
+Steps are run on the wrapped PortfolioAnalyzer and timed in its run report,
+so ``lazy.run_report`` lists exactly the steps that ran.
+"""
+from collections import Counter
+
+import pandas as pd
+
+from incremental import file_fingerprint
+from lots import CLOSED_LOT_COLUMNS, OPEN_LOT_COLUMNS, add_lot_costs
+from portfolio_analyzer import PortfolioAnalyzer
+
+
+class DependencyGraph:
+    """Memoized values that are recomputed only when the versions of their dependencies change
+
+    Inputs are set with ``set``. Derived values are defined with ``define``
+    and computed by ``get``, which first brings their dependencies up to
+    date. A derived value given a ``same`` comparison keeps its version when
+    it recomputes to a value ``same`` judges equal, so its dependents stay
+    valid.
+    """
+
+    def __init__(self):
+        self._nodes = {}
+        self.computations = Counter()
+
+    def set(self, name, value):
+        """Set input ``name``; dependents are invalidated only if the value is different"""
+        node = self._nodes.get(name)
+        if node is None:
+            self._nodes[name] = {'deps': (), 'compute': None, 'value': value, 'version': 1}
+        elif not _equal(node['value'], value):
+            node['value'] = value
+            node['version'] += 1
+
+    def define(self, name, deps, compute, same=None):
+        """Derive ``name`` as ``compute(*dependency values)``"""
+        self._nodes[name] = {'deps': tuple(deps), 'compute': compute, 'same': same, 'value': None,
+                             'version': 0, 'dep_versions': None}
+
+    def get(self, name):
+        node = self._nodes[name]
+        if node['compute'] is None:
+            return node['value']
+        values = [self.get(dep) for dep in node['deps']]
+        versions = tuple(self._nodes[dep]['version'] for dep in node['deps'])
+        if versions == node['dep_versions']:
+            return node['value']
+
+        value = node['compute'](*values)
+        self.computations[name] += 1
+        if node['version'] == 0 or node['same'] is None or not node['same'](node['value'], value):
+            node['value'] = value
+            node['version'] += 1
+        node['dep_versions'] = versions
+        return node['value']
+
+    def is_current(self, name):
+        """Whether ``get(name)`` would return its memoized value without computing anything"""
+        node = self._nodes[name]
+        if node['compute'] is None:
+            return True
+        return (node['dep_versions'] is not None
+                and all(self.is_current(dep) for dep in node['deps'])
+                and node['dep_versions'] == tuple(self._nodes[dep]['version'] for dep in node['deps']))
+
+    def invalidate(self, name):
+        """Force ``name`` to be recomputed on its next access"""
+        node = self._nodes[name]
+        if node['compute'] is not None:
+            node['dep_versions'] = None
+
+
+def _equal(a, b):
+    try:
+        return bool(a == b)
+    except (TypeError, ValueError):
+        # Frames and arrays do not compare to a single bool
+        return a is b
+
+
+class LazyAnalysis:
+    """The outputs of PortfolioAnalyzer computed on demand from ``file_paths``"""
+
+    def __init__(self, file_paths, analyzer=None, chunksize=None):
+        self.analyzer = analyzer if analyzer is not None else PortfolioAnalyzer()
+        self.chunksize = chunksize
+        self._fingerprints = {}
+        graph = self.graph = DependencyGraph()
+
+        graph.set('files', self._file_hashes(file_paths))
+        graph.set('price_window', self.analyzer.price_window())
+        graph.set('lot_method', self.analyzer.lot_method)
+        graph.set('reporting_currencies', tuple(self.analyzer.reporting_currencies))
+        graph.set('fx_rates', self.analyzer.fx_rates)
+
+        graph.define('trades', ['files'], self._load_trades)
+        graph.define('holdings', ['trades'], self._holdings)
+        graph.define('symbols', ['trades', 'holdings', 'price_window'], self._symbols, same=_equal)
+        # Splits are fetched with the prices, so they are refreshed whenever the window moves
+        graph.define('market_data', ['symbols', 'price_window'], self._market_data)
+        graph.define('split_adjusted_trades', ['trades', 'market_data'], self._apply_splits)
+        graph.define('lots', ['split_adjusted_trades', 'market_data', 'lot_method'], self._lots)
+        graph.define('lot_holdings', ['holdings', 'lots'], self._lot_holdings)
+        graph.define('fx_needs', ['trades', 'reporting_currencies'], self._fx_needs, same=_equal)
+        # FX rates run to the end of the price window, so prices of later days have rates
+        graph.define('currency_rates', ['fx_needs', 'fx_rates', 'price_window'], self._currency_rates)
+        graph.define('priced_trades', ['trades', 'currency_rates', 'reporting_currencies'], self._priced_trades)
+        graph.define('portfolio_values', ['split_adjusted_trades', 'market_data', 'currency_rates',
+                                          'reporting_currencies'], self._portfolio_values)
+        graph.define('xirr', ['trades', 'split_adjusted_trades', 'holdings', 'market_data', 'currency_rates'],
+                     self._xirr)
+        graph.define('xirr_history', ['split_adjusted_trades', 'market_data', 'currency_rates', 'portfolio_values'],
+                     self._xirr_history)
+
+    # Inputs
+
+    def _file_hashes(self, file_paths):
+        self._fingerprints = {path: file_fingerprint(path, self._fingerprints.get(path)) for path in file_paths}
+        return {path: fingerprint['sha256'] for path, fingerprint in self._fingerprints.items()}
+
+    def refresh(self, file_paths=None):
+        """Re-read the input files (or switch to ``file_paths``) and move the price window to today
+
+        Unchanged contents on the same day invalidate nothing.
+        """
+        if file_paths is None:
+            file_paths = list(self.graph.get('files'))
+        self.graph.set('files', self._file_hashes(file_paths))
+        self.graph.set('price_window', self.analyzer.price_window())
+
+    def set_lot_method(self, lot_method):
+        self.graph.set('lot_method', lot_method)
+
+    def set_reporting_currencies(self, currencies):
+        self.graph.set('reporting_currencies', tuple(currencies))
+
+    def set_fx_rates(self, fx_rates):
+        self.graph.set('fx_rates', fx_rates)
+
+    # Outputs, under the analyzer's attribute names
+
+    @property
+    def all_trades(self):
+        return self.graph.get('trades')
+
+    @property
+    def holdings(self):
+        # Lot costs come from the lot ledger, which needs market data for the splits
+        return self.graph.get('lot_holdings' if self.graph.get('lot_method') else 'holdings')
+
+    @property
+    def stock_splits(self):
+        return self.graph.get('market_data')[0]
+
+    @property
+    def historical_prices(self):
+        return self.graph.get('market_data')[1]
+
+    @property
+    def split_adjusted_trades(self):
+        return self.graph.get('split_adjusted_trades')
+
+    @property
+    def closed_lots(self):
+        return self.graph.get('lots')[0]
+
+    @property
+    def open_lots(self):
+        return self.graph.get('lots')[1]
+
+    @property
+    def profit_and_loss(self):
+        return self.graph.get('lots')[2]
+
+    @property
+    def currency_rates(self):
+        return self.graph.get('currency_rates')
+
+    @property
+    def priced_trades(self):
+        """The trade table with Price_<CUR> and Fee_<CUR> columns per reporting currency"""
+        return self.graph.get('priced_trades')[0]
+
+    @property
+    def fees_by_symbol(self):
+        return self.graph.get('priced_trades')[1]
+
+    @property
+    def fees_by_period(self):
+        return self.graph.get('priced_trades')[2]
+
+    @property
+    def portfolio_values(self):
+        return self.graph.get('portfolio_values')[0]
+
+    @property
+    def risk(self):
+        return self.graph.get('portfolio_values')[1]
+
+    @property
+    def xirr_results(self):
+        return self.graph.get('xirr')[0]
+
+    @property
+    def portfolio_xirr(self):
+        return self.graph.get('xirr')[1]
+
+    @property
+    def xirr_history(self):
+        return self.graph.get('xirr_history')[0]
+
+    @property
+    def return_history(self):
+        return self.graph.get('xirr_history')[1]
+
+    @property
+    def run_report(self):
+        return self.analyzer.run_report
+
+    def get_latest_news(self, symbol):
+        return self.analyzer.get_latest_news(symbol)
+
+    # Steps, each run on the analyzer with its inputs set from the graph
+
+    def _load_trades(self, files):
+        analyzer = self.analyzer
+        analyzer.trades_data = []
+        with analyzer.run_report.stage('load_trades'):
+            analyzer.load_trade_data(list(files), chunksize=self.chunksize)
+        return analyzer.all_trades
+
+    def _holdings(self, trades):
+        analyzer = self.analyzer
+        analyzer.all_trades = trades
+        if trades.empty:
+            return pd.DataFrame(columns=['Symbol', 'Currency', 'Quantity', 'Avg_Price', 'Total_Invested'])
+        with analyzer.run_report.stage('holdings'):
+            analyzer.create_master_holdings_list()
+        return analyzer.holdings
+
+    def _symbols(self, trades, holdings, price_window):
+        """Symbols held at some point in the price window"""
+        analyzer = self.analyzer
+        analyzer.all_trades, analyzer.holdings = trades, holdings
+        if trades.empty:
+            return ()
+        return tuple(analyzer.valuation_symbols(price_window))
+
+    def _market_data(self, symbols, price_window):
+        analyzer = self.analyzer
+        analyzer.stock_splits, analyzer.historical_prices = {}, {}
+        with analyzer.run_report.stage('stock_splits'):
+            analyzer.fetch_market_data(symbols, window=price_window)
+        return analyzer.stock_splits, analyzer.historical_prices
+
+    def _apply_splits(self, trades, market_data):
+        analyzer = self.analyzer
+        analyzer.all_trades, analyzer.stock_splits = trades, market_data[0]
+        with analyzer.run_report.stage('apply_splits'):
+            analyzer.apply_stock_splits()
+        return analyzer.split_adjusted_trades
+
+    def _lots(self, split_adjusted_trades, market_data, lot_method):
+        analyzer = self.analyzer
+        analyzer.split_adjusted_trades, analyzer.historical_prices = split_adjusted_trades, market_data[1]
+        analyzer.lot_method = lot_method
+        analyzer.closed_lots = pd.DataFrame(columns=CLOSED_LOT_COLUMNS)
+        analyzer.open_lots = pd.DataFrame(columns=OPEN_LOT_COLUMNS)
+        analyzer.profit_and_loss = pd.DataFrame()
+        with analyzer.run_report.stage('apply_splits'):
+            analyzer.compute_lots()
+        return analyzer.closed_lots, analyzer.open_lots, analyzer.profit_and_loss
+
+    def _lot_holdings(self, holdings, lots):
+        if lots[2].empty:
+            return holdings
+        return add_lot_costs(holdings, lots[2])
+
+    def _fx_needs(self, trades, reporting_currencies):
+        """The currencies and first date the FX table has to cover"""
+        currencies = set(reporting_currencies)
+        start = None
+        if not trades.empty:
+            currencies |= set(trades['Currency'].astype(str).unique())
+            start = trades['Date/Time'].min().normalize()
+        return tuple(sorted(currencies)), start
+
+    def _currency_rates(self, fx_needs, fx_rates, price_window):
+        analyzer = self.analyzer
+        analyzer.fx_rates = fx_rates
+        currencies, start = fx_needs
+        with analyzer.run_report.stage('currency_rates'):
+            _, end = price_window
+            return analyzer.load_currency_rates(set(currencies), start or end, end)
+
+    def _priced_trades(self, trades, currency_rates, reporting_currencies):
+        analyzer = self.analyzer
+        # A shallow copy: the step adds columns, which must not reach the plain trade table
+        analyzer.all_trades = trades.copy(deep=False)
+        analyzer.currency_rates, analyzer.reporting_currencies = currency_rates, list(reporting_currencies)
+        with analyzer.run_report.stage('transaction_prices'):
+            analyzer.compute_transaction_prices_in_currencies()
+        priced, analyzer.all_trades = analyzer.all_trades, trades
+        return priced, analyzer.fees_by_symbol, analyzer.fees_by_period
+
+    def _portfolio_values(self, split_adjusted_trades, market_data, currency_rates, reporting_currencies):
+        analyzer = self.analyzer
+        analyzer.split_adjusted_trades, analyzer.historical_prices = split_adjusted_trades, market_data[1]
+        analyzer.currency_rates, analyzer.reporting_currencies = currency_rates, list(reporting_currencies)
+        analyzer.portfolio_values, analyzer.risk = pd.DataFrame(), None
+        with analyzer.run_report.stage('portfolio_values'):
+            analyzer.compute_portfolio_values()
+        return analyzer.portfolio_values, analyzer.risk
+
+    def _xirr(self, trades, split_adjusted_trades, holdings, market_data, currency_rates):
+        analyzer = self.analyzer
+        analyzer.all_trades, analyzer.split_adjusted_trades, analyzer.holdings = trades, split_adjusted_trades, holdings
+        analyzer.historical_prices, analyzer.currency_rates = market_data[1], currency_rates
+        if trades.empty:
+            return {}, float('nan')
+        with analyzer.run_report.stage('xirr'):
+            analyzer.compute_xirr()
+        return analyzer.xirr_results, analyzer.portfolio_xirr
+
+    def _xirr_history(self, split_adjusted_trades, market_data, currency_rates, portfolio_values):
+        analyzer = self.analyzer
+        analyzer.split_adjusted_trades, analyzer.historical_prices = split_adjusted_trades, market_data[1]
+        analyzer.currency_rates, analyzer.portfolio_values = currency_rates, portfolio_values[0]
+        with analyzer.run_report.stage('xirr'):
+            analyzer.compute_xirr_history()
+        return analyzer.xirr_history, analyzer.return_history
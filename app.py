@@ -3,6 +3,9 @@ import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 from portfolio_analyzer import PortfolioAnalyzer
+from app_common import (collect_finished_job, current_job, show_analysis_job, show_job_timing,
+                        show_performance_history, show_price_cache_stats, show_risk, show_run_report,
+                        start_analysis_job, waiting)
 import numpy as np
 from datetime import datetime
 import time
@@ -174,6 +177,387 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+def show_dashboard(analyzer, ready=lambda stage: True):
+    """Every dashboard section, drawing only those whose steps ``ready(stage)`` says are done"""
+    # Overview Section with modern cards
+    st.markdown("""
+    <div style="background: linear-gradient(135deg, #1e293b 0%, #334155 100%); 
+                padding: 2rem; border-radius: 1rem; margin-bottom: 2rem; border: 1px solid #475569;">
+        <h2 style="color: #f8fafc; margin-bottom: 1.5rem; text-align: center;">📊 Portfolio Overview</h2>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # Modern metric cards
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        total_holdings = len(analyzer.holdings) if ready('holdings') else '...'
+        st.markdown(f"""
+        <div style="background: linear-gradient(135deg, #6366f1 0%, #8b5cf6 100%); 
+                    padding: 1.5rem; border-radius: 1rem; text-align: center; color: white;">
+            <h3 style="margin: 0; font-size: 2rem; font-weight: 800;">{total_holdings}</h3>
+            <p style="margin: 0; opacity: 0.9;">Total Holdings</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col2:
+        total_trades = len(analyzer.all_trades) if ready('load_trades') else '...'
+        st.markdown(f"""
+        <div style="background: linear-gradient(135deg, #10b981 0%, #059669 100%); 
+                    padding: 1.5rem; border-radius: 1rem; text-align: center; color: white;">
+            <h3 style="margin: 0; font-size: 2rem; font-weight: 800;">{total_trades}</h3>
+            <p style="margin: 0; opacity: 0.9;">Total Trades</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col3:
+        if hasattr(analyzer, 'portfolio_values') and not analyzer.portfolio_values.empty:
+            latest_value = analyzer.portfolio_values['Value_USD'].iloc[-1]
+            st.markdown(f"""
+            <div style="background: linear-gradient(135deg, #f59e0b 0%, #d97706 100%); 
+                        padding: 1.5rem; border-radius: 1rem; text-align: center; color: white;">
+                <h3 style="margin: 0; font-size: 1.5rem; font-weight: 800;">${latest_value:,.0f}</h3>
+                <p style="margin: 0; opacity: 0.9;">Portfolio Value</p>
+            </div>
+            """, unsafe_allow_html=True)
+        else:
+            st.markdown("""
+            <div style="background: linear-gradient(135deg, #6b7280 0%, #4b5563 100%); 
+                        padding: 1.5rem; border-radius: 1rem; text-align: center; color: white;">
+                <h3 style="margin: 0; font-size: 1.5rem; font-weight: 800;">Calculating...</h3>
+                <p style="margin: 0; opacity: 0.9;">Portfolio Value</p>
+            </div>
+            """, unsafe_allow_html=True)
+    
+    with col4:
+        if hasattr(analyzer, 'xirr_results') and analyzer.xirr_results:
+            avg_xirr = np.mean(list(analyzer.xirr_results.values())) * 100
+            color = "#10b981" if avg_xirr > 0 else "#ef4444"
+            st.markdown(f"""
+            <div style="background: linear-gradient(135deg, {color} 0%, {color}dd 100%); 
+                        padding: 1.5rem; border-radius: 1rem; text-align: center; color: white;">
+                <h3 style="margin: 0; font-size: 2rem; font-weight: 800;">{avg_xirr:.1f}%</h3>
+                <p style="margin: 0; opacity: 0.9;">Avg XIRR</p>
+            </div>
+            """, unsafe_allow_html=True)
+    
+    # Holdings Table with modern styling
+    st.markdown("""
+    <div style="background: linear-gradient(135deg, #1e293b 0%, #334155 100%); 
+                padding: 2rem; border-radius: 1rem; margin-bottom: 2rem; border: 1px solid #475569;">
+        <h2 style="color: #f8fafc; margin-bottom: 1.5rem; text-align: center;">💼 Current Holdings</h2>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    if not ready('holdings'):
+        waiting("holdings")
+    elif not analyzer.holdings.empty:
+        holdings_df = analyzer.holdings.copy()
+        
+        # Add current prices and values
+        current_prices = []
+        current_values = []
+        
+        for _, holding in holdings_df.iterrows():
+            symbol = holding['Symbol']
+            if symbol in analyzer.historical_prices and not analyzer.historical_prices[symbol].empty:
+                current_price = analyzer.historical_prices[symbol]['Close'].iloc[-1]
+                current_prices.append(current_price)
+                current_values.append(holding['Quantity'] * current_price)
+            else:
+                current_prices.append(0)
+                current_values.append(0)
+        
+        holdings_df['Current_Price'] = current_prices
+        holdings_df['Current_Value'] = current_values
+        holdings_df['Unrealized_PL'] = holdings_df['Current_Value'] - holdings_df['Total_Invested']
+        holdings_df['Unrealized_PL_Pct'] = (holdings_df['Unrealized_PL'] / holdings_df['Total_Invested']) * 100
+        
+        # Format the display; values need the prices from step 3
+        columns = ['Symbol', 'Currency', 'Quantity', 'Avg_Price', 'Current_Price',
+                   'Total_Invested', 'Current_Value', 'Unrealized_PL', 'Unrealized_PL_Pct']
+        if not ready('stock_splits'):
+            columns = ['Symbol', 'Currency', 'Quantity', 'Avg_Price', 'Total_Invested']
+            waiting("current prices")
+        display_df = holdings_df[columns].copy()
+        
+        formats = {'Avg_Price': "${:.2f}", 'Current_Price': "${:.2f}", 'Total_Invested': "${:,.2f}",
+                   'Current_Value': "${:,.2f}", 'Unrealized_PL': "${:,.2f}", 'Unrealized_PL_Pct': "{:.2f}%"}
+        for column in columns:
+            if column in formats:
+                display_df[column] = display_df[column].apply(formats[column].format)
+        
+        # Modern dataframe styling
+        st.markdown("""
+        <div style="background: linear-gradient(135deg, #1e293b 0%, #334155 100%); 
+                    padding: 1.5rem; border-radius: 1rem; border: 1px solid #475569;">
+        """, unsafe_allow_html=True)
+        st.dataframe(display_df, use_container_width=True)
+        st.markdown("</div>", unsafe_allow_html=True)
+    
+    # Portfolio Performance Chart with modern styling
+    st.markdown("""
+    <div style="background: linear-gradient(135deg, #1e293b 0%, #334155 100%); 
+                padding: 2rem; border-radius: 1rem; margin-bottom: 2rem; border: 1px solid #475569;">
+        <h2 style="color: #f8fafc; margin-bottom: 1.5rem; text-align: center;">📈 Portfolio Performance</h2>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    if not ready('portfolio_values'):
+        waiting("portfolio valuation")
+    elif hasattr(analyzer, 'portfolio_values') and not analyzer.portfolio_values.empty:
+        fig = go.Figure()
+        
+        fig.add_trace(go.Scatter(
+            x=analyzer.portfolio_values['Date'],
+            y=analyzer.portfolio_values['Value_USD'],
+            mode='lines',
+            name='Portfolio Value (USD)',
+            line=dict(color='#6366f1', width=4),
+            fill='tonexty',
+            fillcolor='rgba(99, 102, 241, 0.1)'
+        ))
+        
+        fig.update_layout(
+            title=dict(
+                text="Portfolio Value Over Time",
+                font=dict(size=20, color='#f8fafc')
+            ),
+            xaxis=dict(
+                title="Date",
+                gridcolor='#475569',
+                color='#cbd5e1'
+            ),
+            yaxis=dict(
+                title="Value (USD)",
+                gridcolor='#475569',
+                color='#cbd5e1'
+            ),
+            plot_bgcolor='rgba(0,0,0,0)',
+            paper_bgcolor='rgba(0,0,0,0)',
+            hovermode='x unified',
+            height=500,
+            font=dict(color='#f8fafc')
+        )
+        
+        st.plotly_chart(fig, use_container_width=True)
+        show_risk(getattr(analyzer, 'risk', None))
+    
+    # XIRR Analysis
+    st.header("🎯 XIRR Analysis")
+    
+    if not ready('xirr'):
+        waiting("XIRR")
+    elif hasattr(analyzer, 'portfolio_xirr') and not np.isnan(analyzer.portfolio_xirr):
+        st.metric("Portfolio XIRR (USD)", f"{analyzer.portfolio_xirr * 100:.2f}%")
+    if ready('xirr'):
+        show_performance_history(getattr(analyzer, 'xirr_history', {}), getattr(analyzer, 'return_history', {}))
+    
+    if ready('xirr') and hasattr(analyzer, 'xirr_results') and analyzer.xirr_results:
+        xirr_data = []
+        for symbol, xirr_rate in analyzer.xirr_results.items():
+            xirr_data.append({
+                'Symbol': symbol,
+                'XIRR': xirr_rate * 100
+            })
+        
+        xirr_df = pd.DataFrame(xirr_data)
+        xirr_df = xirr_df.sort_values('XIRR', ascending=False)
+        
+        # Create bar chart
+        fig = px.bar(
+            xirr_df, 
+            x='Symbol', 
+            y='XIRR',
+            title="XIRR by Symbol",
+            color='XIRR',
+            color_continuous_scale='RdYlGn'
+        )
+        
+        fig.update_layout(height=500)
+        st.plotly_chart(fig, use_container_width=True)
+        
+        # XIRR table
+        st.subheader("XIRR Details")
+        xirr_df['XIRR'] = xirr_df['XIRR'].apply(lambda x: f"{x:.2f}%")
+        st.dataframe(xirr_df, use_container_width=True)
+    
+    # Stock Splits Information
+    st.header("📊 Stock Splits")
+    
+    splits_data = []
+    for symbol, splits in analyzer.stock_splits.items():
+        if not splits.empty:
+            for date, ratio in splits.items():
+                splits_data.append({
+                    'Symbol': symbol,
+                    'Split Date': date.strftime('%Y-%m-%d'),
+                    'Split Ratio': f"1:{ratio:.2f}"
+                })
+    
+    if not ready('stock_splits'):
+        waiting("split history")
+    elif splits_data:
+        splits_df = pd.DataFrame(splits_data)
+        st.dataframe(splits_df, use_container_width=True)
+    else:
+        st.info("No stock splits found in the analyzed period.")
+    
+    # News Section
+    st.markdown("""
+    <div style="background: linear-gradient(135deg, #1e293b 0%, #334155 100%); 
+                padding: 2rem; border-radius: 1rem; margin-bottom: 2rem; border: 1px solid #475569;">
+        <h2 style="color: #f8fafc; margin-bottom: 1.5rem; text-align: center;">�� Latest Market News & Analysis</h2>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    if ready('holdings') and not analyzer.holdings.empty:
+        col1, col2 = st.columns([2, 1])
+        
+        with col1:
+            selected_symbol = st.selectbox(
+                "Select a stock symbol to view latest news and analysis:",
+                analyzer.holdings['Symbol'].unique(),
+                help="Choose any stock from your portfolio to get the latest news, market analysis, and trading insights"
+            )
+        
+        with col2:
+            st.markdown("<br>", unsafe_allow_html=True)
+            if st.button("🚀 Get Latest News & Analysis", type="primary", use_container_width=True):
+                with st.spinner("📡 Fetching latest news and market analysis..."):
+                    news = analyzer.get_latest_news(selected_symbol)
+                    
+                    if news:
+                        st.markdown(f"""
+                        <div style="background: linear-gradient(135deg, #10b981 0%, #059669 100%); 
+                                    padding: 1rem; border-radius: 0.75rem; color: white; font-weight: 600; text-align: center; margin-bottom: 1rem;">
+                            ✅ Found {len(news)} news articles and market insights for {selected_symbol}
+                        </div>
+                        """, unsafe_allow_html=True)
+                        
+                        for i, article in enumerate(news[:5]):
+                            # Color code based on publisher and content type
+                            if "Portfolio Analyzer" in article.get('publisher', ''):
+                                if "Technical Analysis" in article.get('title', ''):
+                                    bg_color = "linear-gradient(135deg, #8b5cf6 0%, #7c3aed 100%)"
+                                elif "Performance" in article.get('title', ''):
+                                    bg_color = "linear-gradient(135deg, #f59e0b 0%, #d97706 100%)"
+                                elif "Trend" in article.get('title', ''):
+                                    bg_color = "linear-gradient(135deg, #06b6d4 0%, #0891b2 100%)"
+                                else:
+                                    bg_color = "linear-gradient(135deg, #6366f1 0%, #8b5cf6 100%)"
+                            else:
+                                bg_color = "linear-gradient(135deg, #1e293b 0%, #334155 100%)"
+                            
+                            with st.expander(f"📰 {article.get('title', 'No title')}", expanded=(i==0)):
+                                st.markdown(f"""
+                                <div style="background: {bg_color}; padding: 1.5rem; border-radius: 0.75rem; margin-bottom: 1rem;">
+                                    <p style="margin-bottom: 0.5rem;"><strong>📅 Published:</strong> {article.get('published', 'Unknown')}</p>
+                                    <p style="margin-bottom: 0.5rem;"><strong>📰 Publisher:</strong> {article.get('publisher', 'Unknown')}</p>
+                                    <p style="margin-bottom: 0.5rem;"><strong>📝 Analysis:</strong> {article.get('summary', 'No summary available')}</p>
+                                </div>
+                                """, unsafe_allow_html=True)
+                                
+                                if article.get('link'):
+                                    st.markdown(f"""
+                                    <div style="text-align: center; margin-top: 1rem;">
+                                        <a href="{article['link']}" target="_blank" style="
+                                            background: linear-gradient(135deg, #f59e0b 0%, #d97706 100%);
+                                            color: white;
+                                            padding: 0.75rem 1.5rem;
+                                            border-radius: 0.5rem;
+                                            text-decoration: none;
+                                            font-weight: 600;
+                                            display: inline-block;
+                                            transition: all 0.3s ease;">
+                                            🔗 Read Full Article & Charts
+                                        </a>
+                                    </div>
+                                    """, unsafe_allow_html=True)
+                    else:
+                        st.markdown("""
+                        <div style="background: linear-gradient(135deg, #ef4444 0%, #dc2626 100%); 
+                                    padding: 1rem; border-radius: 0.75rem; color: white; font-weight: 600; text-align: center;">
+                            ❌ No news available for this symbol
+                        </div>
+                        """, unsafe_allow_html=True)
+        
+        # Add enhanced news tips
+        st.markdown("""
+        <div style="background: linear-gradient(135deg, rgba(99, 102, 241, 0.1) 0%, rgba(139, 92, 246, 0.1) 100%); 
+                    padding: 1.5rem; border-radius: 0.75rem; border: 1px solid #6366f1; margin-top: 1rem;">
+            <h4 style="color: #6366f1; margin-bottom: 1rem;">💡 Enhanced News & Analysis Features:</h4>
+            <ul style="color: #cbd5e1; margin: 0;">
+                <li>📰 <strong>Real-time news</strong> from Yahoo Finance and other sources</li>
+                <li>📊 <strong>Price-based analysis</strong> with technical insights</li>
+                <li>📈 <strong>Weekly & monthly trends</strong> for comprehensive analysis</li>
+                <li>🔗 <strong>Direct links</strong> to Yahoo Finance charts and data</li>
+                <li>📅 <strong>Publication dates</strong> and detailed summaries</li>
+                <li>🎯 <strong>Contextual insights</strong> based on your portfolio data</li>
+            </ul>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    # Trade History
+    st.header("📋 Trade History")
+    
+    if ready('load_trades') and not analyzer.all_trades.empty:
+        # Filter options
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            selected_symbol_filter = st.selectbox(
+                "Filter by Symbol:",
+                ['All'] + list(analyzer.all_trades['Symbol'].unique())
+            )
+        
+        with col2:
+            selected_currency_filter = st.selectbox(
+                "Filter by Currency:",
+                ['All'] + list(analyzer.all_trades['Currency'].unique())
+            )
+        
+        # Apply filters
+        filtered_trades = analyzer.all_trades.copy()
+        
+        if selected_symbol_filter != 'All':
+            filtered_trades = filtered_trades[filtered_trades['Symbol'] == selected_symbol_filter]
+        
+        if selected_currency_filter != 'All':
+            filtered_trades = filtered_trades[filtered_trades['Currency'] == selected_currency_filter]
+        
+        # Display trades
+        display_trades = filtered_trades[['Date/Time', 'Symbol', 'Currency', 'Quantity', 'T. Price', 'C. Price', 'Proceeds']].copy()
+        display_trades['Date/Time'] = display_trades['Date/Time'].dt.strftime('%Y-%m-%d %H:%M')
+        display_trades['T. Price'] = display_trades['T. Price'].apply(lambda x: f"${x:.2f}")
+        display_trades['C. Price'] = display_trades['C. Price'].apply(lambda x: f"${x:.2f}")
+        display_trades['Proceeds'] = display_trades['Proceeds'].apply(lambda x: f"${x:,.2f}")
+        
+        st.dataframe(display_trades, use_container_width=True)
+    
+    # Currency Analysis
+    st.header("💱 Currency Analysis")
+    
+    if ready('load_trades') and not analyzer.all_trades.empty:
+        currency_summary = analyzer.all_trades.groupby('Currency', observed=True).agg({
+            'Proceeds': 'sum',
+            'Symbol': 'count'
+        }).reset_index()
+        
+        currency_summary.columns = ['Currency', 'Total_Proceeds', 'Trade_Count']
+        currency_summary['Total_Proceeds'] = currency_summary['Total_Proceeds'].apply(lambda x: f"${x:,.2f}")
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.subheader("Trades by Currency")
+            fig = px.pie(currency_summary, values='Trade_Count', names='Currency', title="Trade Distribution by Currency")
+            st.plotly_chart(fig, use_container_width=True)
+        
+        with col2:
+            st.subheader("Currency Summary")
+            st.dataframe(currency_summary, use_container_width=True)
+
 def main():
     # Header with modern gradient
     st.markdown('<h1 class="main-header">🚀 Portfolio Analyzer Pro</h1>', unsafe_allow_html=True)
@@ -212,399 +596,37 @@ def main():
         
         # Modern analysis button
         st.markdown("###  Analysis")
-        if st.button(" Run Portfolio Analysis", type="primary", use_container_width=True):
-            with st.spinner("🔄 Analyzing portfolio data..."):
-                try:
-                    # Initialize analyzer
-                    analyzer = PortfolioAnalyzer()
-                    
-                    # Run analysis
-                    file_paths = ['Stock_trading_2023.csv', 'Stock_trading_2024.csv', 'Stock_trading_2025.csv']
-                    analyzer.run_complete_analysis(file_paths)
-                    
-                    # Store in session state
-                    st.session_state.analyzer = analyzer
-                    st.session_state.analysis_complete = True
-                    
-                    st.markdown("""
-                    <div style="background: linear-gradient(135deg, #10b981 0%, #059669 100%); 
-                                padding: 1rem; border-radius: 0.75rem; color: white; font-weight: 600; text-align: center;">
-                        ✅ Analysis completed successfully!
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    # Force rerun to show the main content
-                    st.rerun()
-                    
-                except Exception as e:
-                    st.error(f"Error during analysis: {str(e)}")
-                    st.session_state.analysis_complete = False
-    
-    # Main content
-    if 'analysis_complete' in st.session_state and st.session_state.analysis_complete and hasattr(st.session_state, 'analyzer'):
-        analyzer = st.session_state.analyzer
-        
-        # Overview Section with modern cards
-        st.markdown("""
-        <div style="background: linear-gradient(135deg, #1e293b 0%, #334155 100%); 
-                    padding: 2rem; border-radius: 1rem; margin-bottom: 2rem; border: 1px solid #475569;">
-            <h2 style="color: #f8fafc; margin-bottom: 1.5rem; text-align: center;">📊 Portfolio Overview</h2>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        # Modern metric cards
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            total_holdings = len(analyzer.holdings)
-            st.markdown(f"""
-            <div style="background: linear-gradient(135deg, #6366f1 0%, #8b5cf6 100%); 
-                        padding: 1.5rem; border-radius: 1rem; text-align: center; color: white;">
-                <h3 style="margin: 0; font-size: 2rem; font-weight: 800;">{total_holdings}</h3>
-                <p style="margin: 0; opacity: 0.9;">Total Holdings</p>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with col2:
-            total_trades = len(analyzer.all_trades)
-            st.markdown(f"""
-            <div style="background: linear-gradient(135deg, #10b981 0%, #059669 100%); 
-                        padding: 1.5rem; border-radius: 1rem; text-align: center; color: white;">
-                <h3 style="margin: 0; font-size: 2rem; font-weight: 800;">{total_trades}</h3>
-                <p style="margin: 0; opacity: 0.9;">Total Trades</p>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with col3:
-            if hasattr(analyzer, 'portfolio_values') and not analyzer.portfolio_values.empty:
-                latest_value = analyzer.portfolio_values['Value_USD'].iloc[-1]
-                st.markdown(f"""
-                <div style="background: linear-gradient(135deg, #f59e0b 0%, #d97706 100%); 
-                            padding: 1.5rem; border-radius: 1rem; text-align: center; color: white;">
-                    <h3 style="margin: 0; font-size: 1.5rem; font-weight: 800;">${latest_value:,.0f}</h3>
-                    <p style="margin: 0; opacity: 0.9;">Portfolio Value</p>
-                </div>
-                """, unsafe_allow_html=True)
-            else:
-                st.markdown("""
-                <div style="background: linear-gradient(135deg, #6b7280 0%, #4b5563 100%); 
-                            padding: 1.5rem; border-radius: 1rem; text-align: center; color: white;">
-                    <h3 style="margin: 0; font-size: 1.5rem; font-weight: 800;">Calculating...</h3>
-                    <p style="margin: 0; opacity: 0.9;">Portfolio Value</p>
-                </div>
-                """, unsafe_allow_html=True)
-        
-        with col4:
-            if hasattr(analyzer, 'xirr_results') and analyzer.xirr_results:
-                avg_xirr = np.mean(list(analyzer.xirr_results.values())) * 100
-                color = "#10b981" if avg_xirr > 0 else "#ef4444"
-                st.markdown(f"""
-                <div style="background: linear-gradient(135deg, {color} 0%, {color}dd 100%); 
-                            padding: 1.5rem; border-radius: 1rem; text-align: center; color: white;">
-                    <h3 style="margin: 0; font-size: 2rem; font-weight: 800;">{avg_xirr:.1f}%</h3>
-                    <p style="margin: 0; opacity: 0.9;">Avg XIRR</p>
-                </div>
-                """, unsafe_allow_html=True)
-        
-        # Holdings Table with modern styling
-        st.markdown("""
-        <div style="background: linear-gradient(135deg, #1e293b 0%, #334155 100%); 
-                    padding: 2rem; border-radius: 1rem; margin-bottom: 2rem; border: 1px solid #475569;">
-            <h2 style="color: #f8fafc; margin-bottom: 1.5rem; text-align: center;">💼 Current Holdings</h2>
-        </div>
-        """, unsafe_allow_html=True)
+        collect_finished_job()
+        running = current_job() is not None
+        if st.button(" Run Portfolio Analysis", type="primary", use_container_width=True, disabled=running):
+            # Run analysis in the background, or reuse another session's result for the same files today
+            file_paths = ['Stock_trading_2023.csv', 'Stock_trading_2024.csv', 'Stock_trading_2025.csv']
+            start_analysis_job(file_paths, incremental=True)
+            st.session_state.job_message = None
+            st.rerun()
         
-        if not analyzer.holdings.empty:
-            holdings_df = analyzer.holdings.copy()
-            
-            # Add current prices and values
-            current_prices = []
-            current_values = []
-            
-            for _, holding in holdings_df.iterrows():
-                symbol = holding['Symbol']
-                if symbol in analyzer.historical_prices and not analyzer.historical_prices[symbol].empty:
-                    current_price = analyzer.historical_prices[symbol]['Close'].iloc[-1]
-                    current_prices.append(current_price)
-                    current_values.append(holding['Quantity'] * current_price)
-                else:
-                    current_prices.append(0)
-                    current_values.append(0)
-            
-            holdings_df['Current_Price'] = current_prices
-            holdings_df['Current_Value'] = current_values
-            holdings_df['Unrealized_PL'] = holdings_df['Current_Value'] - holdings_df['Total_Invested']
-            holdings_df['Unrealized_PL_Pct'] = (holdings_df['Unrealized_PL'] / holdings_df['Total_Invested']) * 100
-            
-            # Format the display
-            display_df = holdings_df[['Symbol', 'Currency', 'Quantity', 'Avg_Price', 'Current_Price', 
-                                   'Total_Invested', 'Current_Value', 'Unrealized_PL', 'Unrealized_PL_Pct']].copy()
-            
-            display_df['Total_Invested'] = display_df['Total_Invested'].apply(lambda x: f"${x:,.2f}")
-            display_df['Current_Value'] = display_df['Current_Value'].apply(lambda x: f"${x:,.2f}")
-            display_df['Unrealized_PL'] = display_df['Unrealized_PL'].apply(lambda x: f"${x:,.2f}")
-            display_df['Unrealized_PL_Pct'] = display_df['Unrealized_PL_Pct'].apply(lambda x: f"{x:.2f}%")
-            display_df['Avg_Price'] = display_df['Avg_Price'].apply(lambda x: f"${x:.2f}")
-            display_df['Current_Price'] = display_df['Current_Price'].apply(lambda x: f"${x:.2f}")
-            
-            # Modern dataframe styling
+        if running:
+            st.info("🔄 Analysis running in the background...")
+        elif st.session_state.get('job_message'):
+            st.error(st.session_state.job_message)
+        elif st.session_state.get('analysis_complete'):
             st.markdown("""
-            <div style="background: linear-gradient(135deg, #1e293b 0%, #334155 100%); 
-                        padding: 1.5rem; border-radius: 1rem; border: 1px solid #475569;">
-            """, unsafe_allow_html=True)
-            st.dataframe(display_df, use_container_width=True)
-            st.markdown("</div>", unsafe_allow_html=True)
-        
-        # Portfolio Performance Chart with modern styling
-        st.markdown("""
-        <div style="background: linear-gradient(135deg, #1e293b 0%, #334155 100%); 
-                    padding: 2rem; border-radius: 1rem; margin-bottom: 2rem; border: 1px solid #475569;">
-            <h2 style="color: #f8fafc; margin-bottom: 1.5rem; text-align: center;">📈 Portfolio Performance</h2>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        if hasattr(analyzer, 'portfolio_values') and not analyzer.portfolio_values.empty:
-            fig = go.Figure()
-            
-            fig.add_trace(go.Scatter(
-                x=analyzer.portfolio_values['Date'],
-                y=analyzer.portfolio_values['Value_USD'],
-                mode='lines',
-                name='Portfolio Value (USD)',
-                line=dict(color='#6366f1', width=4),
-                fill='tonexty',
-                fillcolor='rgba(99, 102, 241, 0.1)'
-            ))
-            
-            fig.update_layout(
-                title=dict(
-                    text="Portfolio Value Over Time",
-                    font=dict(size=20, color='#f8fafc')
-                ),
-                xaxis=dict(
-                    title="Date",
-                    gridcolor='#475569',
-                    color='#cbd5e1'
-                ),
-                yaxis=dict(
-                    title="Value (USD)",
-                    gridcolor='#475569',
-                    color='#cbd5e1'
-                ),
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-                hovermode='x unified',
-                height=500,
-                font=dict(color='#f8fafc')
-            )
-            
-            st.plotly_chart(fig, use_container_width=True)
-        
-        # XIRR Analysis
-        st.header("🎯 XIRR Analysis")
-        
-        if hasattr(analyzer, 'xirr_results') and analyzer.xirr_results:
-            xirr_data = []
-            for symbol, xirr_rate in analyzer.xirr_results.items():
-                xirr_data.append({
-                    'Symbol': symbol,
-                    'XIRR': xirr_rate * 100
-                })
-            
-            xirr_df = pd.DataFrame(xirr_data)
-            xirr_df = xirr_df.sort_values('XIRR', ascending=False)
-            
-            # Create bar chart
-            fig = px.bar(
-                xirr_df, 
-                x='Symbol', 
-                y='XIRR',
-                title="XIRR by Symbol",
-                color='XIRR',
-                color_continuous_scale='RdYlGn'
-            )
-            
-            fig.update_layout(height=500)
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # XIRR table
-            st.subheader("XIRR Details")
-            xirr_df['XIRR'] = xirr_df['XIRR'].apply(lambda x: f"{x:.2f}%")
-            st.dataframe(xirr_df, use_container_width=True)
-        
-        # Stock Splits Information
-        st.header("📊 Stock Splits")
-        
-        splits_data = []
-        for symbol, splits in analyzer.stock_splits.items():
-            if not splits.empty:
-                for date, ratio in splits.items():
-                    splits_data.append({
-                        'Symbol': symbol,
-                        'Split Date': date.strftime('%Y-%m-%d'),
-                        'Split Ratio': f"1:{ratio:.2f}"
-                    })
-        
-        if splits_data:
-            splits_df = pd.DataFrame(splits_data)
-            st.dataframe(splits_df, use_container_width=True)
-        else:
-            st.info("No stock splits found in the analyzed period.")
-        
-        # News Section
-        st.markdown("""
-        <div style="background: linear-gradient(135deg, #1e293b 0%, #334155 100%); 
-                    padding: 2rem; border-radius: 1rem; margin-bottom: 2rem; border: 1px solid #475569;">
-            <h2 style="color: #f8fafc; margin-bottom: 1.5rem; text-align: center;">�� Latest Market News & Analysis</h2>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        if not analyzer.holdings.empty:
-            col1, col2 = st.columns([2, 1])
-            
-            with col1:
-                selected_symbol = st.selectbox(
-                    "Select a stock symbol to view latest news and analysis:",
-                    analyzer.holdings['Symbol'].unique(),
-                    help="Choose any stock from your portfolio to get the latest news, market analysis, and trading insights"
-                )
-            
-            with col2:
-                st.markdown("<br>", unsafe_allow_html=True)
-                if st.button("🚀 Get Latest News & Analysis", type="primary", use_container_width=True):
-                    with st.spinner("📡 Fetching latest news and market analysis..."):
-                        news = analyzer.get_latest_news(selected_symbol)
-                        
-                        if news:
-                            st.markdown(f"""
-                            <div style="background: linear-gradient(135deg, #10b981 0%, #059669 100%); 
-                                        padding: 1rem; border-radius: 0.75rem; color: white; font-weight: 600; text-align: center; margin-bottom: 1rem;">
-                                ✅ Found {len(news)} news articles and market insights for {selected_symbol}
-                            </div>
-                            """, unsafe_allow_html=True)
-                            
-                            for i, article in enumerate(news[:5]):
-                                # Color code based on publisher and content type
-                                if "Portfolio Analyzer" in article.get('publisher', ''):
-                                    if "Technical Analysis" in article.get('title', ''):
-                                        bg_color = "linear-gradient(135deg, #8b5cf6 0%, #7c3aed 100%)"
-                                    elif "Performance" in article.get('title', ''):
-                                        bg_color = "linear-gradient(135deg, #f59e0b 0%, #d97706 100%)"
-                                    elif "Trend" in article.get('title', ''):
-                                        bg_color = "linear-gradient(135deg, #06b6d4 0%, #0891b2 100%)"
-                                    else:
-                                        bg_color = "linear-gradient(135deg, #6366f1 0%, #8b5cf6 100%)"
-                                else:
-                                    bg_color = "linear-gradient(135deg, #1e293b 0%, #334155 100%)"
-                                
-                                with st.expander(f"📰 {article.get('title', 'No title')}", expanded=(i==0)):
-                                    st.markdown(f"""
-                                    <div style="background: {bg_color}; padding: 1.5rem; border-radius: 0.75rem; margin-bottom: 1rem;">
-                                        <p style="margin-bottom: 0.5rem;"><strong>📅 Published:</strong> {article.get('published', 'Unknown')}</p>
-                                        <p style="margin-bottom: 0.5rem;"><strong>📰 Publisher:</strong> {article.get('publisher', 'Unknown')}</p>
-                                        <p style="margin-bottom: 0.5rem;"><strong>📝 Analysis:</strong> {article.get('summary', 'No summary available')}</p>
-                                    </div>
-                                    """, unsafe_allow_html=True)
-                                    
-                                    if article.get('link'):
-                                        st.markdown(f"""
-                                        <div style="text-align: center; margin-top: 1rem;">
-                                            <a href="{article['link']}" target="_blank" style="
-                                                background: linear-gradient(135deg, #f59e0b 0%, #d97706 100%);
-                                                color: white;
-                                                padding: 0.75rem 1.5rem;
-                                                border-radius: 0.5rem;
-                                                text-decoration: none;
-                                                font-weight: 600;
-                                                display: inline-block;
-                                                transition: all 0.3s ease;">
-                                                🔗 Read Full Article & Charts
-                                            </a>
-                                        </div>
-                                        """, unsafe_allow_html=True)
-                        else:
-                            st.markdown("""
-                            <div style="background: linear-gradient(135deg, #ef4444 0%, #dc2626 100%); 
-                                        padding: 1rem; border-radius: 0.75rem; color: white; font-weight: 600; text-align: center;">
-                                ❌ No news available for this symbol
-                            </div>
-                            """, unsafe_allow_html=True)
-            
-            # Add enhanced news tips
-            st.markdown("""
-            <div style="background: linear-gradient(135deg, rgba(99, 102, 241, 0.1) 0%, rgba(139, 92, 246, 0.1) 100%); 
-                        padding: 1.5rem; border-radius: 0.75rem; border: 1px solid #6366f1; margin-top: 1rem;">
-                <h4 style="color: #6366f1; margin-bottom: 1rem;">💡 Enhanced News & Analysis Features:</h4>
-                <ul style="color: #cbd5e1; margin: 0;">
-                    <li>📰 <strong>Real-time news</strong> from Yahoo Finance and other sources</li>
-                    <li>📊 <strong>Price-based analysis</strong> with technical insights</li>
-                    <li>📈 <strong>Weekly & monthly trends</strong> for comprehensive analysis</li>
-                    <li>🔗 <strong>Direct links</strong> to Yahoo Finance charts and data</li>
-                    <li>📅 <strong>Publication dates</strong> and detailed summaries</li>
-                    <li>🎯 <strong>Contextual insights</strong> based on your portfolio data</li>
-                </ul>
+            <div style="background: linear-gradient(135deg, #10b981 0%, #059669 100%); 
+                        padding: 1rem; border-radius: 0.75rem; color: white; font-weight: 600; text-align: center;">
+                ✅ Analysis completed successfully!
             </div>
             """, unsafe_allow_html=True)
+            show_job_timing()
         
-        # Trade History
-        st.header("📋 Trade History")
-        
-        if not analyzer.all_trades.empty:
-            # Filter options
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                selected_symbol_filter = st.selectbox(
-                    "Filter by Symbol:",
-                    ['All'] + list(analyzer.all_trades['Symbol'].unique())
-                )
-            
-            with col2:
-                selected_currency_filter = st.selectbox(
-                    "Filter by Currency:",
-                    ['All'] + list(analyzer.all_trades['Currency'].unique())
-                )
-            
-            # Apply filters
-            filtered_trades = analyzer.all_trades.copy()
-            
-            if selected_symbol_filter != 'All':
-                filtered_trades = filtered_trades[filtered_trades['Symbol'] == selected_symbol_filter]
-            
-            if selected_currency_filter != 'All':
-                filtered_trades = filtered_trades[filtered_trades['Currency'] == selected_currency_filter]
-            
-            # Display trades
-            display_trades = filtered_trades[['Date/Time', 'Symbol', 'Currency', 'Quantity', 'T. Price', 'C. Price', 'Proceeds']].copy()
-            display_trades['Date/Time'] = display_trades['Date/Time'].dt.strftime('%Y-%m-%d %H:%M')
-            display_trades['T. Price'] = display_trades['T. Price'].apply(lambda x: f"${x:.2f}")
-            display_trades['C. Price'] = display_trades['C. Price'].apply(lambda x: f"${x:.2f}")
-            display_trades['Proceeds'] = display_trades['Proceeds'].apply(lambda x: f"${x:,.2f}")
-            
-            st.dataframe(display_trades, use_container_width=True)
-        
-        # Currency Analysis
-        st.header("💱 Currency Analysis")
-        
-        if not analyzer.all_trades.empty:
-            currency_summary = analyzer.all_trades.groupby('Currency').agg({
-                'Proceeds': 'sum',
-                'Symbol': 'count'
-            }).reset_index()
-            
-            currency_summary.columns = ['Currency', 'Total_Proceeds', 'Trade_Count']
-            currency_summary['Total_Proceeds'] = currency_summary['Total_Proceeds'].apply(lambda x: f"${x:,.2f}")
-            
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.subheader("Trades by Currency")
-                fig = px.pie(currency_summary, values='Trade_Count', names='Currency', title="Trade Distribution by Currency")
-                st.plotly_chart(fig, use_container_width=True)
-            
-            with col2:
-                st.subheader("Currency Summary")
-                st.dataframe(currency_summary, use_container_width=True)
+        show_price_cache_stats()
+    
+    # Main content
+    if current_job() is not None:
+        show_analysis_job(show_dashboard)
+    elif 'analysis_complete' in st.session_state and st.session_state.analysis_complete and hasattr(st.session_state, 'analyzer'):
+        analyzer = st.session_state.analyzer
+        show_run_report(analyzer)
+        show_dashboard(analyzer)
     
     else:
         # Debug information
@@ -0,0 +1,172 @@
+"""Streamlit pieces shared by app.py and streamlit_app.py
+
+The caches and worker pool every session shares, the analysis job of this
+session (start, progress, cancellation, collecting its result), and the
+panels both dashboards draw the same way. Each app keeps its own page
+layout and passes its show_dashboard to show_analysis_job.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+from jobs import CANCELLED, DONE, FAILED, RUNNING, JobManager
+from performance import PORTFOLIO
+from portfolio_analyzer import PortfolioAnalyzer
+from price_cache import PriceCache
+from result_cache import ResultCache, analysis_key
+
+@st.cache_resource
+def get_price_cache():
+    """One on-disk market data cache shared by every session"""
+    return PriceCache()
+
+@st.cache_resource
+def get_result_cache():
+    """Finished analyses shared by every session, keyed on file contents and market data date"""
+    return ResultCache()
+
+@st.cache_resource
+def get_job_manager():
+    """Worker pool that runs analyses for every session off the UI thread"""
+    return JobManager()
+
+def run_cached_analysis(file_paths, incremental=False, job=None):
+    """Analyze ``file_paths``, or reuse the result of any session that analyzed the same files today
+
+    Returns None when the analysis fails; failures are not cached. With a
+    ``job`` the analyzer reports its progress to it.
+    """
+    def analyze():
+        analyzer = PortfolioAnalyzer(price_cache=get_price_cache())
+        if job is not None:
+            job.attach(analyzer)
+        if incremental:
+            success = analyzer.run_incremental_analysis(file_paths)
+        else:
+            success = analyzer.run_complete_analysis(file_paths)
+        return analyzer if success else None
+    return get_result_cache().get_or_compute(analysis_key(file_paths), analyze)
+
+def start_analysis_job(file_paths, incremental=False):
+    """Queue the analysis in the worker pool and remember its job ID for this session"""
+    job = get_job_manager().submit(lambda job: run_cached_analysis(file_paths, incremental, job))
+    st.session_state.job_id = job.id
+    return job
+
+def current_job():
+    job_id = st.session_state.get('job_id')
+    return get_job_manager().get(job_id) if job_id else None
+
+def collect_finished_job():
+    """Move a finished job's analyzer into the session, or keep its error to show"""
+    job = current_job()
+    if 'job_id' in st.session_state and (job is None or job.finished):
+        del st.session_state.job_id
+        if job is not None and job.status == DONE:
+            st.session_state.analyzer = job.result
+            st.session_state.analysis_complete = True
+            st.session_state.job_message = None
+            # Served from the result cache, the finished dashboard is the first thing drawn
+            job.mark_rendered()
+            st.session_state.job_timing = (job.time_to_first_content, job.total_seconds)
+        elif job is not None and job.status == CANCELLED:
+            st.session_state.job_message = "Analysis cancelled"
+        else:
+            st.session_state.job_message = f"Error during analysis: {job.error if job else 'job lost'}"
+
+def show_job_timing():
+    """Time to first content and to the finished analysis of this session's last job"""
+    if st.session_state.get('job_timing'):
+        first, total = st.session_state.job_timing
+        st.caption(f"⚡ First content after {first:.1f}s · complete after {total:.1f}s")
+
+STAGE_ICONS = {DONE: '✅', RUNNING: '⏳', FAILED: '❌'}
+
+@st.fragment(run_every=1)
+def show_analysis_job(show_dashboard):
+    """Progress of this session's analysis job and what it has produced so far, refreshed every second
+
+    ``show_dashboard(analyzer, ready)`` is the app's dashboard, drawn from the
+    job's partial results with ``ready`` telling which steps are done.
+    """
+    job = current_job()
+    if job is None or job.finished:
+        # Let the whole page pick up the result
+        st.rerun()
+    
+    done = sum(state == DONE for state in job.stages.values())
+    label = f"Running {job.current_stage}" if job.current_stage else job.status.capitalize()
+    st.progress(job.progress, text=f"🔄 {label}: {done} of {len(job.stages)} steps done "
+                                   f"({time.time() - job.submitted_at:.0f}s)")
+    st.caption(" · ".join(f"{STAGE_ICONS.get(state, '▫️')} {stage}" for stage, state in job.stages.items()))
+    if job.cancel_requested:
+        st.caption("Cancelling after the current step...")
+    elif st.button("Cancel analysis", key='cancel_job'):
+        job.cancel()
+        st.rerun(scope='fragment')
+    
+    # Each section appears as soon as its steps are done: holdings long before prices arrive
+    if job.stage_done('load_trades'):
+        show_dashboard(job.partial, job.stage_done)
+        job.mark_rendered()
+
+def show_price_cache_stats():
+    stats = get_price_cache().stats()
+    st.caption(
+        f"💾 Price cache: {stats['hits']} hits · {stats['misses']} misses · "
+        f"{stats['tail_fetches']} tail fetches · {stats['cached_symbols']} symbols cached"
+    )
+    stats = get_result_cache().stats()
+    st.caption(
+        f"🗂️ Result cache: {stats['hits'] + stats['shared']} reused · {stats['misses']} computed · "
+        f"{stats['entries']} entries · {stats['bytes'] / 2**20:.0f} of {stats['max_bytes'] / 2**20:.0f} MB"
+    )
+
+def show_run_report(analyzer):
+    report = getattr(analyzer, 'run_report', None)
+    if report is None or not report.stages:
+        return
+    with st.expander(f"⏱️ Run report: {report.total_wall_s:.1f}s over {len(report.stages)} steps"):
+        st.dataframe(report.to_frame().drop(columns=['start_s']).dropna(axis=1, how='all'),
+                     use_container_width=True, hide_index=True)
+        st.download_button("Download trace (Chrome trace format)", report.trace_json(),
+                           file_name='analysis_trace.json', mime='application/json')
+
+def show_risk(risk):
+    """Time-weighted return, drawdown and risk statistics of the valuation"""
+    if risk is None or risk.daily.empty:
+        return
+    summary = risk.summary()
+    def percent(value):
+        return '—' if np.isnan(value) else f"{value * 100:.2f}%"
+    def ratio(value):
+        return '—' if np.isnan(value) else f"{value:.2f}"
+    cols = st.columns(6)
+    cols[0].metric("Time-Weighted Return", percent(summary['twr']))
+    cols[1].metric("Volatility (ann.)", percent(summary['volatility']))
+    cols[2].metric("Max Drawdown", percent(summary['max_drawdown']))
+    cols[3].metric("Sharpe", ratio(summary['sharpe']))
+    cols[4].metric("Sortino", ratio(summary['sortino']))
+    cols[5].metric("Beta", ratio(summary['beta']))
+    fig = px.area(risk.daily, x='Date', y='Drawdown', title='Drawdown from Peak')
+    fig.update_layout(height=300, yaxis_tickformat='.0%')
+    st.plotly_chart(fig, use_container_width=True)
+
+def show_performance_history(xirr_history, return_history):
+    """Portfolio XIRR and time-weighted return over a chosen window, as of each date"""
+    if not xirr_history:
+        return
+    window = st.selectbox("Window", list(xirr_history), index=len(xirr_history) - 1, key='performance_window')
+    history = pd.DataFrame({
+        'XIRR': xirr_history[window][PORTFOLIO],
+        'Return': return_history[window][PORTFOLIO],
+    }).rename_axis('Date').reset_index()
+    fig = px.line(history, x='Date', y=['XIRR', 'Return'], title=f'Portfolio XIRR and Return ({window})')
+    fig.update_layout(height=350, yaxis_tickformat='.0%')
+    st.plotly_chart(fig, use_container_width=True)
+
+def waiting(what):
+    st.caption(f"⏳ Waiting for {what}...")
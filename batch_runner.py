@@ -0,0 +1,294 @@
+"""Headless batch analysis of many portfolios in a process pool
+
+A portfolio is a set of broker CSV files. Portfolios come from a directory
+(one subdirectory of CSVs per portfolio, or the directory itself when it
+holds CSVs directly) or from a manifest: a JSON object mapping each name to
+its files, or a CSV with ``portfolio`` and ``path`` columns. Relative paths
+in a manifest are taken from the manifest's directory.
+
+    python batch_runner.py accounts/ --output results --workers 8
+    python batch_runner.py manifest.json --format json --provider synthetic
+
+Every worker opens the same PriceCache file. Before the pool starts, the
+market data that all portfolios need is fetched once into that cache, so
+workers read prices from disk instead of each hitting the provider.
+Each portfolio's tables go to ``<output>/<name>/``; a summary of every run
+with its per-stage run report is written to ``<output>/batch_summary.json``.
+"""
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from fx_rates import fetch_fx_rates
+from lots import LOT_METHODS
+from market_data import LocalDirectoryProvider, MarketDataFetcher, SyntheticProvider, YFinanceProvider
+from performance import PORTFOLIO, history_table
+from portfolio_analyzer import BASE_CURRENCY_RATES, PortfolioAnalyzer
+from price_cache import DEFAULT_CACHE_PATH, PriceCache
+
+PROVIDERS = ('yfinance', 'synthetic', 'local')
+FORMATS = ('parquet', 'json')
+
+
+def discover_portfolios(source):
+    """Return {name: [csv paths]} from a directory or a JSON/CSV manifest"""
+    if os.path.isdir(source):
+        portfolios = {}
+        for entry in sorted(os.listdir(source)):
+            files = sorted(glob.glob(os.path.join(source, entry, '*.csv')))
+            if files:
+                portfolios[entry] = files
+        if not portfolios:
+            files = sorted(glob.glob(os.path.join(source, '*.csv')))
+            if files:
+                portfolios[os.path.basename(os.path.normpath(source))] = files
+        return portfolios
+
+    base = os.path.dirname(os.path.abspath(source))
+    if source.endswith('.json'):
+        with open(source) as f:
+            manifest = json.load(f)
+        entries = [(name, path) for name, paths in manifest.items() for path in paths]
+    elif source.endswith('.csv'):
+        manifest = pd.read_csv(source, dtype=str)
+        entries = list(zip(manifest['portfolio'], manifest['path']))
+    else:
+        raise ValueError(f"Portfolio source must be a directory, .json or .csv manifest: {source}")
+
+    portfolios = {}
+    for name, path in entries:
+        portfolios.setdefault(name, []).append(os.path.join(base, path))
+    return portfolios
+
+
+def make_provider(name, prices_dir=None):
+    if name == 'synthetic':
+        return SyntheticProvider()
+    if name == 'local':
+        if not prices_dir:
+            raise ValueError("--prices-dir is required with --provider local")
+        return LocalDirectoryProvider(prices_dir)
+    return YFinanceProvider()
+
+
+def prefetch_market_data(portfolios, options):
+    """Fill the shared cache with the prices, splits and FX rates every portfolio needs"""
+    fetcher = MarketDataFetcher(make_provider(options['provider'], options['prices_dir']),
+                                price_cache=PriceCache(options['cache']))
+    symbols, currencies, first_trade = set(), set(options['reporting_currencies'] or BASE_CURRENCY_RATES), None
+    for files in portfolios.values():
+        analyzer = PortfolioAnalyzer(fetcher=fetcher)
+        with contextlib.redirect_stdout(io.StringIO()):
+            try:
+                analyzer.load_trade_data(files)
+                if analyzer.all_trades.empty:
+                    continue
+                analyzer.create_master_holdings_list()
+            except Exception:
+                # The worker reports the error for this portfolio
+                continue
+        symbols.update(analyzer.valuation_symbols())
+        currencies.update(analyzer.all_trades['Currency'].astype(str).unique())
+        start = analyzer.all_trades['Date/Time'].min().normalize()
+        first_trade = start if first_trade is None else min(first_trade, start)
+
+    if not symbols:
+        return
+    started = time.perf_counter()
+    analyzer = PortfolioAnalyzer(fetcher=fetcher)
+    # Prefetching only warms the cache: on failure the workers fetch what they miss themselves
+    fetches = [
+        ('market data', lambda: analyzer.fetch_market_data(sorted(symbols))),
+        ('FX rates', lambda: fetch_fx_rates(fetcher, currencies, first_trade, pd.Timestamp.now().normalize())),
+    ]
+    failed = False
+    for what, fetch in fetches:
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                fetch()
+        except Exception as e:
+            failed = True
+            print(f"Error prefetching {what}, left to the workers: {type(e).__name__}: {e}")
+    if not failed:
+        print(f"Prefetched market data for {len(symbols)} symbols and {len(currencies)} currencies "
+              f"in {time.perf_counter() - started:.1f}s")
+
+
+def write_table(frame, path, fmt):
+    if fmt == 'parquet':
+        frame.to_parquet(path + '.parquet', index=False)
+    else:
+        frame.to_json(path + '.json', orient='records', date_format='iso', indent=1)
+
+
+def analyze_portfolio(name, files, options):
+    """Run one portfolio in a worker process and write its results; returns its summary"""
+    started = time.perf_counter()
+    directory = os.path.join(options['output'], name)
+    os.makedirs(directory, exist_ok=True)
+    summary = {'portfolio': name, 'files': files, 'success': False, 'error': None}
+
+    analyzer = PortfolioAnalyzer(provider=make_provider(options['provider'], options['prices_dir']),
+                                 price_cache=PriceCache(options['cache']),
+                                 lot_method=options['lot_method'],
+                                 reporting_currencies=options['reporting_currencies'],
+                                 trace_path=os.path.join(directory, 'trace.json') if options['trace'] else None)
+    # The pipeline's progress output goes to a log per portfolio
+    with open(os.path.join(directory, 'analysis.log'), 'w') as log, contextlib.redirect_stdout(log):
+        try:
+            if options['incremental']:
+                success = analyzer.run_incremental_analysis(
+                    files, state_path=os.path.join(directory, 'analysis_state.pkl'))
+            else:
+                success = analyzer.run_complete_analysis(files)
+            summary['success'] = bool(success)
+
+            fmt = options['format']
+            if isinstance(getattr(analyzer, 'all_trades', None), pd.DataFrame):
+                write_table(analyzer.all_trades, os.path.join(directory, 'trades'), fmt)
+                summary['trades'] = len(analyzer.all_trades)
+            if isinstance(analyzer.holdings, pd.DataFrame):
+                write_table(analyzer.holdings, os.path.join(directory, 'holdings'), fmt)
+                summary['holdings'] = len(analyzer.holdings)
+            if isinstance(analyzer.portfolio_values, pd.DataFrame) and len(analyzer.portfolio_values):
+                write_table(analyzer.portfolio_values, os.path.join(directory, 'portfolio_values'), fmt)
+                latest = analyzer.portfolio_values.iloc[-1]
+                summary['latest_values'] = {column: float(latest[column])
+                                            for column in analyzer.portfolio_values.columns if column != 'Date'}
+            if not analyzer.fees_by_symbol.empty:
+                for table in ['fees_by_symbol', 'fees_by_period']:
+                    frame = getattr(analyzer, table).reset_index()
+                    write_table(frame.astype({frame.columns[0]: str}), os.path.join(directory, table), fmt)
+                fees = analyzer.fees_by_symbol[['Fees', 'Traded']].sum()
+                summary['fees'] = float(fees['Fees'])
+                summary['fee_drag'] = float(fees['Fees'] / fees['Traded']) if fees['Traded'] else None
+            if analyzer.lot_method and not analyzer.profit_and_loss.empty:
+                for table in ['closed_lots', 'open_lots', 'profit_and_loss']:
+                    write_table(getattr(analyzer, table), os.path.join(directory, table), fmt)
+                by_currency = analyzer.profit_and_loss.groupby('Currency', observed=True)
+                summary['realized_pl'] = {str(currency): float(pl)
+                                          for currency, pl in by_currency['Realized_PL'].sum().items()}
+                summary['unrealized_pl'] = {str(currency): float(pl)
+                                            for currency, pl in by_currency['Unrealized_PL'].sum().items()}
+            xirr_results = getattr(analyzer, 'xirr_results', {})
+            if xirr_results:
+                write_table(pd.DataFrame({'Symbol': list(xirr_results), 'XIRR': list(xirr_results.values())}),
+                            os.path.join(directory, 'xirr'), fmt)
+            xirr_history = getattr(analyzer, 'xirr_history', {})
+            if xirr_history:
+                write_table(history_table(xirr_history, analyzer.return_history),
+                            os.path.join(directory, 'xirr_history'), fmt)
+                summary['portfolio_xirr_windows'] = {window: None if pd.isna(rates[PORTFOLIO].iloc[-1])
+                                                     else float(rates[PORTFOLIO].iloc[-1])
+                                                     for window, rates in xirr_history.items()}
+            portfolio_xirr = getattr(analyzer, 'portfolio_xirr', None)
+            summary['portfolio_xirr'] = None if portfolio_xirr is None or pd.isna(portfolio_xirr) else float(portfolio_xirr)
+        except Exception as e:
+            traceback.print_exc(file=log)
+            summary['error'] = f"{type(e).__name__}: {e}"
+
+    summary['stages'] = analyzer.run_report.to_dict()['stages']
+    summary['seconds'] = time.perf_counter() - started
+    with open(os.path.join(directory, 'summary.json'), 'w') as f:
+        json.dump(summary, f, indent=1)
+    return summary
+
+
+def print_timings(summaries):
+    """One row of per-stage wall seconds per portfolio, then the totals"""
+    timings = [{record['stage']: record['wall_s'] for record in summary['stages']} for summary in summaries]
+    stages = []
+    for timing in timings:
+        stages.extend(stage for stage in timing if stage not in stages)
+    table = pd.DataFrame(timings, columns=stages, index=[summary['portfolio'] for summary in summaries]).fillna(0.0)
+    table['total'] = [summary['seconds'] for summary in summaries]
+    table.loc['(all)'] = table.sum()
+    with pd.option_context('display.width', 200, 'display.max_columns', None, 'display.float_format', '{:.2f}'.format):
+        print(table)
+
+
+def run_batch(portfolios, options, workers=None, prefetch=True):
+    """Analyze every portfolio in a process pool; returns their summaries in input order"""
+    os.makedirs(options['output'], exist_ok=True)
+    if prefetch:
+        prefetch_market_data(portfolios, options)
+
+    summaries = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(analyze_portfolio, name, files, options): name for name, files in portfolios.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                summary = future.result()
+            except Exception as e:
+                summary = {'portfolio': name, 'files': portfolios[name], 'success': False,
+                           'error': f"{type(e).__name__}: {e}", 'stages': [], 'seconds': 0.0}
+            summaries[name] = summary
+            status = 'ok' if summary['success'] else f"FAILED ({summary['error'] or 'see analysis.log'})"
+            print(f"{name}: {status} in {summary['seconds']:.1f}s")
+
+    summaries = [summaries[name] for name in portfolios]
+    with open(os.path.join(options['output'], 'batch_summary.json'), 'w') as f:
+        json.dump(summaries, f, indent=1)
+    return summaries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('portfolios', help="directory of portfolios, or a .json / .csv manifest")
+    parser.add_argument('--output', default='batch_results', help="directory for results (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--format', choices=FORMATS, default='parquet')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help="shared PriceCache file (default: %(default)s)")
+    parser.add_argument('--provider', choices=PROVIDERS, default='yfinance')
+    parser.add_argument('--prices-dir', help="history directory for --provider local")
+    parser.add_argument('--lot-method', choices=LOT_METHODS,
+                        help="match trades into lots and write realized and unrealized P/L")
+    parser.add_argument('--currencies', nargs='+', help="reporting currencies (default: USD INR SGD)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="keep state per portfolio and only process what changed since the last run")
+    parser.add_argument('--trace', action='store_true',
+                        help="write each portfolio's stage timings as Chrome trace events to trace.json")
+    parser.add_argument('--no-prefetch', action='store_true', help="let each worker fetch its own market data")
+    args = parser.parse_args(argv)
+
+    portfolios = discover_portfolios(args.portfolios)
+    if not portfolios:
+        print(f"No portfolios found in {args.portfolios}")
+        return 1
+    print(f"Analyzing {len(portfolios)} portfolios")
+
+    options = {
+        'output': args.output,
+        'format': args.format,
+        'cache': args.cache,
+        'provider': args.provider,
+        'prices_dir': args.prices_dir,
+        'lot_method': args.lot_method,
+        'reporting_currencies': args.currencies,
+        'incremental': args.incremental,
+        'trace': args.trace,
+    }
+    started = time.perf_counter()
+    summaries = run_batch(portfolios, options, workers=args.workers, prefetch=not args.no_prefetch)
+    print_timings(summaries)
+
+    failed = [summary['portfolio'] for summary in summaries if not summary['success']]
+    print(f"{len(summaries) - len(failed)} of {len(summaries)} portfolios analyzed in "
+          f"{time.perf_counter() - started:.1f}s; results in {args.output}")
+    if failed:
+        print(f"Failed: {', '.join(failed)}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""Benchmark multi-currency transaction prices: per-currency masks vs one trades x currencies array
+
+The reference converts the way step 6 used to, one output column and one
+masked assignment per source currency at a time; FXRateTable.convert_matrix
+does a single as-of lookup and one broadcast for every reporting currency.
+Results are checked against each other, and tracemalloc peaks show memory
+growing linearly with the number of reporting currencies.
+
+    python benchmarks/bench_currency_conversion.py
+    python benchmarks/bench_currency_conversion.py --trades 5000000 --currencies 3 7 10
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fx_rates import FXRateTable  # noqa: E402
+
+CURRENCIES = ['USD', 'INR', 'SGD', 'EUR', 'GBP', 'JPY', 'HKD', 'CHF', 'AUD', 'CAD']
+
+
+def make_case(n_trades, seed=0):
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range('2015-01-01', '2025-06-30').values.astype('datetime64[D]')
+    table = FXRateTable.from_series({
+        currency: (days, rng.uniform(0.5, 150) * np.exp(np.cumsum(rng.normal(0, 0.004, len(days)))))
+        for currency in CURRENCIES[1:]})
+    seconds = rng.integers(pd.Timestamp('2015-01-05').value // 10**9, pd.Timestamp('2025-06-30').value // 10**9,
+                           n_trades)
+    trades = pd.DataFrame({
+        'Date/Time': pd.to_datetime(np.sort(seconds), unit='s').astype('datetime64[ns]'),
+        # Mostly USD, like a typical book
+        'Currency': pd.Categorical(rng.choice(CURRENCIES[:4], n_trades, p=[0.85, 0.05, 0.05, 0.05])),
+        'T. Price': rng.uniform(5, 500, n_trades),
+    })
+    return table, trades
+
+
+def reference_prices(table, trades, reporting):
+    """One column per reporting currency, filled source currency by source currency"""
+    result = {}
+    dates = trades['Date/Time']
+    for target in reporting:
+        column = np.full(len(trades), np.nan)
+        for source in trades['Currency'].cat.categories:
+            mask = (trades['Currency'] == source).to_numpy()
+            rows = dates[mask]
+            column[mask] = trades['T. Price'].to_numpy()[mask] / table.lookup(rows, source) * table.lookup(rows, target)
+        result[f'Price_{target}'] = column
+    return pd.DataFrame(result, index=trades.index)
+
+
+def matrix_prices(table, trades, reporting):
+    prices = table.convert_matrix(trades['T. Price'], trades['Date/Time'], trades['Currency'], reporting)
+    return pd.DataFrame(prices, index=trades.index, columns=[f'Price_{currency}' for currency in reporting])
+
+
+def measure(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trades', type=int, default=1_000_000)
+    parser.add_argument('--currencies', type=int, nargs='+', default=[3, 7, 10])
+    args = parser.parse_args()
+
+    table, trades = make_case(args.trades)
+    print(f"{args.trades} trades")
+    print(f"{'currencies':>10} {'masked_s':>9} {'matrix_s':>9} {'speedup':>8} {'masked_MB':>10} {'matrix_MB':>10}")
+    for k in args.currencies:
+        reporting = CURRENCIES[:k]
+        expected, masked_s, masked_mb = measure(reference_prices, table, trades, reporting)
+        result, matrix_s, matrix_mb = measure(matrix_prices, table, trades, reporting)
+        pd.testing.assert_frame_equal(result, expected, rtol=1e-12)
+        print(f'{k:>10} {masked_s:>9.3f} {matrix_s:>9.3f} {masked_s / matrix_s:>7.1f}x '
+              f'{masked_mb:>10.0f} {matrix_mb:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Benchmark as-of FX lookups for large trade tables
+
+Compares FXRateTable.lookup (one searchsorted over the date axis plus a
+gather) with pandas merge_asof, which also serves as the correctness check.
+
+    python benchmarks/bench_fx_rates.py
+    python benchmarks/bench_fx_rates.py --rows 1000000 10000000 --currencies 8
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fx_rates import FXRateTable  # noqa: E402
+
+CURRENCIES = ['INR', 'SGD', 'EUR', 'GBP', 'JPY', 'HKD', 'CHF', 'AUD', 'CAD', 'CNY']
+
+
+def make_table(n_currencies, seed=0):
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range('2010-01-01', '2025-06-30').values.astype('datetime64[D]')
+    series = {currency: (days, rng.uniform(0.5, 150) * np.exp(np.cumsum(rng.normal(0, 0.004, len(days)))))
+              for currency in CURRENCIES[:n_currencies]}
+    return FXRateTable.from_series(series)
+
+
+def merge_asof_lookup(table, dates, currencies):
+    long = table.to_frame().melt(id_vars='Date', var_name='Currency', value_name='Rate').sort_values('Date')
+    left = pd.DataFrame({'Date': dates, 'Currency': currencies, 'Row': np.arange(len(dates))}).sort_values('Date')
+    matched = pd.merge_asof(left, long, on='Date', by='Currency', direction='backward')
+    return matched.sort_values('Row')['Rate'].to_numpy()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000, 5_000_000])
+    parser.add_argument('--currencies', type=int, default=6)
+    args = parser.parse_args()
+
+    table = make_table(args.currencies)
+    rng = np.random.default_rng(1)
+    print(f"{'rows':>10} {'merge_asof_s':>13} {'lookup_s':>9} {'speedup':>8}")
+    for n in args.rows:
+        seconds = rng.integers(pd.Timestamp('2010-01-05').value // 10**9, pd.Timestamp('2025-06-30').value // 10**9, n)
+        dates = pd.to_datetime(seconds, unit='s').astype('datetime64[ns]')
+        currencies = pd.Categorical(rng.choice(table.currencies, n))
+
+        start = time.perf_counter()
+        expected = merge_asof_lookup(table, dates, currencies.astype(str))
+        merge_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        rates = table.lookup(dates, currencies)
+        lookup_s = time.perf_counter() - start
+
+        np.testing.assert_allclose(rates, expected)
+        print(f'{n:>10} {merge_s:>13.2f} {lookup_s:>9.3f} {merge_s / lookup_s:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Benchmark holdings aggregation: legacy groupby lambda vs one vectorized grouped pass
+
+Also times FIFO, LIFO and average-cost lot matching over the same trades, through
+compute_lots as the analyzer runs it (match_lots, then profit_and_loss).
+
+    python benchmarks/bench_holdings.py
+    python benchmarks/bench_holdings.py --trades 1000000 --symbols 100 5000
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from portfolio_analyzer import PortfolioAnalyzer  # noqa: E402
+from trade_store import normalize_trades  # noqa: E402
+from benchmarks.synthetic_data import broker_chunk, symbol_names  # noqa: E402
+
+
+def legacy_holdings(all_trades):
+    """create_master_holdings_list before vectorization, for reference"""
+    holdings_summary = all_trades.groupby(['Symbol', 'Currency'], observed=True).agg({
+        'Quantity': 'sum',
+        'Proceeds': 'sum',
+        'T. Price': lambda x: (x * all_trades.loc[x.index, 'Quantity']).sum() / all_trades.loc[x.index, 'Quantity'].sum() if all_trades.loc[x.index, 'Quantity'].sum() != 0 else 0
+    }).reset_index()
+    holdings = holdings_summary[holdings_summary['Quantity'] != 0].copy()
+    holdings['Avg_Price'] = holdings['T. Price']
+    holdings['Total_Invested'] = holdings['Quantity'] * holdings['Avg_Price']
+    return holdings
+
+
+def make_trades(n_trades, n_symbols, seed=0):
+    rng = np.random.default_rng(seed)
+    currencies = np.where(rng.random(n_symbols) < 0.02, 'SGD', 'USD')
+    raw = broker_chunk(rng, n_trades, symbol_names(n_symbols), rng.uniform(5, 800, n_symbols),
+                       currencies, '2020-01-01', '2025-06-30')
+    raw = raw[raw['DataDiscriminator'] == 'Order'].copy()
+    raw['Date/Time'] = pd.to_datetime(raw['Date/Time'], format='%Y-%m-%d, %H:%M:%S')
+    raw['Quantity'] = raw['Quantity'].str.replace(',', '').astype(float)
+    return normalize_trades(raw)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def lot_pass(analyzer, method):
+    analyzer.lot_method = method
+    analyzer.compute_lots()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trades', type=int, default=200_000)
+    parser.add_argument('--symbols', type=int, nargs='+', default=[100, 1000, 5000])
+    args = parser.parse_args()
+
+    print(f"{'symbols':>8} {'legacy_s':>9} {'vector_s':>9} {'speedup':>8} {'fifo_s':>7} {'lifo_s':>7} {'average_s':>10}")
+    for n in args.symbols:
+        analyzer = PortfolioAnalyzer(provider=object())
+        analyzer.all_trades = make_trades(args.trades, n)
+
+        legacy, legacy_s = timed(legacy_holdings, analyzer.all_trades)
+        vector, vector_s = timed(analyzer.create_master_holdings_list)
+        pd.testing.assert_frame_equal(legacy.reset_index(drop=True), vector[legacy.columns].reset_index(drop=True))
+
+        # Synthetic trades have no splits, so the split-adjusted trades are the trades
+        analyzer.split_adjusted_trades = analyzer.all_trades
+        fifo_s, lifo_s, average_s = [timed(lot_pass, analyzer, method)[1] for method in ['fifo', 'lifo', 'average']]
+        print(f'{n:>8} {legacy_s:>9.2f} {vector_s:>9.3f} {legacy_s / vector_s:>7.0f}x {fifo_s:>7.2f} {lifo_s:>7.2f} {average_s:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
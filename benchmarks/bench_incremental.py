@@ -0,0 +1,161 @@
+"""Benchmark incremental re-analysis against a complete run, including a split between runs
+
+A synthetic book is analyzed once, then its previous run is made ten days
+old (as if it were last run then) and re-analyzed incrementally: once with
+nothing else changed, once after one of its symbols split within those ten
+days. A split makes the provider adjust that symbol's whole history, so the
+cached rows and the ones the previous run held no longer join a fetched
+tail; the incremental result must still match a complete run from an empty
+cache, down to the FIFO lots and the lot costs they give the holdings.
+Concurrent saves of the same state are checked to leave one whole file.
+
+    python benchmarks/bench_incremental.py
+    python benchmarks/bench_incremental.py --trades 100000 --symbols 500
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from incremental import load_state, save_state, state_path_for  # noqa: E402
+from market_data import MarketDataFetcher, SyntheticProvider  # noqa: E402
+from portfolio_analyzer import PortfolioAnalyzer  # noqa: E402
+from price_cache import PriceCache  # noqa: E402
+from benchmarks.synthetic_data import symbol_names, write_broker_csv  # noqa: E402
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']
+
+
+class SplittingProvider(SyntheticProvider):
+    """Synthetic prices of symbols that split ({symbol: Series of ratios}), which may change between runs
+
+    A split divides the price from its date on; history is split adjusted, so
+    it is divided throughout, as Yahoo returns it.
+    """
+
+    def __init__(self, seed=0):
+        super().__init__(seed=seed, split_probability=0.0)
+        self.splits = {}
+
+    def get_splits(self, symbol):
+        return self.splits.get(symbol, pd.Series(dtype=float, name='Stock Splits'))
+
+    def get_history_batch(self, symbols, start, end):
+        histories = super().get_history_batch(symbols, start, end)
+        for symbol, history in histories.items():
+            for ratio in self.get_splits(symbol):
+                history[PRICE_COLUMNS] /= ratio
+        return histories
+
+
+def analyze(provider, cache_path, files, state_path=None):
+    """Run with a PriceCache that is always stale, so every run refetches splits and tails"""
+    fetcher = MarketDataFetcher(provider, price_cache=PriceCache(cache_path, max_age_hours=0),
+                                rate_per_second=None)
+    analyzer = PortfolioAnalyzer(fetcher=fetcher, lot_method='fifo')
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        if state_path is None:
+            analyzer.run_complete_analysis(files)
+        else:
+            analyzer.run_incremental_analysis(files, state_path=state_path)
+    return analyzer, time.perf_counter() - start
+
+
+def age_state(state_path, days):
+    """Make the saved run look ``days`` old: its market data and values end that long ago"""
+    state = load_state(state_path)
+    end = state['market_data_end'] - pd.Timedelta(days=days)
+    state['market_data_end'] = end
+    state['historical_prices'] = {symbol: history[history.index.tz_localize(None) < end]
+                                  for symbol, history in state['historical_prices'].items()}
+    state['portfolio_values'] = state['portfolio_values'][pd.to_datetime(state['portfolio_values']['Date']) < end]
+    save_state(state_path, state)
+    return end
+
+
+def check_concurrent_saves(directory):
+    """Jobs saving state at once leave one whole state behind; different inputs keep their own"""
+    assert state_path_for(['a.csv', 'b.csv']) == state_path_for(['b.csv', 'a.csv']) != state_path_for(['a.csv'])
+    path = os.path.join(directory, 'shared.pkl')
+    rows = pd.DataFrame({'Value': np.arange(100_000, dtype=float)})
+    threads = [threading.Thread(target=save_state, args=(path, {'job': job, 'rows': rows})) for job in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    state = load_state(path)
+    assert state['job'] in range(8) and state['rows'].equals(rows)
+    assert os.listdir(directory) == ['shared.pkl']
+    os.remove(path)
+
+
+def check_same(incremental, complete):
+    pd.testing.assert_frame_equal(incremental.portfolio_values.reset_index(drop=True),
+                                  complete.portfolio_values.reset_index(drop=True), rtol=1e-9)
+    pd.testing.assert_frame_equal(incremental.holdings, complete.holdings, rtol=1e-9)
+    pd.testing.assert_frame_equal(incremental.profit_and_loss, complete.profit_and_loss, rtol=1e-9)
+    # Lot costs in the holdings are the lot ledger's, in split-adjusted units
+    ledger = complete.profit_and_loss.set_index('Symbol')
+    held = complete.holdings.set_index('Symbol')
+    np.testing.assert_allclose(held['Lot_Cost'], ledger.loc[held.index, 'Open_Cost'], rtol=1e-12)
+    np.testing.assert_allclose(held['Lot_Avg_Price'] * ledger.loc[held.index, 'Open_Quantity'], held['Lot_Cost'],
+                               rtol=1e-9)
+    assert incremental.xirr_results.keys() == complete.xirr_results.keys()
+    assert incremental.xirr_history.keys() == complete.xirr_history.keys()
+    for window, rates in complete.xirr_history.items():
+        pd.testing.assert_frame_equal(incremental.xirr_history[window], rates, rtol=1e-6, atol=1e-9)
+        pd.testing.assert_frame_equal(incremental.return_history[window], complete.return_history[window], rtol=1e-9)
+    np.testing.assert_allclose(list(incremental.xirr_results.values()), list(complete.xirr_results.values()),
+                               rtol=1e-4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trades', type=int, default=20_000)
+    parser.add_argument('--symbols', type=int, default=100)
+    args = parser.parse_args()
+
+    today = pd.Timestamp.now().normalize()
+    with tempfile.TemporaryDirectory() as directory:
+        check_concurrent_saves(directory)
+        files = [os.path.join(directory, 'trades.csv')]
+        write_broker_csv(files[0], args.trades, n_symbols=args.symbols, start=today - pd.DateOffset(years=2),
+                         end=today - pd.Timedelta(days=30), seed=0)
+        state_path = os.path.join(directory, 'state.pkl')
+        cache_path = os.path.join(directory, 'cache.sqlite')
+        provider = SplittingProvider()
+
+        _, first_s = analyze(provider, cache_path, files, state_path)
+        print(f"{args.trades} trades in {args.symbols} symbols: first run {first_s:.2f}s")
+        print(f"{'change':<22} {'incremental_s':>14} {'complete_s':>11}")
+
+        split_symbol = symbol_names(args.symbols)[0]
+        for change in ['none', 'split of a held symbol']:
+            end = age_state(state_path, 10)
+            if change != 'none':
+                split_day = pd.bdate_range(end + pd.Timedelta(days=1), today)[2]
+                provider.splits[split_symbol] = pd.Series(
+                    [2.0], index=pd.DatetimeIndex([split_day]).tz_localize(provider.tz), name='Stock Splits')
+            incremental, incremental_s = analyze(provider, cache_path, files, state_path)
+            complete, complete_s = analyze(provider, os.path.join(directory, f'fresh_{len(change)}.sqlite'), files)
+            check_same(incremental, complete)
+            if change != 'none':
+                # A split changes units, not value: the position's XIRR is the same as without it
+                np.testing.assert_allclose(complete.xirr_results[split_symbol], unsplit_xirr, rtol=1e-4)
+            unsplit_xirr = complete.xirr_results[split_symbol]
+            print(f"{change:<22} {incremental_s:>14.2f} {complete_s:>11.2f}")
+    print("Incremental results match a complete run")
+
+
+if __name__ == '__main__':
+    main()
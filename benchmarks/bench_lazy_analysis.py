@@ -0,0 +1,116 @@
+"""Benchmark what each view costs with LazyAnalysis against the full nine-step run
+
+Each view is opened on a fresh LazyAnalysis over the bench_pipeline fixtures
+and timed with the steps it triggered. The lazily computed outputs are
+checked against a complete run, and a few option changes show which steps
+each one invalidates: only those are rerun.
+
+    python benchmarks/bench_lazy_analysis.py
+    python benchmarks/bench_lazy_analysis.py --scenario 1k
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis_graph import LazyAnalysis  # noqa: E402
+from benchmarks.bench_pipeline import HERE, SCENARIOS, new_analyzer, prepare_fixtures  # noqa: E402
+
+# View: the outputs it draws
+VIEWS = {
+    'trade history': ['all_trades'],
+    'holdings': ['holdings'],
+    'splits table': ['stock_splits'],
+    'valuation chart': ['portfolio_values'],
+    'xirr tab': ['xirr_results', 'portfolio_xirr', 'xirr_history'],
+    'p/l ledger': ['closed_lots', 'profit_and_loss'],
+    'everything': ['holdings', 'stock_splits', 'split_adjusted_trades', 'priced_trades', 'portfolio_values',
+                   'xirr_results', 'xirr_history', 'profit_and_loss'],
+}
+
+
+def timed(func, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = func(*args)
+        return result, time.perf_counter() - start
+
+
+def open_view(lazy, outputs):
+    return [getattr(lazy, output) for output in outputs]
+
+
+def recomputed(lazy, before):
+    return sorted(name for name, count in lazy.graph.computations.items() if count > before.get(name, 0))
+
+
+def move_price_window(lazy, offset):
+    """What refresh() does on a later day: the window moves and market data is refetched"""
+    lazy.graph.set('price_window', tuple(day + offset for day in lazy.graph.get('price_window')))
+
+
+def check_outputs(lazy, full):
+    pd.testing.assert_frame_equal(lazy.holdings, full.holdings)
+    pd.testing.assert_frame_equal(lazy.portfolio_values, full.portfolio_values)
+    pd.testing.assert_frame_equal(lazy.priced_trades, full.all_trades)
+    pd.testing.assert_frame_equal(lazy.fees_by_period, full.fees_by_period)
+    assert lazy.xirr_results.keys() == full.xirr_results.keys()
+    # XIRR is valued as of now, which moves between the two runs
+    np.testing.assert_allclose(list(lazy.xirr_results.values()), list(full.xirr_results.values()), rtol=1e-4)
+    for window, rates in full.xirr_history.items():
+        pd.testing.assert_frame_equal(lazy.xirr_history[window], rates)
+        pd.testing.assert_frame_equal(lazy.return_history[window], full.return_history[window])
+    pd.testing.assert_frame_equal(lazy.closed_lots, full.closed_lots)
+    pd.testing.assert_frame_equal(lazy.profit_and_loss, full.profit_and_loss)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenario', choices=list(SCENARIOS), default='100k')
+    parser.add_argument('--fixtures', default=os.path.join(HERE, 'fixtures'))
+    args = parser.parse_args()
+
+    files, prices_dir = prepare_fixtures(args.fixtures, args.scenario)
+    full = new_analyzer(prices_dir)
+    _, full_seconds = timed(full.run_complete_analysis, files)
+    print(f"{args.scenario}: complete analysis {full_seconds:.3f}s")
+    print(f"{'view':<16} {'seconds':>8} {'share':>6}  steps run")
+    for view, outputs in VIEWS.items():
+        lazy = LazyAnalysis(files, analyzer=new_analyzer(prices_dir))
+        _, seconds = timed(open_view, lazy, outputs)
+        steps = [record['stage'] for record in lazy.run_report.stages]
+        print(f"{view:<16} {seconds:>8.3f} {seconds / full_seconds:>5.0%}  {', '.join(steps)}")
+    check_outputs(lazy, full)
+
+    # Changes and what they recompute once every view has been drawn again
+    everything = [output for outputs in VIEWS.values() for output in outputs]
+    changes = {
+        'files unchanged': (lambda: lazy.refresh(), []),
+        'lot method fifo': (lambda: lazy.set_lot_method('fifo'), ['lot_holdings', 'lots']),
+        'next day': (lambda: move_price_window(lazy, pd.Timedelta(days=1)),
+                     ['symbols', 'market_data', 'split_adjusted_trades', 'lots', 'lot_holdings', 'currency_rates',
+                      'priced_trades', 'portfolio_values', 'xirr', 'xirr_history']),
+        'add EUR reporting': (lambda: lazy.set_reporting_currencies(['USD', 'INR', 'SGD', 'EUR']),
+                              ['fx_needs', 'currency_rates', 'priced_trades', 'portfolio_values', 'xirr',
+                               'xirr_history']),
+    }
+    print(f"\n{'change':<18} {'seconds':>8}  recomputed")
+    for change, (apply, expected) in changes.items():
+        apply()
+        before = dict(lazy.graph.computations)
+        _, seconds = timed(open_view, lazy, everything)
+        steps = recomputed(lazy, before)
+        print(f"{change:<18} {seconds:>8.3f}  {', '.join(steps) or '-'}")
+        assert steps == sorted(expected), (change, steps)
+    print("\nLazy outputs match the complete analysis")
+
+
+if __name__ == '__main__':
+    main()
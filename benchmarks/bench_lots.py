@@ -0,0 +1,104 @@
+"""Benchmark lot matching: one sorted pass vs a per-symbol loop over lot deques
+
+match_lots sorts the trades by symbol once and matches them in a single
+pass over plain lists. The reference groups the trade table by symbol and
+matches each group with a deque of lots, as a first implementation would.
+Both must produce the same closed and open lots, and for every symbol the
+open lots' cost less the realized P/L must equal the net amount paid for
+its trades, fees included. The single pass costs the same however many symbols the
+trades spread over; the reference pays for every group.
+
+    python benchmarks/bench_lots.py
+    python benchmarks/bench_lots.py --trades 5000000 --symbols 2000
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fees import trade_costs  # noqa: E402
+from lots import EPSILON, LOT_METHODS, match_lots  # noqa: E402
+from benchmarks.bench_holdings import make_trades  # noqa: E402
+
+
+def reference_lots(trades, method):
+    """Closed pieces (symbol, quantity, open price, close price, fees) and open lots (symbol, quantity, price, fees)"""
+    closed, still_open = [], []
+    for symbol, group in trades.groupby('Symbol', observed=True, sort=True):
+        lots = deque()  # [signed quantity, price, fee per unit]
+        for quantity, price, fee in zip(group['Quantity'], group['T. Price'], -group['Comm/Fee'].fillna(0.0)):
+            fee = fee / abs(quantity) if quantity else 0.0
+            while abs(quantity) > EPSILON and lots and (lots[0][0] > 0) != (quantity > 0):
+                lot = lots[-1] if method == 'lifo' else lots[0]
+                matched = lot[0] if abs(lot[0]) <= abs(quantity) else -quantity
+                closed.append((symbol, matched, lot[1], price, abs(matched) * (lot[2] + fee)))
+                lot[0] -= matched
+                quantity += matched
+                if abs(lot[0]) <= EPSILON:
+                    lots.pop() if method == 'lifo' else lots.popleft()
+            if abs(quantity) > EPSILON:
+                if method == 'average' and lots:
+                    lot = lots[0]
+                    lot[1] = (lot[0] * lot[1] + quantity * price) / (lot[0] + quantity)
+                    lot[2] = (lot[0] * lot[2] + quantity * fee) / (lot[0] + quantity)
+                    lot[0] += quantity
+                else:
+                    lots.append([quantity, price, fee])
+        still_open.extend((symbol, quantity, price, abs(quantity) * fee) for quantity, price, fee in lots)
+    return closed, still_open
+
+
+def check(trades, closed, open_lots, expected_closed, expected_open):
+    assert len(closed) == len(expected_closed) and len(open_lots) == len(expected_open)
+    symbols, quantity, open_price, close_price, fees = zip(*expected_closed) if expected_closed else ([],) * 5
+    assert (closed['Symbol'].astype(str).to_numpy() == np.asarray(symbols, dtype=str)).all()
+    np.testing.assert_allclose(closed['Quantity'], quantity)
+    np.testing.assert_allclose(closed['Open_Price'], open_price)
+    np.testing.assert_allclose(closed['Close_Price'], close_price)
+    np.testing.assert_allclose(closed['Fees'], fees, atol=1e-9)
+    symbols, quantity, price, fees = zip(*expected_open) if expected_open else ([],) * 4
+    assert (open_lots['Symbol'].astype(str).to_numpy() == np.asarray(symbols, dtype=str)).all()
+    np.testing.assert_allclose(open_lots['Quantity'], quantity)
+    np.testing.assert_allclose(open_lots['Price'], price)
+    np.testing.assert_allclose(open_lots['Fees'], fees, atol=1e-9)
+
+    # Whatever was paid for a symbol, fees included, is either still in its open lots or was realized
+    paid = pd.Series(trade_costs(trades), index=trades.index).groupby(trades['Symbol'], observed=True).sum()
+    realized = closed.groupby('Symbol', observed=True)['Realized_PL'].sum().reindex(paid.index, fill_value=0.0)
+    cost = open_lots.groupby('Symbol', observed=True)['Cost'].sum().reindex(paid.index, fill_value=0.0)
+    np.testing.assert_allclose(cost - realized, paid, rtol=1e-9, atol=1e-6 * np.abs(paid).max())
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trades', type=int, default=1_000_000)
+    parser.add_argument('--symbols', type=int, nargs='+', default=[1000, 50000])
+    args = parser.parse_args()
+
+    print(f"{'symbols':>8} {'method':<8} {'reference_s':>12} {'single_pass_s':>14} {'speedup':>8} {'trades/s':>10} "
+          f"{'closed':>9} {'open':>7}")
+    for n in args.symbols:
+        trades = make_trades(args.trades, n)
+        for method in LOT_METHODS:
+            (expected_closed, expected_open), reference_s = timed(reference_lots, trades, method)
+            (closed, open_lots), seconds = timed(match_lots, trades, method)
+            check(trades, closed, open_lots, expected_closed, expected_open)
+            print(f"{n:>8} {method:<8} {reference_s:>12.2f} {seconds:>14.2f} {reference_s / seconds:>7.1f}x "
+                  f"{len(trades) / seconds:>10,.0f} {len(closed):>9} {len(open_lots):>7}")
+    print("Single-pass lots match the per-symbol reference and conserve cost")
+
+
+if __name__ == '__main__':
+    main()
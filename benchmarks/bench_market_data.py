@@ -0,0 +1,76 @@
+"""Benchmark cold-start market data fetching, per-symbol vs batched history
+
+Uses StubProvider so no network is needed; every provider call pays a fixed
+simulated latency, like one HTTP round-trip. Before timing, a symbol that
+fails on a cold PriceCache is checked to come back as an error, not to sink
+the whole fetch, and FX rates are checked to be fetched without split calls.
+
+    python benchmarks/bench_market_data.py
+    python benchmarks/bench_market_data.py --symbols 50 500 --latency 0.2
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fx_rates import fetch_fx_rates  # noqa: E402
+from market_data import MarketDataFetcher, StubProvider  # noqa: E402
+from price_cache import PriceCache  # noqa: E402
+
+
+def check_failed_symbol_cold_cache():
+    """A symbol that cannot be fetched is reported with its error; the others still arrive"""
+    with tempfile.TemporaryDirectory() as directory:
+        cache = PriceCache(os.path.join(directory, 'cache.sqlite'))
+        fetcher = MarketDataFetcher(StubProvider(fail_symbols=['BAD']), price_cache=cache, max_retries=0,
+                                    batch_size=1)
+        results = fetcher.fetch_all(['BAD', 'GOOD'], '2024-07-01', '2025-06-30')
+        assert results['BAD']['error'] is not None and results['BAD']['history'].empty
+        assert results['GOOD']['error'] is None and not results['GOOD']['history'].empty
+        assert cache.read_history('BAD', '2024-07-01', '2025-06-30').empty
+
+
+def check_fx_fetch_skips_splits():
+    """FX pairs never split: fetching rates makes one history call and no split calls"""
+    provider = StubProvider()
+    table = fetch_fx_rates(MarketDataFetcher(provider, rate_per_second=None), ['USD', 'INR', 'SGD'],
+                           pd.Timestamp('2024-07-01'), pd.Timestamp('2025-06-30'))
+    assert provider.calls == 1
+    assert not np.isnan(table.lookup([pd.Timestamp('2025-01-02')], ['INR'])).any()
+
+
+def run(n_symbols, batch_size, latency, workers, rate):
+    provider = StubProvider(latency=latency)
+    fetcher = MarketDataFetcher(provider, max_workers=workers, rate_per_second=rate, batch_size=batch_size)
+    symbols = [f'SYM{i:04d}' for i in range(n_symbols)]
+    start = time.perf_counter()
+    fetcher.fetch_all(symbols, '2024-07-01', '2025-06-30')
+    return time.perf_counter() - start, provider.calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, nargs='+', default=[10, 100, 500])
+    parser.add_argument('--latency', type=float, default=0.1, help='seconds per provider call')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=20.0, help='provider calls per second')
+    parser.add_argument('--batch-size', type=int, default=50)
+    args = parser.parse_args()
+
+    check_failed_symbol_cold_cache()
+    check_fx_fetch_skips_splits()
+    print(f"{'symbols':>8} {'per_symbol_s':>13} {'calls':>6} {'batched_s':>10} {'calls':>6}")
+    for n in args.symbols:
+        single_s, single_calls = run(n, 1, args.latency, args.workers, args.rate)
+        batch_s, batch_calls = run(n, args.batch_size, args.latency, args.workers, args.rate)
+        print(f'{n:>8} {single_s:>13.2f} {single_calls:>6} {batch_s:>10.2f} {batch_calls:>6}')
+
+
+if __name__ == '__main__':
+    main()
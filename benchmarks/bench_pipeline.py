@@ -0,0 +1,236 @@
+"""Benchmark every PortfolioAnalyzer step in isolation and end to end, against a baseline
+
+Scenarios pair a synthetic broker export (the exact Stock_trading_*.csv
+layout) with offline price fixtures for its symbols:
+
+  1k     1,000 trades over 10 symbols
+  100k   100,000 trades over 500 symbols
+  10m    10,000,000 trades over 5,000 symbols (streamed in chunks; slow to generate)
+
+Fixtures are written once under --fixtures and reused. Each step is timed on
+its own: the analyzer state left by the previous steps is snapshotted and
+restored before every repeat, so only that step runs inside the timer. As
+with timeit, the best of the repeats is reported: it is the least disturbed
+by other load on the machine. End-to-end runs also report first_content,
+the time until holdings and trade counts exist: what a dashboard drawing
+stage by stage shows first. Market data comes from a
+LocalDirectoryProvider over the fixtures, so fetch steps measure reading and
+processing, not the network.
+
+Results are compared with --baseline. A step regresses when it is more than
+--threshold times its baseline time and slower by more than --min-seconds;
+any regression makes the exit status 1. --save-baseline records this run's
+times instead (baselines are only comparable on the machine that made them).
+
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --scenarios 1k 100k 10m --repeat 1
+    python benchmarks/bench_pipeline.py --save-baseline
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fx_rates import fx_ticker  # noqa: E402
+from market_data import LocalDirectoryProvider, MarketDataFetcher, SyntheticProvider  # noqa: E402
+from portfolio_analyzer import PortfolioAnalyzer  # noqa: E402
+from benchmarks.synthetic_data import symbol_names, write_broker_csv  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# name: (trades, symbols, load chunksize)
+SCENARIOS = {
+    '1k': (1_000, 10, None),
+    '100k': (100_000, 500, None),
+    '10m': (10_000_000, 5_000, 1_000_000),
+}
+
+STEPS = [
+    ('load_trades', lambda analyzer, files, chunksize: analyzer.load_trade_data(files, chunksize=chunksize)),
+    ('holdings', lambda analyzer, files, chunksize: analyzer.create_master_holdings_list()),
+    ('stock_splits', lambda analyzer, files, chunksize: analyzer.get_stock_splits()),
+    ('apply_splits', lambda analyzer, files, chunksize: analyzer.apply_stock_splits()),
+    ('currency_rates', lambda analyzer, files, chunksize: analyzer.get_currency_rates()),
+    ('transaction_prices', lambda analyzer, files, chunksize: analyzer.compute_transaction_prices_in_currencies()),
+    ('historical_prices', lambda analyzer, files, chunksize: analyzer.get_historical_prices()),
+    ('portfolio_values', lambda analyzer, files, chunksize: analyzer.compute_portfolio_values()),
+    ('xirr', lambda analyzer, files, chunksize: (analyzer.compute_xirr(), analyzer.compute_xirr_history())),
+]
+
+# Attributes the steps read and write
+STATE = ['trades_data', 'all_trades', 'holdings', 'stock_splits', 'historical_prices', 'currency_rates',
+         'portfolio_values', 'xirr_results', 'portfolio_xirr', 'market_data_end']
+
+
+def write_price_fixtures(directory, n_symbols, currencies=('SGD', 'INR')):
+    """Synthetic history and splits for every symbol, plus FX history since the trades began"""
+    provider = SyntheticProvider()
+    end = pd.Timestamp.now().normalize()
+    symbols = symbol_names(n_symbols)
+    histories = provider.get_history_batch(symbols, end - pd.DateOffset(days=400), end)
+    histories.update(provider.get_history_batch([fx_ticker(currency) for currency in currencies],
+                                                '2019-12-01', end))
+    splits = {symbol: provider.get_splits(symbol) for symbol in symbols}
+    LocalDirectoryProvider.save(directory, histories, splits, fmt='parquet')
+
+
+def prepare_fixtures(root, name, refresh=False):
+    n_trades, n_symbols, _ = SCENARIOS[name]
+    os.makedirs(root, exist_ok=True)
+    trades_path = os.path.join(root, f'trades_{name}.csv')
+    prices_dir = os.path.join(root, f'prices_{n_symbols}')
+    # Written under a temporary name first, so an interrupted run never leaves a partial fixture behind
+    if refresh or not os.path.exists(trades_path):
+        print(f"Writing {n_trades:,} trades to {trades_path}")
+        write_broker_csv(trades_path + '.tmp', n_trades, n_symbols=n_symbols, seed=0)
+        os.replace(trades_path + '.tmp', trades_path)
+    if refresh or not os.path.isdir(prices_dir):
+        print(f"Writing price fixtures for {n_symbols:,} symbols to {prices_dir}")
+        shutil.rmtree(prices_dir + '.tmp', ignore_errors=True)
+        write_price_fixtures(prices_dir + '.tmp', n_symbols)
+        shutil.rmtree(prices_dir, ignore_errors=True)
+        os.rename(prices_dir + '.tmp', prices_dir)
+    return [trades_path], prices_dir
+
+
+def new_analyzer(prices_dir):
+    fetcher = MarketDataFetcher(LocalDirectoryProvider(prices_dir), rate_per_second=None)
+    return PortfolioAnalyzer(fetcher=fetcher)
+
+
+def copied(value):
+    # Shallow frame copies: steps replace or add columns, which never reaches the
+    # original, and the 10m scenario has no memory to spare for deep copies
+    if isinstance(value, pd.DataFrame):
+        return value.copy(deep=False)
+    return value.copy() if isinstance(value, (dict, list)) else value
+
+
+def snapshot(analyzer):
+    """Copies of the analyzer's data, safe against the changes a step makes"""
+    return {key: copied(getattr(analyzer, key)) for key in STATE if hasattr(analyzer, key)}
+
+
+def restore(analyzer, state):
+    for key, value in state.items():
+        setattr(analyzer, key, copied(value))
+
+
+def quiet(func, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = func(*args)
+        return result, time.perf_counter() - start
+
+
+def run_scenario(name, files, prices_dir, repeat):
+    """Return {'steps': {step: best seconds}, 'end_to_end': best seconds, 'first_content': best seconds}"""
+    chunksize = SCENARIOS[name][2]
+    analyzer = new_analyzer(prices_dir)
+    steps = {}
+    for step, run in STEPS:
+        state = snapshot(analyzer)
+        times = []
+        for _ in range(repeat):
+            if step == 'load_trades':
+                analyzer = new_analyzer(prices_dir)
+            else:
+                restore(analyzer, state)
+            times.append(quiet(run, analyzer, files, chunksize)[1])
+        steps[step] = min(times)
+
+    end_to_end, first_content = [], []
+    for _ in range(repeat):
+        analyzer = new_analyzer(prices_dir)
+        success, seconds = quiet(analyzer.run_complete_analysis, files, chunksize)
+        if not success:
+            raise RuntimeError(f"Scenario {name} failed end to end")
+        end_to_end.append(seconds)
+        first_content.append(analyzer.run_report.finished_at('holdings'))
+    return {'steps': steps, 'end_to_end': min(end_to_end), 'first_content': min(first_content)}
+
+
+def machine_info():
+    return {
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+    }
+
+
+def compare(name, result, baseline, threshold, min_seconds):
+    """Print this scenario against its baseline; returns the regressed step names"""
+    reference = baseline.get('scenarios', {}).get(name)
+    totals = ['end_to_end', 'first_content']
+    rows = list(result['steps'].items()) + [(key, result[key]) for key in totals if key in result]
+    regressions = []
+    print(f"\n{name}: {SCENARIOS[name][0]:,} trades, {SCENARIOS[name][1]:,} symbols")
+    print(f"{'step':<20} {'seconds':>9} {'baseline':>9} {'ratio':>7}")
+    for step, seconds in rows:
+        before = None
+        if reference:
+            before = reference.get(step) if step in totals else reference['steps'].get(step)
+        if before is None:
+            print(f"{step:<20} {seconds:>9.3f} {'-':>9} {'-':>7}")
+            continue
+        ratio = seconds / before if before else float('inf')
+        flag = ''
+        if ratio > threshold and seconds - before > min_seconds:
+            flag = '  REGRESSION'
+            regressions.append(step)
+        print(f"{step:<20} {seconds:>9.3f} {before:>9.3f} {ratio:>6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=['1k', '100k'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--fixtures', default=os.path.join(HERE, 'fixtures'))
+    parser.add_argument('--refresh-fixtures', action='store_true')
+    parser.add_argument('--baseline', default=os.path.join(HERE, 'baseline.json'))
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--threshold', type=float, default=1.5)
+    parser.add_argument('--min-seconds', type=float, default=0.05)
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('machine', {}).get('platform') != platform.platform():
+            print(f"Note: baseline was recorded on {baseline.get('machine', {}).get('platform')}")
+
+    results, regressions = {}, []
+    for name in args.scenarios:
+        files, prices_dir = prepare_fixtures(args.fixtures, name, args.refresh_fixtures)
+        results[name] = run_scenario(name, files, prices_dir, args.repeat)
+        regressions += [f'{name}/{step}' for step in
+                        compare(name, results[name], baseline, args.threshold, args.min_seconds)]
+
+    if args.save_baseline:
+        baseline['machine'] = machine_info()
+        baseline.setdefault('scenarios', {}).update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+        print(f"\nSaved baseline for {', '.join(results)} to {args.baseline}")
+    elif regressions:
+        print(f"\nRegressions beyond {args.threshold}x: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Benchmark compute_portfolio_values from 10 to 2,000 symbols
+
+Compares the vectorized as-of join engine with the previous per-date
+``iterrows`` implementation on synthetic yfinance-shaped histories.
+
+    python benchmarks/bench_portfolio_values.py
+    python benchmarks/bench_portfolio_values.py --sizes 10 100 --days 504
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from portfolio_analyzer import BASE_CURRENCY_RATES  # noqa: E402
+from valuation import align_close_prices, compute_value_frame  # noqa: E402
+
+
+def make_histories(n_symbols, n_days, seed=0):
+    """Random-walk Close histories with staggered starts and missing days"""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end='2025-06-30', periods=n_days, tz='America/New_York')
+    histories = {}
+    for i in range(n_symbols):
+        start = rng.integers(0, n_days // 4)
+        keep = rng.random(n_days - start) > 0.02
+        index = dates[start:][keep]
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(index))))
+        histories[f'SYM{i:04d}'] = pd.DataFrame({'Close': close}, index=index)
+    holdings = pd.DataFrame({
+        'Symbol': list(histories.keys()),
+        'Quantity': rng.integers(1, 500, n_symbols).astype(float),
+    })
+    return histories, holdings
+
+
+def legacy_portfolio_values(historical_prices, holdings):
+    """Previous per-date implementation, kept as a correctness reference"""
+    all_dates = set()
+    for hist in historical_prices.values():
+        all_dates.update(hist.index.date)
+    all_dates = sorted(all_dates)
+
+    rows = []
+    for date in all_dates:
+        total_value_usd = 0
+        for _, holding in holdings.iterrows():
+            hist = historical_prices[holding['Symbol']]
+            available_dates = hist.index.date
+            if date in available_dates:
+                price = hist.loc[hist.index.date == date, 'Close'].iloc[0]
+            else:
+                before_dates = [d for d in available_dates if d < date]
+                if not before_dates:
+                    continue
+                price = hist.loc[hist.index.date == max(before_dates), 'Close'].iloc[0]
+            total_value_usd += holding['Quantity'] * price
+        rows.append({'Date': date, 'Value_USD': total_value_usd})
+    return pd.DataFrame(rows)
+
+
+def vectorized_portfolio_values(historical_prices, holdings):
+    quantities = holdings.groupby('Symbol')['Quantity'].sum()
+    prices = align_close_prices(historical_prices, quantities.index)
+    return compute_value_frame(prices, quantities, BASE_CURRENCY_RATES)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 100, 500, 1000, 2000])
+    parser.add_argument('--days', type=int, default=252)
+    parser.add_argument('--legacy-max', type=int, default=50,
+                        help='largest symbol count to also time the legacy loop on')
+    args = parser.parse_args()
+
+    print(f"{'symbols':>8} {'vectorized_s':>13} {'legacy_s':>10} {'speedup':>8}")
+    for n in args.sizes:
+        histories, holdings = make_histories(n, args.days)
+        fast, fast_s = timed(vectorized_portfolio_values, histories, holdings)
+
+        legacy_s = speedup = ''
+        if n <= args.legacy_max:
+            slow, slow_time = timed(legacy_portfolio_values, histories, holdings)
+            np.testing.assert_allclose(fast['Value_USD'], slow['Value_USD'], rtol=1e-9)
+            legacy_s = f'{slow_time:.3f}'
+            speedup = f'{slow_time / fast_s:.0f}x'
+
+        print(f'{n:>8} {fast_s:>13.4f} {legacy_s:>10} {speedup:>8}')
+
+
+if __name__ == '__main__':
+    main()
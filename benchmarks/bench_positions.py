@@ -0,0 +1,115 @@
+"""Benchmark rebuilding daily positions from trades and valuing them
+
+PositionTimeline.from_trades buckets the trades by the date they take
+effect and takes one cumulative sum; the reference pivots the trades to a
+date x symbol table with pandas, forward fills it over the price dates and
+multiplies the whole matrix. Two books are timed: an active one that trades
+on most days and a flat one that trades on a few dozen, which the timeline
+values one run of unchanged positions at a time.
+
+Each size up to --reference-max symbols is also checked against the
+reference, and every size's last-day positions against the net quantity
+per symbol.
+
+    python benchmarks/bench_positions.py
+    python benchmarks/bench_positions.py --sizes 100 1000 --years 2
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from positions import PositionTimeline  # noqa: E402
+
+# Book: number of distinct days with trades, None for (almost) every day
+BOOKS = {'active': None, 'flat': 40}
+
+
+def make_book(n_symbols, dates, trade_days=None, trades_per_symbol=20, seed=0):
+    """Random buys and sells, with a few trades before the first date and some on non-trading days"""
+    rng = np.random.default_rng(seed)
+    n = n_symbols * trades_per_symbol
+    days = pd.date_range(dates[0] - pd.Timedelta(days=90), dates[-1], freq='D')
+    if trade_days is not None:
+        days = pd.DatetimeIndex(rng.choice(days, trade_days, replace=False))
+    when = rng.choice(days, n) + pd.to_timedelta(rng.integers(9 * 3600, 16 * 3600, n), unit='s')
+    symbols = pd.Categorical.from_codes(rng.integers(0, n_symbols, n),
+                                        [f'SYM{i:04d}' for i in range(n_symbols)])
+    quantity = rng.integers(1, 200, n) * np.where(rng.random(n) < 0.3, -1.0, 1.0)
+    return pd.DataFrame({'Symbol': symbols, 'Date/Time': when, 'Quantity': quantity})
+
+
+def make_prices(n_symbols, dates, seed=0):
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(0, 0.01, (len(dates), n_symbols))
+    return 100 * np.exp(np.cumsum(steps, axis=0))
+
+
+def reference_positions(trades, dates, symbols):
+    """Daily positions with pandas: net per trade date, cumulate, as-of onto ``dates``"""
+    frame = trades.assign(Day=trades['Date/Time'].dt.normalize(), Symbol=trades['Symbol'].astype(str))
+    daily = frame.pivot_table(index='Day', columns='Symbol', values='Quantity', aggfunc='sum')
+    held = daily.reindex(columns=symbols, fill_value=0).fillna(0).cumsum()
+    held = held.reindex(held.index.union(dates)).ffill().fillna(0)
+    # Trades on a day with no price date count from the next one
+    return held.reindex(dates).to_numpy()
+
+
+def timeline_values(trades, dates, symbols, prices, weights):
+    positions = PositionTimeline.from_trades(trades, dates, symbols)
+    return positions, positions.weighted_sum(prices, weights)
+
+
+def reference_values(trades, dates, symbols, prices, weights):
+    return (prices * reference_positions(trades, dates, symbols)) @ weights
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--reference-max', type=int, default=1000,
+                        help='largest symbol count to also time the pandas reference on')
+    args = parser.parse_args()
+
+    dates = pd.bdate_range(end='2025-06-30', periods=252 * args.years)
+    print(f"{args.years} years, {len(dates)} dates")
+    print(f"{'book':<7} {'symbols':>8} {'blocks':>7} {'timeline_s':>11} {'reference_s':>12} {'speedup':>8}")
+    for book, trade_days in BOOKS.items():
+        for n in args.sizes:
+            symbols = [f'SYM{i:04d}' for i in range(n)]
+            trades = make_book(n, dates, trade_days)
+            prices = make_prices(n, dates)
+            # One column per quote currency, as compute_value_frame passes them
+            weights = np.zeros((n, 3))
+            weights[np.arange(n), np.arange(n) % 3] = 1.0
+
+            (positions, values), fast_s = timed(timeline_values, trades, dates, symbols, prices, weights)
+            net = trades.groupby('Symbol', observed=True)['Quantity'].sum()
+            net.index = net.index.astype(str)
+            np.testing.assert_allclose(positions.final().reindex(net.index), net, atol=1e-9)
+
+            reference_s = speedup = ''
+            if n <= args.reference_max:
+                expected, slow_s = timed(reference_values, trades, dates, symbols, prices, weights)
+                np.testing.assert_allclose(positions.dense(), reference_positions(trades, dates, symbols), atol=1e-9)
+                np.testing.assert_allclose(values, expected, rtol=1e-9)
+                reference_s = f'{slow_s:.3f}'
+                speedup = f'{slow_s / fast_s:.1f}x'
+
+            print(f'{book:<7} {n:>8} {len(positions.starts):>7} {fast_s:>11.3f} {reference_s:>12} {speedup:>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""Benchmark risk analytics: a full recompute per new day vs incremental updates
+
+A synthetic ten-year valuation with deposits and withdrawals is fed to
+RiskAnalytics in one update, then again one day at a time, as a dashboard
+refreshing daily would. Both must agree with a pandas reference
+(pct_change net of flows, cumprod, cummax, rolling std). A small book
+valued from its trades checks the flows: buying more at the day's close
+leaves the time-weighted return equal to the price return.
+
+    python benchmarks/bench_risk.py
+    python benchmarks/bench_risk.py --years 30 --days 250
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from positions import PositionTimeline  # noqa: E402
+from risk import RiskAnalytics, TRADING_DAYS  # noqa: E402
+from valuation import compute_flow_frame, compute_value_frame  # noqa: E402
+
+
+def make_valuation(n_days, seed=0):
+    """Daily values driven by a random return series plus occasional deposits and withdrawals"""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end='2025-06-30', periods=n_days)
+    returns = rng.normal(0.0004, 0.01, n_days)
+    flows = np.where(rng.random(n_days) < 0.05, rng.normal(2_000, 5_000, n_days), 0.0)
+    flows[0] = 100_000
+    values = np.empty(n_days)
+    values[0] = flows[0]
+    for day in range(1, n_days):
+        values[day] = values[day - 1] * (1 + returns[day]) + flows[day]
+    benchmark = pd.DataFrame({'Close': 100 * np.cumprod(1 + 0.5 * returns + rng.normal(0, 0.005, n_days))},
+                             index=dates.tz_localize('America/New_York'))
+    return dates, values, flows, returns, benchmark
+
+
+def reference(values, flows, window):
+    """Returns, TWR, drawdown and rolling volatility with pandas, values net of each day's flow"""
+    values, flows = pd.Series(values), pd.Series(flows)
+    returns = (values - flows) / values.shift(1) - 1
+    wealth = (1 + returns.fillna(0)).cumprod()
+    drawdown = wealth / wealth.cummax() - 1
+    volatility = returns.rolling(window).std() * np.sqrt(TRADING_DAYS)
+    return returns, wealth - 1, drawdown, volatility
+
+
+def full_update(dates, values, flows, benchmark):
+    return RiskAnalytics().update(dates, values, flows, benchmark)
+
+
+def daily_updates(dates, values, flows, benchmark, start):
+    risk = RiskAnalytics().update(dates[:start], values[:start], flows[:start], benchmark)
+    seconds = []
+    for day in range(start, len(dates)):
+        began = time.perf_counter()
+        risk.update(dates[day:day + 1], values[day:day + 1], flows[day:day + 1], benchmark)
+        seconds.append(time.perf_counter() - began)
+    return risk, seconds
+
+
+def check_flows():
+    """Adding to a position at the close leaves the time-weighted return at the price return"""
+    dates = pd.bdate_range('2025-01-01', periods=200)
+    close = 50 * np.exp(np.cumsum(np.random.default_rng(1).normal(0, 0.02, len(dates))))
+    prices = pd.DataFrame({'ABC': close}, index=dates)
+    trades = pd.DataFrame({
+        'Symbol': ['ABC', 'ABC', 'ABC'],
+        'Currency': ['USD', 'USD', 'USD'],
+        'Date/Time': [dates[0] + pd.Timedelta(hours=10), dates[80] + pd.Timedelta(hours=15),
+                      dates[150] + pd.Timedelta(hours=11)],
+        'Quantity': [100.0, 50.0, -120.0],
+        'T. Price': [close[0], close[80], close[150]],
+    })
+    rates = {'USD': 1.0}
+    positions = PositionTimeline.from_trades(trades, dates, prices.columns)
+    values = compute_value_frame(prices, positions, rates)['Value_USD']
+    # The opening trade is on the first date: the first value is its cost, not a flow
+    flows = compute_flow_frame(trades, dates, prices.columns, rates)['Flow_USD']
+    assert np.isclose(flows.iloc[0], 100 * close[0]) and np.isclose(flows.iloc[150], -120 * close[150])
+    risk = RiskAnalytics().update(dates, values, flows)
+    np.testing.assert_allclose(risk.summary()['twr'], close[-1] / close[0] - 1, rtol=1e-9)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--days', type=int, default=100, help='days appended one at a time')
+    args = parser.parse_args()
+
+    check_flows()
+    n_days = TRADING_DAYS * args.years
+    dates, values, flows, returns, benchmark = make_valuation(n_days)
+    start = n_days - args.days
+
+    full, full_s = None, []
+    for _ in range(5):
+        began = time.perf_counter()
+        full = full_update(dates, values, flows, benchmark)
+        full_s.append(time.perf_counter() - began)
+    incremental, day_s = daily_updates(dates, values, flows, benchmark, start)
+
+    expected = reference(values, flows, full.window)
+    for risk in (full, incremental):
+        for column, series in zip(['Return', 'TWR', 'Drawdown', 'Volatility'], expected):
+            np.testing.assert_allclose(risk.daily[column].to_numpy(dtype=float), series.to_numpy(), rtol=1e-7,
+                                       atol=1e-12, err_msg=column)
+    np.testing.assert_allclose(full.daily['Return'].iloc[1:], returns[1:], rtol=1e-7)
+    for key, value in full.summary().items():
+        np.testing.assert_allclose(incremental.summary()[key], value, rtol=1e-7, err_msg=key)
+
+    daily = pd.Series(expected[0]).dropna()
+    benchmark_returns = full.daily['Benchmark_Return'].astype(float)
+    both = daily.index.intersection(benchmark_returns.dropna().index)
+    beta = daily[both].cov(benchmark_returns[both]) / benchmark_returns[both].var()
+    summary = full.summary()
+    np.testing.assert_allclose(summary['beta'], beta, rtol=1e-7)
+    np.testing.assert_allclose(summary['max_drawdown'], expected[2].min(), rtol=1e-9)
+    np.testing.assert_allclose(summary['sharpe'], daily.mean() / daily.std() * np.sqrt(TRADING_DAYS), rtol=1e-7)
+
+    print(f"{n_days} days: full update {min(full_s) * 1e3:.2f} ms, "
+          f"incremental {np.median(day_s) * 1e3:.3f} ms per appended day (median of {len(day_s)})")
+    print(f"TWR {summary['twr']:.2%}, volatility {summary['volatility']:.2%}, "
+          f"max drawdown {summary['max_drawdown']:.2%}, Sharpe {summary['sharpe']:.2f}, "
+          f"Sortino {summary['sortino']:.2f}, beta {summary['beta']:.2f}")
+    print("Full and incremental updates match the pandas reference")
+
+
+if __name__ == '__main__':
+    main()
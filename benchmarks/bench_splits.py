@@ -0,0 +1,115 @@
+"""Benchmark split adjustment: per-split masked loop vs one merge-as-of pass
+
+Before timing, checks the vectorized engine against hand-computed factors
+(several splits per symbol, reverse splits, trades on a split day,
+tz-aware split dates) and against the reference loop on random data.
+
+    python benchmarks/bench_splits.py
+    python benchmarks/bench_splits.py --trades 1000000 --symbols 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from splits import adjust_for_splits, split_factors  # noqa: E402
+
+
+def reference_adjust(trades, stock_splits):
+    """Loop over every split, adjusting that symbol's earlier trades with masked assignments"""
+    adjusted = trades.copy()
+    for symbol, splits in stock_splits.items():
+        for split_date, split_ratio in splits.items():
+            split_date = pd.Timestamp(split_date)
+            if split_date.tz is not None:
+                split_date = split_date.tz_localize(None)
+            mask = (adjusted['Symbol'] == symbol) & (adjusted['Date/Time'] < split_date.normalize())
+            adjusted.loc[mask, 'Quantity'] *= split_ratio
+            adjusted.loc[mask, 'T. Price'] /= split_ratio
+            adjusted.loc[mask, 'C. Price'] /= split_ratio
+    return adjusted
+
+
+def check_cases():
+    trades = pd.DataFrame({
+        'Symbol': pd.Categorical(['A', 'A', 'A', 'A', 'B', 'B', 'C']),
+        'Date/Time': pd.to_datetime(['2024-01-05 10:00', '2024-03-01 10:00', '2024-06-01 09:30',
+                                     '2024-07-01 10:00', '2024-02-01 10:00', '2024-05-01 10:00',
+                                     '2024-02-01 10:00']),
+        'Quantity': [10.0, 10.0, 10.0, 10.0, 100.0, 100.0, 5.0],
+        'T. Price': [60.0, 30.0, 10.0, 10.0, 1.0, 10.0, 50.0],
+        'C. Price': np.float32([60.0, 30.0, 10.0, 10.0, 1.0, 10.0, 50.0]),
+        'Proceeds': [-600.0, -300.0, -100.0, -100.0, -100.0, -1000.0, -250.0],
+    })
+    ny = 'America/New_York'
+    stock_splits = {
+        # 2:1 then 3:1, dated at exchange midnight like Yahoo Finance
+        'A': pd.Series([2.0, 3.0], index=pd.DatetimeIndex(['2024-01-10', '2024-06-01']).tz_localize(ny)),
+        # 1:10 reverse split
+        'B': pd.Series([0.1], index=pd.DatetimeIndex(['2024-03-15'])),
+        'C': pd.Series(dtype=float),
+        'D': pd.Series([4.0], index=pd.DatetimeIndex(['2024-01-01'])),
+    }
+    expected = np.array([6.0, 3.0, 1.0, 1.0, 0.1, 1.0, 1.0])
+    factors = split_factors(trades, stock_splits)
+    assert np.allclose(factors, expected), factors
+
+    adjusted = adjust_for_splits(trades, factors)
+    assert np.allclose(adjusted['Quantity'], trades['Quantity'] * expected)
+    assert np.allclose(adjusted['T. Price'], trades['T. Price'] / expected)
+    assert (adjusted['Proceeds'] == trades['Proceeds']).all()
+    pd.testing.assert_frame_equal(adjusted, reference_adjust(trades, stock_splits))
+
+
+def make_case(n_trades, n_symbols, seed=0):
+    rng = np.random.default_rng(seed)
+    symbols = np.array([f'S{i:04d}' for i in range(n_symbols)])
+    seconds = rng.integers(pd.Timestamp('2018-01-01').value // 10**9, pd.Timestamp('2025-06-30').value // 10**9,
+                           n_trades)
+    trades = pd.DataFrame({
+        'Symbol': pd.Categorical(symbols[rng.integers(0, n_symbols, n_trades)]),
+        'Date/Time': pd.to_datetime(np.sort(seconds), unit='s'),
+        'Quantity': rng.integers(1, 500, n_trades).astype(float),
+        'T. Price': rng.uniform(5, 500, n_trades),
+        'C. Price': rng.uniform(5, 500, n_trades).astype(np.float32),
+        'Proceeds': -rng.uniform(100, 10_000, n_trades),
+    })
+    # A fifth of the symbols split one to three times, some in reverse
+    stock_splits = {}
+    for symbol in symbols:
+        count = rng.integers(1, 4) if rng.random() < 0.2 else 0
+        days = pd.to_datetime(np.sort(rng.integers(0, 2700, count)), unit='D', origin='2018-01-01')
+        stock_splits[symbol] = pd.Series(rng.choice([2.0, 3.0, 4.0, 10.0, 0.1, 0.2], count), index=days)
+    return trades, stock_splits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trades', type=int, default=200_000)
+    parser.add_argument('--symbols', type=int, default=1000)
+    args = parser.parse_args()
+
+    check_cases()
+    trades, stock_splits = make_case(args.trades, args.symbols)
+    n_splits = sum(len(splits) for splits in stock_splits.values())
+
+    start = time.perf_counter()
+    reference = reference_adjust(trades, stock_splits)
+    loop_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    adjusted = adjust_for_splits(trades, split_factors(trades, stock_splits))
+    vector_s = time.perf_counter() - start
+
+    pd.testing.assert_frame_equal(adjusted, reference, rtol=1e-6)
+    print(f"{args.trades} trades, {args.symbols} symbols, {n_splits} splits: all checks passed")
+    print(f"loop {loop_s:.2f}s  vectorized {vector_s:.3f}s  ({loop_s / vector_s:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Memory report for the typed trade table on a large synthetic broker export
+
+Writes a synthetic export in the Stock_trading_*.csv format, then loads it
+three ways and reports load time, peak allocation while loading (a second,
+tracemalloc-traced load, which sees numpy/pandas buffers) and the size of the
+resulting frame:
+
+  legacy     whole-file read keeping every broker column plus a Python date
+             column (the previous load_trade_data behaviour)
+  typed      whole-file read normalized to the typed trade table
+  streaming  chunked read straight into the typed trade table
+
+    python benchmarks/bench_trade_memory.py --trades 1000000
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from trade_store import clean_trades, memory_report, normalize_trades, stream_trades  # noqa: E402
+from benchmarks.synthetic_data import write_broker_csv  # noqa: E402
+
+
+def load_legacy(path, chunksize):
+    df = clean_trades(pd.read_csv(path))
+    df['Date'] = df['Date/Time'].dt.date
+    return df.sort_values('Date/Time')
+
+
+def load_typed(path, chunksize):
+    return normalize_trades(clean_trades(pd.read_csv(path)))
+
+
+def load_streaming(path, chunksize):
+    return stream_trades([path], chunksize)
+
+
+LOADERS = {'legacy': load_legacy, 'typed': load_typed, 'streaming': load_streaming}
+
+
+def measure(loader, path, chunksize):
+    # Time an untraced load; tracing slows Python-level parsing several-fold
+    gc.collect()
+    start = time.perf_counter()
+    df = loader(path, chunksize)
+    seconds = time.perf_counter() - start
+    del df
+
+    gc.collect()
+    tracemalloc.start()
+    df = loader(path, chunksize)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return df, seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trades', type=int, default=1_000_000)
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--chunksize', type=int, default=200_000)
+    parser.add_argument('--csv', help='existing export to load instead of generating one')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.csv or write_broker_csv(os.path.join(tmp, 'Stock_trading_synthetic.csv'),
+                                            args.trades, args.symbols)
+        print(f"Export: {path} ({os.path.getsize(path) / 2**20:.1f} MB)\n")
+
+        print(f"{'mode':>10} {'rows':>10} {'seconds':>8} {'peak_mb':>8} {'frame_mb':>9}")
+        frames = {}
+        for mode, loader in LOADERS.items():
+            df, seconds, peak = measure(loader, path, args.chunksize)
+            frame_mb = df.memory_usage(deep=True).sum() / 2**20
+            print(f'{mode:>10} {len(df):>10} {seconds:>8.2f} {peak / 2**20:>8.1f} {frame_mb:>9.1f}')
+            if mode != 'streaming':
+                frames[mode] = df
+            del df
+
+    report = memory_report(frames) / 2**20
+    report['reduction'] = 1 - report['typed'] / report['legacy']
+    print('\nMemory by column (MB):')
+    print(report.round(2).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Benchmark vectorized XIRR against the scalar reference solver
+
+Each symbol gets a random run of buys and smaller sells over five years,
+closed by its current value, like the cash flows compute_xirr builds.
+
+    python benchmarks/bench_xirr.py
+    python benchmarks/bench_xirr.py --symbols 1000 10000 --flows 40
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from xirr import DAYS_PER_YEAR, group_xirr, xirr_scalar  # noqa: E402
+
+
+def make_flows(n_symbols, max_flows, seed=0):
+    rng = np.random.default_rng(seed)
+    counts = rng.integers(1, max_flows, n_symbols)
+    keys = np.repeat(np.arange(n_symbols), counts)
+    days = rng.integers(0, 5 * 365, len(keys))
+    amounts = -rng.uniform(100, 10_000, len(keys))
+    sells = rng.random(len(keys)) < 0.25
+    amounts[sells] = -amounts[sells] * rng.uniform(0.2, 0.8, sells.sum())
+
+    # Close every series with a current value between -50% and +150% of net invested
+    invested = np.bincount(keys, weights=np.maximum(-amounts, 0), minlength=n_symbols)
+    final = invested * rng.uniform(0.5, 2.5, n_symbols)
+    keys = np.concatenate([keys, np.arange(n_symbols)])
+    days = np.concatenate([days, np.full(n_symbols, 5 * 365)])
+    amounts = np.concatenate([amounts, final])
+    dates = pd.Timestamp('2020-01-01') + pd.to_timedelta(days, unit='D')
+    return keys, dates, amounts
+
+
+def run_scalar(keys, dates, amounts):
+    frame = pd.DataFrame({'key': keys, 'years': (dates - dates.min()).days / DAYS_PER_YEAR, 'amount': amounts})
+    return pd.Series({key: xirr_scalar(group['years'].tolist(), group['amount'].tolist())
+                      for key, group in frame.groupby('key')})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--flows', type=int, default=30, help='maximum trades per symbol')
+    args = parser.parse_args()
+
+    print(f"{'symbols':>8} {'flows':>8} {'scalar_s':>9} {'vector_s':>9} {'speedup':>8} {'max_diff':>9}")
+    for n in args.symbols:
+        keys, dates, amounts = make_flows(n, args.flows)
+
+        start = time.perf_counter()
+        reference = run_scalar(keys, dates, amounts)
+        scalar_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        rates = group_xirr(keys, dates, amounts)
+        vector_s = time.perf_counter() - start
+
+        diff = np.nanmax(np.abs(rates.reindex(reference.index) - reference))
+        print(f'{n:>8} {len(amounts):>8} {scalar_s:>9.2f} {vector_s:>9.3f} {scalar_s / vector_s:>7.0f}x {diff:>9.1e}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""Benchmark rolling and since-inception XIRR time series
+
+A synthetic book trades a few symbols over ten years of daily valuations;
+the whole book is one more series, with every symbol's trades.
+windowed_xirr solves every window ending on every date, once cold (every
+window from the same fixed guess, the default) and once warm started
+(windows ending between two anchor dates start Newton from the nearest
+anchor's rate).
+The cold rates are checked against the scalar reference solver, run
+independently for a sample of windows; the warm ones must match them or,
+for flows with several rates, be another root. Both are timed against a
+single solve of the longest window.
+
+    python benchmarks/bench_xirr_history.py
+    python benchmarks/bench_xirr_history.py --years 20 --symbols 50
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from performance import WINDOWS, day_numbers, window_starts  # noqa: E402
+from xirr import DAYS_PER_YEAR, windowed_xirr, xirr_scalar, xnpv  # noqa: E402
+
+
+def make_book(n_symbols, n_days, trades_per_year=12, seed=0):
+    """Daily values of random-walk positions and the trades that built them"""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end='2025-06-30', periods=n_days)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, (n_days, n_symbols)), axis=0))
+
+    n_trades = int(trades_per_year * n_days / 252) * n_symbols
+    rows = np.sort(rng.integers(0, n_days, n_trades))
+    codes = rng.integers(0, n_symbols, n_trades)
+    quantity = rng.integers(1, 100, n_trades) * np.where(rng.random(n_trades) < 0.25, -0.5, 1.0)
+    units = np.zeros((n_days, n_symbols))
+    np.add.at(units, (rows, codes), quantity)
+    units = np.cumsum(units, axis=0)
+    values = units * prices
+    # Cash received: buys negative, sells positive
+    amounts = -quantity * prices[rows, codes]
+    # Last column: the whole book, which has every symbol's trades
+    values = np.column_stack([values, values.sum(axis=1)])
+    codes = np.concatenate([codes, np.full(n_trades, n_symbols)])
+    return dates, values, codes, np.tile(rows, 2), np.tile(amounts, 2)
+
+
+def window_flows(codes, days, amounts, dates, values, starts, end, series):
+    """(years, amounts) of one series' window ending on ``end``, None if it has no XIRR"""
+    mine = codes == series
+    if starts is None:
+        inside = mine & (days <= dates[end])
+        flow_days, flow_amounts = list(days[inside]), list(amounts[inside])
+    elif starts[end] < 0:
+        return None
+    else:
+        start = starts[end]
+        inside = mine & (days > dates[start]) & (days <= dates[end])
+        flow_days = [dates[start]] + list(days[inside])
+        flow_amounts = [-values[start, series]] + list(amounts[inside])
+    flow_days.append(dates[end])
+    flow_amounts.append(values[end, series])
+    keep = [i for i, amount in enumerate(flow_amounts) if amount != 0]
+    if not keep:
+        return None
+    return [flow_days[i] / DAYS_PER_YEAR for i in keep], [flow_amounts[i] for i in keep]
+
+
+def reference(*window):
+    """The same window for one series with the scalar solver"""
+    flows = window_flows(*window)
+    return np.nan if flows is None else xirr_scalar(*flows)
+
+
+def is_root(rate, *window):
+    years, amounts = window_flows(*window)
+    npv = xnpv(np.array([rate]), np.array([amounts]), np.array([years]) - min(years))[0]
+    return abs(npv) <= 1e-6 * max(abs(amount) for amount in amounts)
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def best_of(repeat, func, *args, **kwargs):
+    runs = [timed(func, *args, **kwargs) for _ in range(repeat)]
+    return runs[0][0], min(seconds for _, seconds in runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--symbols', type=int, default=10)
+    parser.add_argument('--sample', type=int, default=200, help='windows checked with the scalar solver')
+    args = parser.parse_args()
+
+    dates, values, codes, rows, amounts = make_book(args.symbols, 252 * args.years)
+    days = day_numbers(dates)
+    trade_days = days[rows]
+    rng = np.random.default_rng(1)
+
+    n_series = values.shape[1]
+    print(f"{len(dates)} dates x {n_series} series, {len(amounts) // 2} trades")
+    print(f"{'window':<10} {'cold_s':>8} {'warm_s':>8} {'one_solve_s':>12} {'cold/one':>9} {'scalar_est_s':>13} {'other_root':>10}")
+    for window, offset in WINDOWS.items():
+        starts = None if offset is None else window_starts(dates, offset)
+        warm, warm_s = best_of(3, windowed_xirr, codes, trade_days, amounts, days, values, starts, warm=True)
+        cold, cold_s = best_of(3, windowed_xirr, codes, trade_days, amounts, days, values, starts)
+        # Flows that change sign more than once can have several rates; a warm start
+        # may settle on another one than the cold start, but it must be a root too
+        differ = ~np.isclose(warm, cold, rtol=1e-6, atol=1e-9, equal_nan=True)
+        for end, series in zip(*np.nonzero(differ)):
+            window_args = (codes, trade_days, amounts, days, values, starts, end, series)
+            assert is_root(warm[end, series], *window_args) and is_root(cold[end, series], *window_args), \
+                (window, end, series, warm[end, series], cold[end, series])
+
+        # One solve: the longest window of one symbol, ending on the last date
+        last = len(dates) - 1
+        one_s = best_of(5, windowed_xirr, codes[codes == 0], trade_days[codes == 0], amounts[codes == 0],
+                        days[last:], values[last:, :1], None if starts is None else np.zeros(1, dtype=np.int64))[1]
+
+        sample = [(rng.integers(0, len(dates)), rng.integers(0, n_series)) for _ in range(args.sample)]
+        scalar_s = 0.0
+        for end, series in sample:
+            expected, seconds = timed(reference, codes, trade_days, amounts, days, values, starts, end, series)
+            scalar_s += seconds
+            got = cold[end, series]
+            if np.isnan(expected):
+                continue
+            assert np.isclose(got, expected, rtol=1e-6, atol=1e-8), (window, end, series, got, expected)
+        scalar_estimate = scalar_s / len(sample) * warm.size
+
+        print(f"{window:<10} {cold_s:>8.3f} {warm_s:>8.3f} {one_s:>12.4f} {cold_s / one_s:>8.0f}x "
+              f"{scalar_estimate:>13.1f} {differ.sum():>10}")
+    print("Cold windowed XIRR matches the scalar solver; warm starts agree except on other roots")
+
+
+if __name__ == '__main__':
+    main()
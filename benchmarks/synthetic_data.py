@@ -0,0 +1,79 @@
+"""Synthetic broker exports in the exact Stock_trading_*.csv format"""
+import numpy as np
+import pandas as pd
+
+BROKER_COLUMNS = ['Trades', 'Header', 'DataDiscriminator', 'Asset Category', 'Currency', 'Symbol',
+                  'Date/Time', 'Quantity', 'T. Price', 'C. Price', 'Proceeds', 'Comm/Fee', 'Basis',
+                  'Realized P/L', 'MTM P/L', 'Code']
+
+
+def symbol_names(n_symbols):
+    return [f'S{i:04d}' for i in range(n_symbols)]
+
+
+def broker_chunk(rng, n_rows, symbols, base_prices, currencies, start, end):
+    """One block of order rows plus a few SubTotal/blank rows the loader must skip"""
+    picks = rng.integers(0, len(symbols), n_rows)
+    seconds = rng.integers(pd.Timestamp(start).value // 10**9, pd.Timestamp(end).value // 10**9, n_rows)
+    stamps = pd.to_datetime(seconds, unit='s').strftime('%Y-%m-%d, %H:%M:%S')
+
+    # Mostly buys; sells are smaller so positions stay long
+    quantity = rng.choice([1, 5, 10, 20, 50, 100, 500, 1000, 1500], n_rows).astype(float)
+    sells = rng.random(n_rows) < 0.3
+    quantity[sells] = -np.maximum(1, np.floor(quantity[sells] / 2))
+
+    price = np.round(base_prices[picks] * np.exp(rng.normal(0, 0.2, n_rows)), 4)
+    close = np.round(price * (1 + rng.normal(0, 0.005, n_rows)), 2)
+    proceeds = np.round(-quantity * price, 2)
+    fee = -np.round(1.0 + np.abs(proceeds) * 0.00005, 6)
+    basis = np.where(sells, np.round(quantity * price * 0.9, 4), np.round(-proceeds - fee, 4))
+    realized = np.where(sells, np.round(proceeds + basis + fee, 4), 0.0)
+
+    # Quantities of 1,000 and above carry a thousands separator, as in real exports
+    quantity_text = np.where(np.abs(quantity) >= 1000,
+                             pd.Series(quantity).map('{:,.0f}'.format),
+                             pd.Series(quantity).map('{:.0f}'.format))
+
+    frame = pd.DataFrame({
+        'Trades': 'Trades',
+        'Header': 'Data',
+        'DataDiscriminator': 'Order',
+        'Asset Category': 'Stocks',
+        'Currency': currencies[picks],
+        'Symbol': np.asarray(symbols)[picks],
+        'Date/Time': stamps,
+        'Quantity': quantity_text,
+        'T. Price': price,
+        'C. Price': close,
+        'Proceeds': proceeds,
+        'Comm/Fee': fee,
+        'Basis': basis,
+        'Realized P/L': realized,
+        'MTM P/L': np.round((close - price) * quantity, 2),
+        'Code': np.where(sells, 'C', 'O'),
+    }, columns=BROKER_COLUMNS)
+
+    # Every ~1,000 rows add a SubTotal row and a blank line
+    extra = max(1, n_rows // 1000)
+    subtotal = frame.sample(extra, random_state=int(rng.integers(1 << 31))).assign(DataDiscriminator='SubTotal')
+    blank = pd.DataFrame('', index=range(extra), columns=BROKER_COLUMNS)
+    return pd.concat([frame, subtotal, blank], ignore_index=True)
+
+
+def write_broker_csv(path, n_trades, n_symbols=100, start='2020-01-01', end='2025-06-30',
+                     sgd_share=0.02, seed=0, chunk_rows=500_000):
+    """Write a broker export with ``n_trades`` order rows, generated in bounded-memory chunks"""
+    rng = np.random.default_rng(seed)
+    symbols = symbol_names(n_symbols)
+    base_prices = rng.uniform(5, 800, n_symbols)
+    currencies = np.where(rng.random(n_symbols) < sgd_share, 'SGD', 'USD')
+
+    written = 0
+    with open(path, 'w', newline='') as handle:
+        handle.write(','.join(BROKER_COLUMNS) + '\n')
+        while written < n_trades:
+            rows = min(chunk_rows, n_trades - written)
+            chunk = broker_chunk(rng, rows, symbols, base_prices, currencies, start, end)
+            chunk.to_csv(handle, header=False, index=False)
+            written += rows
+    return path
@@ -0,0 +1,58 @@
+"""Commissions and fees of the typed trade table
+
+Broker exports charge fees as negative Comm/Fee amounts in the trade
+currency. A buy costs its price plus fees and a sell brings in its proceeds
+less fees, so every cash flow the analysis builds from trades (XIRR flows,
+the valuation's daily flows, lot cost basis) goes through these helpers
+rather than reading Proceeds or Quantity x T. Price alone.
+
+Fee drag is the fees paid as a share of the value traded, summed per symbol
+or per period from per-trade arrays.
+"""
+import numpy as np
+import pandas as pd
+
+
+def trade_fees(trades):
+    """Fees each trade paid, as a positive amount in its currency; 0 where none are recorded"""
+    if 'Comm/Fee' not in trades.columns:
+        return np.zeros(len(trades))
+    return -np.nan_to_num(trades['Comm/Fee'].to_numpy(dtype=float), nan=0.0)
+
+
+def fees_per_unit(trades):
+    """Each trade's fees spread over its units"""
+    quantities = np.abs(trades['Quantity'].to_numpy(dtype=float))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(quantities > 0, trade_fees(trades) / quantities, 0.0)
+
+
+def trade_costs(trades):
+    """Cash each trade puts into its position: Quantity x T. Price plus fees (sells are negative)"""
+    return trades['Quantity'].to_numpy(dtype=float) * trades['T. Price'].to_numpy(dtype=float) + trade_fees(trades)
+
+
+def cash_received(trades):
+    """Cash each trade brings in: its Proceeds less fees (buys are negative)"""
+    return trades['Proceeds'].to_numpy(dtype=float) - trade_fees(trades)
+
+
+def fee_drag(keys, fees, traded, name):
+    """Fees and value traded per key, and the fees as a share of the value traded
+
+    ``keys`` labels each trade (its symbol, its month, ...); ``fees`` and
+    ``traded`` are each trade's fees and gross value in one currency.
+    Returns a frame indexed by the sorted keys, named ``name``, with Trades,
+    Fees, Traded and Fee_Drag (NaN where nothing was traded).
+    """
+    codes, labels = pd.factorize(keys, sort=True)
+    fees = np.bincount(codes, weights=fees, minlength=len(labels))
+    traded = np.bincount(codes, weights=traded, minlength=len(labels))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drag = np.where(traded > 0, fees / traded, np.nan)
+    return pd.DataFrame({
+        'Trades': np.bincount(codes, minlength=len(labels)),
+        'Fees': fees,
+        'Traded': traded,
+        'Fee_Drag': drag,
+    }, index=pd.Index(np.asarray(labels), name=name))
@@ -0,0 +1,176 @@
+"""Historical FX rates as one date x currency array with vectorized as-of lookup"""
+import numpy as np
+import pandas as pd
+
+from valuation import close_arrays
+
+
+def fx_ticker(currency):
+    """Market data symbol of the USD/<currency> rate, as Yahoo Finance names it"""
+    return f'{currency}=X'
+
+
+class FXRateTable:
+    """Daily rates of several currencies against USD
+
+    ``rates[i, j]`` holds units of ``currencies[j]`` per USD on ``dates[i]``
+    (USD itself is 1.0), so converting between any two currencies is a ratio
+    of two columns. Lookups are as-of: a date takes the latest row on or
+    before it, and dates before the first row take the first row.
+    """
+
+    def __init__(self, dates, currencies, rates):
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        rates = np.asarray(rates, dtype=float).reshape(len(dates), len(currencies))
+        order = np.argsort(dates, kind='stable')
+        self.dates = dates[order]
+        self.currencies = list(currencies)
+        self.rates = rates[order]
+        self._columns = {currency: j for j, currency in enumerate(self.currencies)}
+
+    @classmethod
+    def constant(cls, rates):
+        """A single-row table: the same ``{currency: units per USD}`` on every date"""
+        rates = dict(rates, USD=1.0)
+        return cls([np.datetime64('1970-01-01')], list(rates), [list(rates.values())])
+
+    @classmethod
+    def from_series(cls, series, fallback=None):
+        """Build from ``{currency: (dates, rates)}``; currencies without data use ``fallback``
+
+        Rows are the union of all dates. A currency with no quote on a date
+        carries its previous rate forward, and its first rate backward.
+        """
+        fallback = dict(fallback or {})
+        series = {currency: data for currency, data in series.items() if len(data[0])}
+        currencies = ['USD'] + sorted((set(series) | set(fallback)) - {'USD'})
+        if not series:
+            return cls.constant({currency: fallback[currency] for currency in currencies if currency in fallback})
+
+        all_dates, rows = np.unique(
+            np.concatenate([np.asarray(dates, dtype='datetime64[D]') for dates, _ in series.values()]),
+            return_inverse=True)
+        matrix = np.full((len(all_dates), len(currencies)), np.nan)
+        matrix[:, 0] = 1.0
+        start = 0
+        for currency, (dates, values) in series.items():
+            matrix[rows[start:start + len(dates)], currencies.index(currency)] = values
+            start += len(dates)
+
+        frame = pd.DataFrame(matrix, columns=currencies).ffill().bfill()
+        for currency in currencies:
+            if frame[currency].isna().all() and currency in fallback:
+                frame[currency] = fallback[currency]
+        return cls(all_dates, currencies, frame.to_numpy())
+
+    @classmethod
+    def read_csv(cls, path):
+        """Read a wide table: a Date column, then one column of units per USD per currency"""
+        frame = pd.read_csv(path, parse_dates=['Date'])
+        currencies = [column for column in frame.columns if column != 'Date']
+        series = {currency: (frame['Date'].to_numpy('datetime64[D]'), frame[currency].to_numpy(dtype=float))
+                  for currency in currencies}
+        return cls.from_series(series)
+
+    def to_frame(self):
+        frame = pd.DataFrame(self.rates, columns=self.currencies)
+        frame.insert(0, 'Date', pd.DatetimeIndex(self.dates.astype('datetime64[ns]')))
+        return frame
+
+    def to_csv(self, path):
+        """Write the table in the layout read_csv reads"""
+        self.to_frame().to_csv(path, index=False, date_format='%Y-%m-%d')
+
+    def __contains__(self, currency):
+        return currency in self._columns
+
+    def _rows(self, dates):
+        # Search on nanosecond timestamps against each row's midnight: a trade at
+        # any time of day takes that day's rate
+        stamps = np.asarray(dates, dtype='datetime64[ns]').view(np.int64)
+        starts = self.dates.astype('datetime64[ns]').view(np.int64)
+        return np.clip(np.searchsorted(starts, stamps, side='right') - 1, 0, None)
+
+    def _column_codes(self, currencies):
+        """Column of each currency, -1 where unknown"""
+        if isinstance(getattr(currencies, 'dtype', None), pd.CategoricalDtype):
+            # Map the few categories instead of every row
+            categorical = pd.Categorical(currencies)
+            codes, uniques = categorical.codes, categorical.categories
+        else:
+            codes, uniques = pd.factorize(np.asarray(currencies, dtype=object))
+        columns = np.array([self._columns.get(str(currency), -1) for currency in uniques] + [-1], dtype=np.int64)
+        # Code -1 (missing) picks the trailing -1
+        return columns[codes]
+
+    def _gather(self, rows, currencies):
+        if isinstance(currencies, str):
+            if currencies not in self._columns:
+                return np.full(len(rows), np.nan)
+            return self.rates[rows, self._columns[currencies]]
+        columns = self._column_codes(currencies)
+        values = self.rates[rows, np.maximum(columns, 0)]
+        values[columns < 0] = np.nan
+        return values
+
+    def lookup(self, dates, currencies):
+        """Units of each currency per USD as of each date
+
+        ``currencies`` is one code for every date or a sequence aligned with
+        ``dates``; unknown currencies give NaN.
+        """
+        return self._gather(self._rows(dates), currencies)
+
+    def frame(self, dates, currencies=None):
+        """Rates on ``dates`` (rows) for ``currencies`` (columns) as a DataFrame"""
+        currencies = self.currencies if currencies is None else list(currencies)
+        index = pd.DatetimeIndex(dates)
+        return pd.DataFrame({currency: self.lookup(index, currency) for currency in currencies}, index=index)
+
+    def convert(self, amounts, dates, from_currencies, to_currency):
+        """Convert amounts dated ``dates`` from their currencies into ``to_currency``"""
+        amounts = np.asarray(amounts, dtype=float)
+        return amounts / self.lookup(dates, from_currencies) * self.lookup(dates, to_currency)
+
+    def convert_matrix(self, amounts, dates, from_currencies, to_currencies):
+        """Convert amounts into several currencies at once: an amounts x ``to_currencies`` array
+
+        One as-of row lookup serves every target. The gathered rate matrix is
+        divided by each amount's own rate, so an amount converted into its own
+        currency stays exact, and the result is scaled by the amounts in one
+        broadcast. Memory grows linearly with the number of target currencies.
+        """
+        amounts = np.asarray(amounts, dtype=float)
+        rows = self._rows(dates)
+        columns = np.array([self._columns.get(currency, -1) for currency in to_currencies], dtype=np.int64)
+        matrix = self.rates[rows[:, None], np.maximum(columns, 0)[None, :]]
+        matrix[:, columns < 0] = np.nan
+        matrix /= self._gather(rows, from_currencies)[:, None]
+        matrix *= amounts[:, None]
+        return matrix
+
+
+def fetch_fx_rates(fetcher, currencies, start, end, fallback=None):
+    """FXRateTable for ``currencies`` from the fetcher's market data provider
+
+    Rates are requested as ``<CUR>=X`` symbols through the MarketDataFetcher,
+    so a PriceCache keeps them on disk like any price history; currency pairs
+    do not split, so no splits are requested. Currencies that cannot be
+    fetched use their ``fallback`` rate for every date.
+    """
+    currencies = sorted(set(currencies) - {'USD'})
+    symbols = {fx_ticker(currency): currency for currency in currencies}
+    results = fetcher.fetch_all(list(symbols), start, end, splits=False)
+
+    series = {}
+    for symbol, result in results.items():
+        currency = symbols[symbol]
+        if result['error'] is not None or result['history'].empty:
+            note = 'fixed fallback rate' if fallback and currency in fallback else 'no rate'
+            print(f"No FX history for {currency} ({result['error'] or 'empty'}); using {note}")
+            continue
+        dates, closes = close_arrays(result['history'])
+        valid = np.isfinite(closes) & (closes > 0)
+        series[currency] = (dates[valid], closes[valid])
+    return FXRateTable.from_series(series, fallback={currency: rate for currency, rate in (fallback or {}).items()
+                                                     if currency in currencies or currency == 'USD'})
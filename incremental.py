@@ -0,0 +1,117 @@
+"""File fingerprints and saved analysis state for incremental re-analysis"""
+import hashlib
+import io
+import os
+import tempfile
+
+import pandas as pd
+
+# Bump when the layout of the saved state changes; older state is ignored
+STATE_VERSION = 2
+
+DEFAULT_STATE_PATH = 'analysis_state.pkl'
+
+
+def _sha256(path, size=None, block_size=1 << 20):
+    """SHA-256 of the whole file, or of its first ``size`` bytes"""
+    digest = hashlib.sha256()
+    remaining = size
+    with open(path, 'rb') as handle:
+        while remaining is None or remaining > 0:
+            block = handle.read(block_size if remaining is None else min(block_size, remaining))
+            if not block:
+                break
+            digest.update(block)
+            if remaining is not None:
+                remaining -= len(block)
+    return digest.hexdigest()
+
+
+def file_fingerprint(path, previous=None):
+    """Size, modification time and content hash of a file
+
+    When size and modification time match ``previous`` the file is taken as
+    unchanged and its hash is reused instead of re-reading the file.
+    """
+    info = os.stat(path)
+    if previous and previous['size'] == info.st_size and previous['mtime_ns'] == info.st_mtime_ns:
+        return dict(previous)
+    return {'size': info.st_size, 'mtime_ns': info.st_mtime_ns, 'sha256': _sha256(path)}
+
+
+def _ends_with_newline(path, size):
+    if size == 0:
+        return True
+    with open(path, 'rb') as handle:
+        handle.seek(size - 1)
+        return handle.read(1) == b'\n'
+
+
+def classify_files(previous, fingerprints):
+    """Compare this run's fingerprints with the previous run's
+
+    Returns ({path: 'unchanged' | 'appended' | 'new' | 'changed'}, removed paths).
+    A file counts as appended when it grew and its old bytes, ending on a line
+    break, hash to the previous fingerprint.
+    """
+    status = {}
+    for path, current in fingerprints.items():
+        old = previous.get(path)
+        if old is None:
+            status[path] = 'new'
+        elif current['sha256'] == old['sha256']:
+            status[path] = 'unchanged'
+        elif (current['size'] > old['size'] and _ends_with_newline(path, old['size'])
+              and _sha256(path, old['size']) == old['sha256']):
+            status[path] = 'appended'
+        else:
+            status[path] = 'changed'
+    removed = [path for path in previous if path not in fingerprints]
+    return status, removed
+
+
+def read_appended_rows(path, offset):
+    """Parse only the rows written after ``offset`` bytes, reusing the file's header line"""
+    with open(path, 'rb') as handle:
+        header = handle.readline()
+        handle.seek(offset)
+        tail = handle.read()
+    return pd.read_csv(io.BytesIO(header + tail))
+
+
+def load_state(path):
+    """Previous run's state, or None when missing, unreadable or from another version"""
+    if not os.path.exists(path):
+        return None
+    try:
+        state = pd.read_pickle(path)
+    except Exception as e:
+        print(f"Ignoring unreadable analysis state {path}: {e}")
+        return None
+    if not isinstance(state, dict) or state.get('version') != STATE_VERSION:
+        return None
+    return state
+
+
+def state_path_for(file_paths, directory='.'):
+    """Where the state of a run over ``file_paths`` is kept: one file per set of inputs"""
+    paths = '\n'.join(sorted(os.path.abspath(path) for path in file_paths))
+    stem, extension = os.path.splitext(DEFAULT_STATE_PATH)
+    return os.path.join(directory, f"{stem}_{hashlib.sha256(paths.encode()).hexdigest()[:16]}{extension}")
+
+
+def save_state(path, state):
+    """Write state atomically so an interrupted run never leaves a half-written file
+
+    Each write goes through its own temporary file, so runs saving the same
+    state at once never write into each other's; the last one to finish wins.
+    """
+    handle = tempfile.NamedTemporaryFile(dir=os.path.dirname(os.path.abspath(path)),
+                                         prefix=f"{os.path.basename(path)}.", suffix='.tmp', delete=False)
+    try:
+        with handle:
+            pd.to_pickle(dict(state, version=STATE_VERSION), handle)
+        os.replace(handle.name, path)
+    except BaseException:
+        os.unlink(handle.name)
+        raise
@@ -0,0 +1,124 @@
+"""Per-stage wall time, CPU time, peak memory and row counts for analysis runs"""
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+STAGE_COLUMNS = ['stage', 'start_s', 'wall_s', 'cpu_s', 'max_rss_mb', 'peak_mb', 'rows', 'error']
+
+
+def max_rss_mb():
+    """High-water resident set size of this process so far, None where unavailable"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+class RunReport:
+    """Structured record of one pipeline run, one entry per stage in run order
+
+    Wall time far above CPU time means the stage was waiting, usually on
+    market data requests. CPU time is process-wide, so it includes the
+    fetcher's worker threads. ``max_rss_mb`` is the process's memory
+    high-water mark when the stage ended: a stage that raises it is the one
+    that set the peak. With ``trace_memory`` each stage also gets
+    ``peak_mb``, the most it allocated through Python and NumPy above what
+    was held when it started. That uses tracemalloc, which can slow
+    allocation-heavy stages several times over.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.started_at = datetime.now()
+        self.stages = []
+        self._origin = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block; yields the stage's record for extra fields such as ``rows``"""
+        record = dict.fromkeys(STAGE_COLUMNS)
+        record['stage'] = name
+        record['start_s'] = time.perf_counter() - self._origin
+
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if self.trace_memory:
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        except Exception as e:
+            record['error'] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            record['wall_s'] = time.perf_counter() - wall
+            record['cpu_s'] = time.process_time() - cpu
+            record['max_rss_mb'] = max_rss_mb()
+            if self.trace_memory:
+                record['peak_mb'] = max(tracemalloc.get_traced_memory()[1] - baseline, 0) / 2**20
+                if started_tracing:
+                    tracemalloc.stop()
+            self.stages.append(record)
+
+    @property
+    def total_wall_s(self):
+        return sum(record['wall_s'] for record in self.stages)
+
+    def finished_at(self, stage):
+        """Seconds from the start of the run until ``stage`` ended, None if it did not run"""
+        for record in self.stages:
+            if record['stage'] == stage:
+                return record['start_s'] + record['wall_s']
+        return None
+
+    def to_frame(self):
+        return pd.DataFrame(self.stages, columns=STAGE_COLUMNS)
+
+    def to_dict(self):
+        return {
+            'started_at': self.started_at.isoformat(),
+            'total_wall_s': self.total_wall_s,
+            'total_cpu_s': sum(record['cpu_s'] for record in self.stages),
+            'stages': [dict(record) for record in self.stages],
+        }
+
+    def format_table(self):
+        frame = self.to_frame().drop(columns=['start_s']).set_index('stage')
+        frame.loc['total', ['wall_s', 'cpu_s']] = frame[['wall_s', 'cpu_s']].sum()
+        frame = frame.drop(columns=[column for column in ['max_rss_mb', 'peak_mb', 'error'] if frame[column].isna().all()])
+
+        def blank(fmt):
+            return lambda value: '' if pd.isna(value) else fmt.format(value)
+        return frame.to_string(formatters={'wall_s': blank('{:.3f}'), 'cpu_s': blank('{:.3f}'),
+                                           'max_rss_mb': blank('{:.0f}'), 'peak_mb': blank('{:.1f}'),
+                                           'rows': blank('{:.0f}'),
+                                           'error': blank('{}')}, na_rep='')
+
+    def trace_json(self):
+        """The run as Chrome trace events (open in chrome://tracing or ui.perfetto.dev)"""
+        pid = os.getpid()
+        origin_us = self.started_at.timestamp() * 1e6
+        events = [{
+            'name': record['stage'], 'cat': 'analysis', 'ph': 'X', 'pid': pid, 'tid': 0,
+            'ts': origin_us + record['start_s'] * 1e6, 'dur': record['wall_s'] * 1e6,
+            'args': {key: record[key] for key in ('cpu_s', 'max_rss_mb', 'peak_mb', 'rows', 'error')},
+        } for record in self.stages]
+        return json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'}, indent=1)
+
+    def write_trace(self, path):
+        with open(path, 'w') as f:
+            f.write(self.trace_json())
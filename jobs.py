@@ -0,0 +1,210 @@
+"""Background analysis jobs run in a shared worker pool
+
+A job runs one analysis off the UI thread and records, step by step, what the
+analyzer has finished. The UI polls it by job ID, can draw whatever steps
+are done (holdings long before prices arrive), and can cancel it. Threads
+rather than processes do the work: jobs spend most of their time waiting on
+market data, and the UI reads partial results straight off the job's
+analyzer, which must live in this process.
+
+As each step finishes, its outputs are copied into the job's ``partial``
+results, which views can draw while later steps still run. The job records
+when the first of them arrived and when the UI first drew it, so
+time-to-first-content can be reported next to the total run time.
+
+Cancellation is cooperative. The analyzer reports each step to the job as it
+starts, and a job that was asked to stop raises AnalysisCancelled there, so
+the step in progress finishes and the next one never starts.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from portfolio_analyzer import ANALYSIS_STAGES, AnalysisCancelled
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+
+
+class PartialResults:
+    """A running analysis's outputs so far, under the analyzer's attribute names
+
+    Outputs of steps not done yet are empty, so views written for a finished
+    analyzer can draw it section by section.
+    """
+
+    def __init__(self):
+        self.all_trades = pd.DataFrame()
+        self.holdings = pd.DataFrame()
+        self.stock_splits = {}
+        self.historical_prices = {}
+        self.currency_rates = None
+        self.closed_lots = pd.DataFrame()
+        self.open_lots = pd.DataFrame()
+        self.profit_and_loss = pd.DataFrame()
+        self.fees_by_symbol = pd.DataFrame()
+        self.fees_by_period = pd.DataFrame()
+        self.portfolio_values = pd.DataFrame()
+        self.risk = None
+        self.xirr_results = {}
+        self.portfolio_xirr = np.nan
+        self.xirr_history = {}
+        self.return_history = {}
+        self.get_latest_news = None
+
+
+class AnalysisJob:
+    """One submitted analysis: its status, per-step progress and, once attached, its analyzer"""
+
+    def __init__(self, job_id):
+        self.id = job_id
+        self.status = QUEUED
+        self.stages = dict.fromkeys(ANALYSIS_STAGES, QUEUED)
+        self.current_stage = None
+        self.analyzer = None
+        self.partial = PartialResults()
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.first_content_at = None
+        self.first_rendered_at = None
+        self._cancel = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    @property
+    def progress(self):
+        """Fraction of the pipeline's steps finished"""
+        if self.status == DONE:
+            return 1.0
+        return sum(state == DONE for state in self.stages.values()) / len(self.stages)
+
+    def stage_done(self, stage):
+        return self.stages.get(stage) == DONE
+
+    @property
+    def time_to_first_content(self):
+        """Seconds from submission until the UI first drew results, or until the first results existed"""
+        first = self.first_rendered_at or self.first_content_at
+        return None if first is None else first - self.submitted_at
+
+    @property
+    def total_seconds(self):
+        return None if self.finished_at is None else self.finished_at - self.submitted_at
+
+    def mark_rendered(self):
+        """Called by the UI when it has drawn this job's results"""
+        if self.first_rendered_at is None:
+            self.first_rendered_at = time.time()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def attach(self, analyzer):
+        """Report ``analyzer``'s steps to this job and expose it for partial results"""
+        analyzer.progress = self._on_stage
+        self.analyzer = analyzer
+        self.partial.get_latest_news = analyzer.get_latest_news
+        return analyzer
+
+    def _on_stage(self, stage, state):
+        if state == RUNNING and self._cancel.is_set():
+            raise AnalysisCancelled(f"job {self.id} cancelled before {stage}")
+        if state == DONE:
+            # Runs on the worker thread between steps, so the outputs are complete
+            for name, value in self.analyzer.stage_outputs(stage).items():
+                setattr(self.partial, name, value)
+            if self.first_content_at is None:
+                self.first_content_at = time.time()
+        self.stages[stage] = state
+        self.current_stage = stage if state == RUNNING else None
+
+
+class JobManager:
+    """Worker pool of analysis jobs, looked up by ID
+
+    Finished jobs are kept until more than ``keep`` have accumulated; the
+    oldest finished ones are then forgotten.
+    """
+
+    def __init__(self, max_workers=2, keep=50):
+        self.keep = keep
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analysis')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, work):
+        """Queue ``work(job)``; its return value becomes ``job.result`` and None means the run failed"""
+        job = AnalysisJob(uuid.uuid4().hex[:12])
+        with self._lock:
+            self._jobs[job.id] = job
+            self._forget_finished()
+        self._pool.submit(self._run, job, work)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None and not job.finished:
+            job.cancel()
+        return job
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def _run(self, job, work):
+        job.started_at = time.time()
+        if job.cancel_requested:
+            job.status = CANCELLED
+        else:
+            job.status = RUNNING
+            try:
+                result = work(job)
+                if job.cancel_requested:
+                    # Cancelled while waiting on an analysis another job was running
+                    job.status = CANCELLED
+                elif result is None:
+                    job.status, job.error = FAILED, "the analysis did not complete; see the server log"
+                else:
+                    job.result, job.status = result, DONE
+            except AnalysisCancelled:
+                job.status = CANCELLED
+            except Exception as e:
+                job.status, job.error = FAILED, f"{type(e).__name__}: {e}"
+            finally:
+                if job.analyzer is not None:
+                    job.analyzer.progress = None
+        job.current_stage = None
+        job.finished_at = time.time()
+        if job.status == DONE:
+            if job.first_content_at is None:
+                # Served whole from a cache
+                job.first_content_at = job.finished_at
+            print(f"Job {job.id} done: first results after {job.first_content_at - job.submitted_at:.2f}s, "
+                  f"complete after {job.total_seconds:.2f}s")
+
+    def _forget_finished(self):
+        finished = sorted((job for job in self._jobs.values() if job.finished), key=lambda job: job.finished_at)
+        for job in finished[:max(len(finished) - self.keep, 0)]:
+            del self._jobs[job.id]
+
+    def shutdown(self, cancel=True):
+        if cancel:
+            for job in self.jobs():
+                job.cancel()
+        self._pool.shutdown(wait=True)
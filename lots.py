@@ -0,0 +1,207 @@
+"""Lot tracking over the typed trade table
+
+Every trade either opens a lot or closes (part of) lots opened earlier on
+the other side: sells close long lots, buys close short ones, and a trade
+larger than the position closes it and opens a lot with the rest. The lot
+method picks which open lot a closing trade is matched to: the oldest
+(FIFO), the newest (LIFO), or, with average cost, the one lot a position
+pools into at its average price.
+
+Commissions and fees count in the cost basis: a trade's fee is spread over
+its units, so a lot carries the fee of the units opening it and a closed
+piece also pays its share of the closing trade's fee. Realized P/L and open
+cost are net of fees, as in broker statements.
+"""
+import numpy as np
+import pandas as pd
+
+from fees import fees_per_unit
+
+LOT_METHODS = ('fifo', 'lifo', 'average')
+
+# Quantities smaller than this are treated as a closed position
+EPSILON = 1e-9
+
+CLOSED_LOT_COLUMNS = ['Symbol', 'Currency', 'Quantity', 'Open_Date', 'Close_Date', 'Open_Price', 'Close_Price',
+                      'Fees', 'Realized_PL']
+OPEN_LOT_COLUMNS = ['Symbol', 'Currency', 'Quantity', 'Open_Date', 'Price', 'Fees', 'Cost']
+
+
+def _match(codes, quantities, prices, unit_fees, method):
+    """One pass over trades sorted by symbol code, then time
+
+    Each symbol's open lots are parallel lists (quantity, price, fee per
+    unit, opening row); FIFO consumes them from ``head``, LIFO from the end,
+    and average cost keeps at most one. Returns the closed pieces (opening
+    row, closing row, quantity, opening price, fees) and the open lots (row,
+    quantity, price, fee per unit) as lists; a pooled lot's row is the first
+    trade pooled into it.
+    """
+    lifo, average = method == 'lifo', method == 'average'
+    closed_open, closed_close, closed_quantity, closed_price, closed_fee = [], [], [], [], []
+    open_row, open_quantity, open_price, open_fee = [], [], [], []
+    lot_quantity, lot_price, lot_fee, lot_row = [], [], [], []
+    head = 0
+    current = None
+
+    for row, (code, quantity, price, fee) in enumerate(zip(codes, quantities, prices, unit_fees)):
+        if code != current:
+            open_row += lot_row[head:]
+            open_quantity += lot_quantity[head:]
+            open_price += lot_price[head:]
+            open_fee += lot_fee[head:]
+            lot_quantity, lot_price, lot_fee, lot_row = [], [], [], []
+            head = 0
+            current = code
+
+        # Close lots on the other side, oldest or newest first
+        while quantity > EPSILON or quantity < -EPSILON:
+            if head == len(lot_quantity) or (lot_quantity[head] > 0) == (quantity > 0):
+                break
+            lot = len(lot_quantity) - 1 if lifo else head
+            held = lot_quantity[lot]
+            matched = held if abs(held) <= abs(quantity) else -quantity
+            closed_open.append(lot_row[lot])
+            closed_close.append(row)
+            closed_quantity.append(matched)
+            closed_price.append(lot_price[lot])
+            closed_fee.append(abs(matched) * (lot_fee[lot] + fee))
+            quantity += matched
+            held -= matched
+            if -EPSILON <= held <= EPSILON:
+                if lifo:
+                    lot_quantity.pop()
+                    lot_price.pop()
+                    lot_fee.pop()
+                    lot_row.pop()
+                else:
+                    head += 1
+            else:
+                lot_quantity[lot] = held
+
+        if quantity > EPSILON or quantity < -EPSILON:
+            if average and head < len(lot_quantity):
+                # Same side as the pooled lot: add to it at the blended price and fee
+                held = lot_quantity[head]
+                lot_price[head] = (held * lot_price[head] + quantity * price) / (held + quantity)
+                lot_fee[head] = (held * lot_fee[head] + quantity * fee) / (held + quantity)
+                lot_quantity[head] = held + quantity
+            else:
+                lot_quantity.append(quantity)
+                lot_price.append(price)
+                lot_fee.append(fee)
+                lot_row.append(row)
+
+    open_row += lot_row[head:]
+    open_quantity += lot_quantity[head:]
+    open_price += lot_price[head:]
+    open_fee += lot_fee[head:]
+    return ((closed_open, closed_close, closed_quantity, closed_price, closed_fee),
+            (open_row, open_quantity, open_price, open_fee))
+
+
+def match_lots(trades, method='fifo'):
+    """Closed and open lots of every symbol after matching closing trades to lots
+
+    ``trades`` must be in time order (as the typed trade table is). They are
+    grouped by symbol with one stable sort and matched in a single pass.
+    Returns two DataFrames:
+
+    - closed lots (CLOSED_LOT_COLUMNS), one row per piece of a lot closed by
+      one trade: Quantity is signed as the lot was (negative for shorts
+      covered), Fees are the piece's share of the opening and closing
+      trades' fees and Realized_PL is Quantity x (Close_Price - Open_Price)
+      - Fees, in the trade currency.
+    - open lots (OPEN_LOT_COLUMNS) still held, with their opening price,
+      the opening fees they carry and their cost, Quantity x Price + Fees.
+      Under average cost each position is one lot at its average price,
+      dated by the first trade that opened it.
+    """
+    if method not in LOT_METHODS:
+        raise ValueError(f"Unknown lot method {method!r}; expected one of {LOT_METHODS}")
+
+    codes, _ = pd.factorize(trades['Symbol'], sort=True)
+    order = np.argsort(codes, kind='stable')
+    quantities = trades['Quantity'].to_numpy(float)[order]
+    prices = trades['T. Price'].to_numpy(float)[order]
+    unit_fees = fees_per_unit(trades)[order]
+    closed, still_open = _match(codes[order].tolist(), quantities.tolist(), prices.tolist(), unit_fees.tolist(), method)
+    closed_open, closed_close, closed_quantity, closed_price, closed_fee = closed
+    open_row, open_quantity, open_price, open_fee = still_open
+
+    def take(column, rows):
+        # Sorted rows back to the trade table's rows
+        return trades[column].iloc[order[np.asarray(rows, dtype=np.int64)]].reset_index(drop=True)
+
+    quantity = np.asarray(closed_quantity, dtype=float)
+    open_at = np.asarray(closed_price, dtype=float)
+    close_at = prices[np.asarray(closed_close, dtype=np.int64)]
+    fees = np.asarray(closed_fee, dtype=float)
+    closed = pd.DataFrame({
+        'Symbol': take('Symbol', closed_close),
+        'Currency': take('Currency', closed_close),
+        'Quantity': quantity,
+        'Open_Date': take('Date/Time', closed_open),
+        'Close_Date': take('Date/Time', closed_close),
+        'Open_Price': open_at,
+        'Close_Price': close_at,
+        'Fees': fees,
+        'Realized_PL': quantity * (close_at - open_at) - fees,
+    }, columns=CLOSED_LOT_COLUMNS)
+
+    quantity = np.asarray(open_quantity, dtype=float)
+    price = np.asarray(open_price, dtype=float)
+    fees = np.abs(quantity) * np.asarray(open_fee, dtype=float)
+    open_lots = pd.DataFrame({
+        'Symbol': take('Symbol', open_row),
+        'Currency': take('Currency', open_row),
+        'Quantity': quantity,
+        'Open_Date': take('Date/Time', open_row),
+        'Price': price,
+        'Fees': fees,
+        'Cost': quantity * price + fees,
+    }, columns=OPEN_LOT_COLUMNS)
+    return closed, open_lots
+
+
+def add_lot_costs(holdings, ledger):
+    """``holdings`` with Lot_Cost and Lot_Avg_Price read from the profit_and_loss ``ledger``
+
+    Lot_Cost is the cost of the open lots, their opening fees included, and
+    Lot_Avg_Price that cost per split-adjusted unit still open.
+    """
+    keys = ['Symbol', 'Currency']
+    index = pd.MultiIndex.from_arrays([ledger[key].astype(str) for key in keys])
+    wanted = pd.MultiIndex.from_arrays([holdings[key].astype(str) for key in keys])
+    cost = pd.Series(ledger['Open_Cost'].to_numpy(dtype=float), index=index).reindex(wanted).to_numpy()
+    quantity = pd.Series(ledger['Open_Quantity'].to_numpy(dtype=float), index=index).reindex(wanted).to_numpy()
+    holdings = holdings.copy()
+    holdings['Lot_Cost'] = cost
+    with np.errstate(divide='ignore', invalid='ignore'):
+        holdings['Lot_Avg_Price'] = np.where(quantity != 0, cost / quantity, np.nan)
+    return holdings
+
+
+def profit_and_loss(closed, open_lots, last_prices):
+    """Realized and unrealized P/L of every symbol traded, in its trade currency
+
+    ``closed`` and ``open_lots`` are match_lots' frames and ``last_prices``
+    maps symbols to their latest close. Returns one row per symbol and
+    currency: Realized_PL, Open_Quantity, Open_Cost, Market_Value and
+    Unrealized_PL (Market_Value - Open_Cost); the last two are NaN for open
+    lots without a price.
+    """
+    keys = ['Symbol', 'Currency']
+    realized = closed.groupby(keys, observed=True)['Realized_PL'].sum()
+    held = open_lots.groupby(keys, observed=True)[['Quantity', 'Cost']].sum()
+    held.columns = ['Open_Quantity', 'Open_Cost']
+    ledger = pd.concat([realized, held], axis=1)
+    ledger[['Realized_PL', 'Open_Quantity', 'Open_Cost']] = ledger[
+        ['Realized_PL', 'Open_Quantity', 'Open_Cost']].fillna(0.0)
+    ledger = ledger.reset_index()
+
+    price = ledger['Symbol'].astype(str).map(last_prices).astype(float).to_numpy()
+    quantity = ledger['Open_Quantity'].to_numpy()
+    ledger['Market_Value'] = np.where(quantity == 0, 0.0, quantity * price)
+    ledger['Unrealized_PL'] = ledger['Market_Value'] - ledger['Open_Cost']
+    return ledger.sort_values(keys).reset_index(drop=True)
@@ -0,0 +1,462 @@
+import os
+import random
+import threading
+import time
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+
+class MarketDataProvider:
+    """Interface for market data backends
+
+    Backends implement ``get_splits`` and ``get_history`` and may implement
+    ``get_news``. Those that can serve several symbols per request set
+    ``supports_batch`` and override ``get_history_batch``; the default simply
+    loops over ``get_history``. ``rate_limited`` marks backends that hit a
+    remote service, so the fetcher throttles their calls.
+    """
+
+    supports_batch = False
+    rate_limited = False
+
+    def get_splits(self, symbol):
+        raise NotImplementedError
+
+    def get_history(self, symbol, start, end):
+        """Daily history between ``start`` and ``end`` (inclusive days)"""
+        raise NotImplementedError
+
+    def get_history_batch(self, symbols, start, end):
+        """Return {symbol: history frame}; symbols without data may be omitted"""
+        return {symbol: self.get_history(symbol, start, end) for symbol in symbols}
+
+    def get_news(self, symbol):
+        """Latest news items for ``symbol``; empty when the backend has none"""
+        return []
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Market data from Yahoo Finance"""
+
+    supports_batch = True
+    rate_limited = True
+
+    def get_splits(self, symbol):
+        return yf.Ticker(symbol).splits
+
+    def get_history(self, symbol, start, end):
+        return yf.Ticker(symbol).history(start=start, end=pd.Timestamp(end) + pd.Timedelta(days=1))
+
+    def get_history_batch(self, symbols, start, end):
+        # One multi-ticker request; columns come back as (ticker, field)
+        combined = yf.download(
+            list(symbols), start=start, end=pd.Timestamp(end) + pd.Timedelta(days=1),
+            group_by='ticker', auto_adjust=True, actions=True,
+            threads=False, progress=False
+        )
+        return split_combined_history(combined, symbols)
+
+    def get_news(self, symbol):
+        return yf.Ticker(symbol).news
+
+
+def split_combined_history(combined, symbols):
+    """Split a (ticker, field) column frame from a multi-ticker download into per-symbol frames"""
+    histories = {}
+    if combined is None or combined.empty:
+        return histories
+
+    if not isinstance(combined.columns, pd.MultiIndex):
+        # A single-ticker download comes back with flat field columns
+        combined = pd.concat({symbols[0]: combined}, axis=1)
+
+    tickers = set(combined.columns.get_level_values(0))
+    for symbol in symbols:
+        if symbol not in tickers:
+            continue
+        hist = combined[symbol].dropna(how='all')
+        if not hist.empty:
+            histories[symbol] = hist
+    return histories
+
+
+class LocalDirectoryProvider(MarketDataProvider):
+    """Market data read from a directory of fixture files
+
+    ``<directory>/<SYMBOL>.parquet`` or ``<SYMBOL>.csv`` holds daily history
+    with a Date column and yfinance field columns; ``<directory>/splits.csv``
+    holds optional Symbol, Date, Ratio rows. ``save`` writes this layout, so a
+    live or synthetic fetch can be recorded once and replayed offline.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._splits = None
+
+    def _history_path(self, symbol):
+        for extension in ('.parquet', '.csv'):
+            path = os.path.join(self.directory, symbol + extension)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def get_splits(self, symbol):
+        if self._splits is None:
+            path = os.path.join(self.directory, 'splits.csv')
+            if os.path.exists(path):
+                self._splits = pd.read_csv(path, parse_dates=['Date'])
+            else:
+                self._splits = pd.DataFrame(columns=['Symbol', 'Date', 'Ratio'])
+        rows = self._splits[self._splits['Symbol'] == symbol]
+        return pd.Series(rows['Ratio'].to_numpy(dtype=float),
+                         index=pd.DatetimeIndex(rows['Date'], name='Date'), name='Stock Splits')
+
+    def get_history(self, symbol, start, end):
+        path = self._history_path(symbol)
+        if path is None:
+            return pd.DataFrame()
+
+        if path.endswith('.parquet'):
+            hist = pd.read_parquet(path)
+            if 'Date' in hist.columns:
+                hist = hist.set_index('Date')
+        else:
+            hist = pd.read_csv(path)
+            # Daily bars only need the calendar day; this also drops any UTC offset suffix
+            hist.index = pd.DatetimeIndex(pd.to_datetime(hist.pop('Date').astype(str).str[:10]), name='Date')
+
+        days = pd.DatetimeIndex(hist.index)
+        if days.tz is not None:
+            days = days.tz_localize(None)
+        days = days.normalize()
+        return hist[(days >= pd.Timestamp(start)) & (days <= pd.Timestamp(end))]
+
+    @staticmethod
+    def save(directory, histories, splits=None, fmt='csv'):
+        """Write {symbol: history} and {symbol: splits Series} in the layout this provider reads"""
+        os.makedirs(directory, exist_ok=True)
+        for symbol, hist in histories.items():
+            frame = hist.copy()
+            index = pd.DatetimeIndex(frame.index)
+            if fmt == 'csv' and index.tz is not None:
+                frame.index = index.tz_localize(None)
+            frame.index.name = 'Date'
+            if fmt == 'parquet':
+                frame.reset_index().to_parquet(os.path.join(directory, symbol + '.parquet'), index=False)
+            else:
+                frame.to_csv(os.path.join(directory, symbol + '.csv'))
+
+        rows = []
+        for symbol, series in (splits or {}).items():
+            for date, ratio in series.items():
+                rows.append({'Symbol': symbol, 'Date': pd.Timestamp(date).strftime('%Y-%m-%d'), 'Ratio': ratio})
+        pd.DataFrame(rows, columns=['Symbol', 'Date', 'Ratio']).to_csv(
+            os.path.join(directory, 'splits.csv'), index=False)
+
+
+# Starting level of synthetic '<CUR>=X' rates, in units per USD
+SYNTHETIC_FX_LEVELS = {'INR': 83.0, 'SGD': 1.35, 'EUR': 0.92, 'GBP': 0.79, 'JPY': 150.0, 'HKD': 7.8}
+
+
+class SyntheticProvider(MarketDataProvider):
+    """Deterministic synthetic market data for any number of symbols
+
+    Each symbol gets a geometric random walk on business days from ``origin``
+    with its own drift, volatility and starting price, seeded from ``seed`` and
+    the symbol name. The same symbol and date therefore always have the same
+    price, whatever range or batch it is requested in. A ``split_probability``
+    share of symbols get one 2:1, 3:1 or 1:4 split. ``<CUR>=X`` FX symbols
+    move slowly around a realistic rate.
+    """
+
+    supports_batch = True
+
+    def __init__(self, seed=0, origin='2010-01-01', split_probability=0.1, tz='America/New_York'):
+        self.seed = seed
+        self.origin = pd.Timestamp(origin)
+        self.split_probability = split_probability
+        self.tz = tz
+
+    def _rng(self, symbol, stream):
+        return np.random.default_rng([self.seed, zlib.crc32(symbol.encode()), stream])
+
+    def get_splits(self, symbol):
+        rng = self._rng(symbol, 1)
+        if rng.random() >= self.split_probability or symbol.endswith('=X'):
+            return pd.Series(dtype=float, name='Stock Splits')
+        days = pd.bdate_range(self.origin, pd.Timestamp.now().normalize())
+        date = days[rng.integers(len(days) // 4, len(days))]
+        ratio = float(rng.choice([2.0, 3.0, 0.25]))
+        return pd.Series([ratio], index=pd.DatetimeIndex([date], name='Date').tz_localize(self.tz),
+                         name='Stock Splits')
+
+    def get_history(self, symbol, start, end):
+        return self.get_history_batch([symbol], start, end).get(symbol, pd.DataFrame())
+
+    def get_history_batch(self, symbols, start, end):
+        start = max(pd.Timestamp(start), self.origin)
+        days = pd.bdate_range(self.origin, end)
+        keep = days >= start
+        index = pd.DatetimeIndex(days[keep], name='Date').tz_localize(self.tz)
+
+        histories = {}
+        for symbol in symbols:
+            rng = self._rng(symbol, 0)
+            volatility = rng.uniform(0.008, 0.03)
+            drift = rng.normal(0.0003, 0.0002) - volatility ** 2 / 2
+            first = rng.uniform(10, 500)
+            if symbol.endswith('=X'):
+                # FX rates: calm, driftless, around a realistic level
+                volatility = volatility / 5
+                drift = -volatility ** 2 / 2
+                first = SYNTHETIC_FX_LEVELS.get(symbol[:-2], first / 5)
+            returns = rng.normal(drift, volatility, len(days))
+            close = first * np.exp(np.cumsum(returns))[keep]
+            spread = close * volatility
+            histories[symbol] = pd.DataFrame({
+                'Open': close - spread / 4, 'High': close + spread / 2, 'Low': close - spread / 2,
+                'Close': close, 'Volume': rng.integers(1e4, 1e7, len(close)).astype(float),
+                'Dividends': 0.0, 'Stock Splits': 0.0,
+            }, index=index)
+        return histories
+
+
+class StubProvider(SyntheticProvider):
+    """Offline provider that simulates network latency and failures
+
+    Serves SyntheticProvider data, but ``failure_rate`` makes any call raise
+    ConnectionError with that probability, ``fail_symbols`` always fail and
+    ``hang_symbols`` sleep for ``hang_seconds`` to exercise timeouts. A batch
+    request pays the latency once, like a multi-ticker download.
+    """
+
+    rate_limited = True
+
+    def __init__(self, latency=0.0, failure_rate=0.0, fail_symbols=(), hang_symbols=(),
+                 hang_seconds=60.0, splits=None, seed=0):
+        super().__init__(seed=seed, split_probability=0.0)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.fail_symbols = set(fail_symbols)
+        self.hang_symbols = set(hang_symbols)
+        self.hang_seconds = hang_seconds
+        self.splits = splits or {}
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _simulate(self, symbols):
+        with self._lock:
+            self.calls += 1
+            failed = self._random.random() < self.failure_rate
+        if self.hang_symbols.intersection(symbols):
+            time.sleep(self.hang_seconds)
+        if self.latency:
+            time.sleep(self.latency)
+        if failed:
+            raise ConnectionError(f"simulated failure fetching {', '.join(symbols)}")
+
+    def get_splits(self, symbol):
+        self._simulate([symbol])
+        if symbol in self.fail_symbols:
+            raise ConnectionError(f"simulated failure fetching {symbol}")
+        return self.splits.get(symbol, pd.Series(dtype=float, name='Stock Splits'))
+
+    def get_history_batch(self, symbols, start, end):
+        self._simulate(symbols)
+        if len(symbols) == 1 and symbols[0] in self.fail_symbols:
+            raise ConnectionError(f"simulated failure fetching {symbols[0]}")
+        symbols = [symbol for symbol in symbols if symbol not in self.fail_symbols]
+        return super().get_history_batch(symbols, start, end)
+
+
+class TokenBucket:
+    """Thread-safe token-bucket rate limiter
+
+    Refills at ``rate`` tokens per second up to ``capacity``; ``acquire`` blocks
+    until a token is available.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class MarketDataFetcher:
+    """Fetch splits and price history for many symbols concurrently
+
+    Splits are fetched per symbol. History is requested in chunks of
+    ``batch_size`` symbols when the provider supports multi-symbol calls, then
+    split back into per-symbol frames. At most ``max_workers`` tasks are in
+    flight, provider calls pass through a token bucket of ``rate_per_second``,
+    failed attempts are retried up to ``max_retries`` times with jittered
+    exponential backoff, and a task still unfinished after ``timeout`` seconds
+    is given up on. With a PriceCache only the missing part of each series is
+    requested.
+    """
+
+    def __init__(self, provider=None, price_cache=None, max_workers=8, rate_per_second=5.0,
+                 burst=None, max_retries=3, backoff_base=0.5, backoff_max=8.0, timeout=30.0,
+                 batch_size=50):
+        self.provider = provider if provider is not None else YFinanceProvider()
+        self.price_cache = price_cache
+        self.max_workers = max_workers
+        self.rate_limiter = TokenBucket(rate_per_second, burst) if rate_per_second else None
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.batch_size = batch_size
+
+    def fetch_all(self, symbols, start, end, splits=True):
+        """Return {symbol: result} where result holds splits, history, error, attempts and seconds
+
+        With ``splits=False`` only history is requested and every result's splits
+        stay empty, for symbols that never split such as FX pairs.
+        """
+        started = time.monotonic()
+        results = {
+            symbol: {
+                'splits': pd.Series(dtype=float, name='Stock Splits'),
+                'history': pd.DataFrame(),
+                'error': None,
+                'attempts': 0,
+                'seconds': 0.0,
+            }
+            for symbol in symbols
+        }
+        if not results:
+            return results
+
+        histories = {}
+        tasks = [(self._fetch_splits, (symbol,), [symbol]) for symbol in results] if splits else []
+        for (range_start, range_end), group in self._plan_history(list(results), start, end).items():
+            size = self.batch_size if self.provider.supports_batch else 1
+            for i in range(0, len(group), size):
+                chunk = group[i:i + size]
+                tasks.append((self._fetch_history, (chunk, range_start, range_end, histories), chunk))
+
+        # Provider calls run on their own pool so a hung call can be abandoned
+        calls = ThreadPoolExecutor(max_workers=self.max_workers * 2)
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                pending = {
+                    pool.submit(self._run_with_retry, calls, func, args): (func, args, chunk)
+                    for func, args, chunk in tasks
+                }
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        func, args, chunk = pending.pop(future)
+                        value, error, attempts = future.result()
+                        if error is not None and len(chunk) > 1:
+                            # Retry a failed batch one symbol at a time so one bad ticker cannot sink the rest
+                            for symbol in chunk:
+                                retry_args = ([symbol],) + args[1:]
+                                retry = pool.submit(self._run_with_retry, calls, func, retry_args)
+                                pending[retry] = (func, retry_args, [symbol])
+                            continue
+                        for symbol in chunk:
+                            result = results[symbol]
+                            result['attempts'] = max(result['attempts'], attempts)
+                            if error is not None:
+                                result['error'] = error
+                            elif isinstance(value, pd.Series):
+                                result['splits'] = value
+        finally:
+            calls.shutdown(wait=False, cancel_futures=True)
+
+        for symbol, result in results.items():
+            if self.price_cache is not None and result['error'] is None:
+                result['history'] = self.price_cache.read_history(symbol, start, end)
+            elif symbol in histories:
+                result['history'] = histories[symbol]
+            result['seconds'] = time.monotonic() - started
+        if self.price_cache is not None:
+            self.price_cache.evict()
+        return results
+
+    def _plan_history(self, symbols, start, end):
+        """Group symbols by the date range they need fetched"""
+        groups = {}
+        for symbol in symbols:
+            if self.price_cache is not None:
+                ranges = self.price_cache.missing_ranges(symbol, start, end)
+            else:
+                ranges = [(start, end)]
+            for date_range in ranges:
+                groups.setdefault(date_range, []).append(symbol)
+        return groups
+
+    def _limited(self, func):
+        def call(*args):
+            if self.rate_limiter is not None and self.provider.rate_limited:
+                self.rate_limiter.acquire()
+            return func(*args)
+        return call
+
+    def _fetch_splits(self, symbol):
+        get_splits = self._limited(self.provider.get_splits)
+        if self.price_cache is not None:
+            return self.price_cache.get_splits(symbol, get_splits)
+        return get_splits(symbol)
+
+    def _fetch_history(self, symbols, start, end, histories):
+        fetched = self._limited(self.provider.get_history_batch)(symbols, start, end)
+        for symbol in symbols:
+            hist = fetched.get(symbol)
+            if self.price_cache is not None:
+                # Merge even when empty so the covered range is recorded
+                self.price_cache.merge_history(symbol, hist, start, end)
+            elif hist is not None:
+                histories[symbol] = hist
+
+    def _backoff(self, attempt):
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+        return delay * (0.5 + random.random() / 2)
+
+    def _run_with_retry(self, calls, func, args):
+        """Run ``func(*args)`` with retries inside the timeout; returns (value, error, attempts)"""
+        deadline = time.monotonic() + self.timeout
+        error = None
+        attempt = 0
+
+        while attempt <= self.max_retries:
+            attempt += 1
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                return calls.submit(func, *args).result(timeout=remaining), None, attempt
+            except FutureTimeout:
+                error = TimeoutError(f"timed out after {self.timeout:.0f}s")
+                break
+            except Exception as e:
+                error = e
+
+            if attempt <= self.max_retries:
+                delay = self._backoff(attempt)
+                if time.monotonic() + delay >= deadline:
+                    break
+                time.sleep(delay)
+
+        return None, error, attempt
@@ -0,0 +1,121 @@
+"""XIRR and time-weighted returns over rolling and since-inception windows
+
+For every date of the valuation history and every window in WINDOWS, each
+series (every valued symbol, in its trading currency, and the portfolio in
+its reporting currency) gets:
+
+- the XIRR of the window's cash flows: the value held when the window
+  opens as money paid in, the trades inside it, and the value held at
+  its close as money received. Since inception, every trade from the
+  series' first counts, including those before the price history.
+- the time-weighted return over the window, chained from daily returns
+  net of each day's trades (see risk.daily_returns). These need daily
+  values, so since inception means since the first date with prices.
+
+Rolling windows that would open before the first date with prices have
+neither.
+"""
+import numpy as np
+import pandas as pd
+
+from risk import daily_returns
+from xirr import windowed_xirr
+
+# Window name: length, None for since inception
+WINDOWS = {
+    '1M': pd.DateOffset(months=1),
+    '3M': pd.DateOffset(months=3),
+    '1Y': pd.DateOffset(years=1),
+    'Inception': None,
+}
+
+PORTFOLIO = 'Portfolio'
+
+# A window may open this long before the first date (a weekend or holidays in
+# front of it) and still count, opening on the first date
+START_GRACE = pd.Timedelta(days=7)
+
+
+def window_starts(dates, offset):
+    """Index of the date each window opens on: the last date on or before ``date - offset``, -1 if none"""
+    dates = pd.DatetimeIndex(dates)
+    opens = dates - offset
+    starts = np.searchsorted(dates.values, opens.values, side='right') - 1
+    if len(dates):
+        starts[(starts < 0) & (opens >= dates[0] - START_GRACE)] = 0
+    return starts
+
+
+def day_numbers(dates):
+    return pd.DatetimeIndex(dates).values.astype('datetime64[D]').astype(np.int64)
+
+
+def window_returns(wealth, starts):
+    """Growth of a dates x series wealth index over each window; since the first date without ``starts``"""
+    if starts is None:
+        return wealth / wealth[0] - 1
+    returns = np.full(wealth.shape, np.nan)
+    valid = starts >= 0
+    returns[valid] = wealth[valid] / wealth[starts[valid]] - 1
+    return returns
+
+
+def performance_history(dates, values, daily_flows, flow_codes, flow_dates, flow_amounts, series,
+                        windows=WINDOWS, warm=False, previous=None):
+    """XIRR and time-weighted return of every series over every window, as of every date
+
+    ``values`` and ``daily_flows`` are dates x series arrays of the value
+    held at each close and the net cash trades put in that day (positive
+    for buys). ``flow_codes``, ``flow_dates`` and ``flow_amounts`` are the
+    individual trades as cash received (buys negative), by column of
+    ``series``. Returns two dicts, ``{window: DataFrame}`` of XIRR and of
+    returns, each frame indexed by date with one column per series.
+
+    ``previous`` is an earlier XIRR history of the same series whose values
+    and flows are unchanged up to its last date, as when new days are only
+    appended: its rates are kept up to that date and only later windows are
+    solved. Returns are cheap and always computed for every date.
+    """
+    dates = pd.DatetimeIndex(dates)
+    days = day_numbers(dates)
+    trade_days = day_numbers(flow_dates)
+
+    returns = daily_returns(values, daily_flows)
+    wealth = np.cumprod(1 + np.nan_to_num(returns, nan=0.0), axis=0)
+
+    xirr, growth = {}, {}
+    for window, offset in windows.items():
+        starts = None if offset is None else window_starts(dates, offset)
+        ends, kept = None, None
+        earlier = (previous or {}).get(window)
+        if earlier is not None and list(earlier.columns) == list(series) and len(earlier):
+            # A window ending by the earlier last date has the same flows and values as then,
+            # unless it opens on the first date, which may have moved
+            kept = np.flatnonzero(dates <= earlier.index[-1])
+            if starts is not None:
+                kept = kept[starts[kept] != 0]
+            ends = np.setdiff1d(np.arange(len(dates)), kept)
+        rates = windowed_xirr(flow_codes, trade_days, flow_amounts, days, values, starts, warm=warm, ends=ends)
+        if kept is not None:
+            rates[kept] = earlier.reindex(dates[kept]).to_numpy(dtype=float)
+            if starts is not None:
+                # Windows that now open before the first date have no XIRR
+                rates[kept[starts[kept] < 0]] = np.nan
+        xirr[window] = pd.DataFrame(rates, index=dates, columns=series)
+        growth[window] = pd.DataFrame(window_returns(wealth, starts), index=dates, columns=series)
+    return xirr, growth
+
+
+def history_table(xirr, returns):
+    """The two histories as one long table: Date, Window, Series, XIRR, Return"""
+    frames = []
+    for window, rates in xirr.items():
+        frame = pd.DataFrame({
+            'XIRR': rates.stack(future_stack=True),
+            'Return': returns[window].stack(future_stack=True),
+        }).rename_axis(['Date', 'Series']).reset_index()
+        frame.insert(1, 'Window', window)
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=['Date', 'Window', 'Series', 'XIRR', 'Return'])
+    return pd.concat(frames, ignore_index=True)
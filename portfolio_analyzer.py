@@ -1,6 +1,5 @@
 import pandas as pd
 import numpy as np
-import yfinance as yf
 import requests
 from datetime import datetime, timedelta
 import streamlit as st
@@ -9,43 +8,172 @@ import plotly.express as px
 from dateutil import parser
 import json
 import warnings
+from contextlib import contextmanager
+from valuation import align_close_prices, compute_flow_frame, compute_value_frame
+from positions import PositionTimeline, symbol_codes, trade_rows
+from performance import PORTFOLIO, performance_history
+from risk import RiskAnalytics, extend_risk
+from price_cache import PriceCache
+from market_data import MarketDataFetcher, YFinanceProvider
+from trade_store import TRADE_SCHEMA, clean_trades, concat_compact, normalize_trades, stream_trades
+from xirr import group_xirr
+from fees import cash_received, fee_drag, trade_costs, trade_fees
+from lots import CLOSED_LOT_COLUMNS, OPEN_LOT_COLUMNS, add_lot_costs, match_lots, profit_and_loss
+from splits import adjust_for_splits, split_factors
+from fx_rates import FXRateTable, fetch_fx_rates
+from instrumentation import RunReport
+from incremental import (classify_files, file_fingerprint, load_state, read_appended_rows, save_state,
+                         state_path_for)
 warnings.filterwarnings('ignore')
 
+# Reporting currencies, with approximate units per USD used when no FX history is available
+BASE_CURRENCY_RATES = {
+    'USD': 1.0,
+    'INR': 83.0,
+    'SGD': 1.35
+}
+
+# Steps of run_complete_analysis, in order, as named in the run report and progress callbacks
+ANALYSIS_STAGES = ['load_trades', 'holdings', 'stock_splits', 'apply_splits', 'currency_rates',
+                   'transaction_prices', 'historical_prices', 'portfolio_values', 'xirr']
+
+# Attributes each step leaves for views to draw, available as soon as that step is done
+STAGE_OUTPUTS = {
+    'load_trades': ['all_trades'],
+    'holdings': ['holdings'],
+    'stock_splits': ['stock_splits', 'historical_prices'],
+    'apply_splits': ['split_adjusted_trades', 'closed_lots', 'open_lots', 'profit_and_loss', 'holdings'],
+    'currency_rates': ['currency_rates'],
+    'transaction_prices': ['all_trades', 'fees_by_symbol', 'fees_by_period'],
+    'historical_prices': ['historical_prices'],
+    'portfolio_values': ['portfolio_values', 'risk'],
+    'xirr': ['xirr_results', 'portfolio_xirr', 'xirr_history', 'return_history'],
+}
+
+class AnalysisCancelled(Exception):
+    """Raised by a progress callback to stop a run before its next step"""
+
 class PortfolioAnalyzer:
-    def __init__(self):
+    def __init__(self, provider=None, price_cache=None, fetcher=None, lot_method=None, fx_rates=None,
+                 reporting_currencies=None, trace_path=None, trace_memory=False, progress=None,
+                 benchmark=None):
+        # Market data backend: Yahoo Finance by default, or a local/synthetic provider for offline runs
+        if fetcher is not None:
+            provider = fetcher.provider
+        self.provider = provider if provider is not None else YFinanceProvider()
+        # Concurrent market data fetcher; an optional PriceCache serves data from disk where possible
+        self.fetcher = fetcher if fetcher is not None else MarketDataFetcher(self.provider, price_cache=price_cache)
+        # Optional lot matching ('fifo', 'lifo' or 'average') for holdings cost and the realized and
+        # unrealized P/L ledger; None keeps the net average only
+        self.lot_method = lot_method
+        # Historical FX rates: an FXRateTable or CSV path, or None to fetch '<CUR>=X' history from the provider
+        self.fx_rates = fx_rates
+        # Currencies of the Price_<CUR> and Value_<CUR> columns
+        self.reporting_currencies = list(reporting_currencies or BASE_CURRENCY_RATES)
+        # Optional benchmark symbol (e.g. 'SPY') the portfolio's beta is measured against
+        self.benchmark = benchmark
         self.trades_data = []
         self.holdings = {}
         self.stock_splits = {}
-        self.currency_rates = {}
+        self.currency_rates = None
         self.historical_prices = {}
         self.portfolio_values = {}
+        self.closed_lots = pd.DataFrame(columns=CLOSED_LOT_COLUMNS)
+        self.open_lots = pd.DataFrame(columns=OPEN_LOT_COLUMNS)
+        self.profit_and_loss = pd.DataFrame()
+        self.fees_by_symbol = pd.DataFrame()
+        self.fees_by_period = pd.DataFrame()
+        self.risk = None
+        self.xirr_history = {}
+        self.return_history = {}
+        # Wall/CPU time, peak memory and rows of each step of the last run; optionally
+        # written to trace_path as Chrome trace events
+        self.trace_path = trace_path
+        self.trace_memory = trace_memory
+        self.run_report = RunReport(trace_memory=trace_memory)
+        # Optional progress(stage, state) callback, told as each step is 'running' and then
+        # 'done' or 'failed'; it may raise AnalysisCancelled to stop the run
+        self.progress = progress
+        
+    @contextmanager
+    def _timed(self, stage):
+        if self.progress:
+            self.progress(stage, 'running')
+        try:
+            with self.run_report.stage(stage) as record:
+                yield record
+        except Exception:
+            if self.progress:
+                self.progress(stage, 'failed')
+            raise
+        if self.progress:
+            self.progress(stage, 'done')
+    
+    def _skipped(self, stage):
+        """Report a step an incremental run had nothing to do for, its previous output standing"""
+        if self.progress:
+            self.progress(stage, 'running')
+            self.progress(stage, 'done')
+    
+    def stage_outputs(self, stage):
+        """What ``stage`` produced, copied shallowly so later steps' changes do not show through"""
+        outputs = {}
+        for name in STAGE_OUTPUTS[stage]:
+            value = getattr(self, name, None)
+            if isinstance(value, pd.DataFrame):
+                value = value.copy(deep=False)
+            elif isinstance(value, dict):
+                value = dict(value)
+            outputs[name] = value
+        return outputs
+    
+    def _stage_rows(self):
+        """Size of what each step produced, for the run report"""
+        trades = getattr(self, 'all_trades', None)
+        return {
+            'load_trades': lambda: len(trades),
+            'holdings': lambda: len(self.holdings),
+            'stock_splits': lambda: len(self.stock_splits),
+            'apply_splits': lambda: len(trades),
+            'currency_rates': lambda: self.currency_rates.rates.size,
+            'transaction_prices': lambda: len(trades),
+            'historical_prices': lambda: sum(len(history) for history in self.historical_prices.values()),
+            'portfolio_values': lambda: len(self.portfolio_values),
+            'xirr': lambda: len(self.xirr_results),
+        }
+    
+    def _finish_run_report(self):
+        """Fill in row counts, print the report and write the trace file if one was asked for"""
+        counts = self._stage_rows()
+        for record in self.run_report.stages:
+            if record['error'] is None and record['stage'] in counts:
+                try:
+                    record['rows'] = int(counts[record['stage']]())
+                except Exception:
+                    pass
+        print("Run report:")
+        print(self.run_report.format_table())
+        if self.trace_path:
+            self.run_report.write_trace(self.trace_path)
+            print(f"Wrote trace to {self.trace_path}")
+    
+    def load_trade_data(self, file_paths, chunksize=None):
+        """Step 1: Create a simple data structure to append and store the files
+        
+        With ``chunksize`` the files are streamed in chunks of that many rows into
+        compact dtypes instead of being kept whole in ``trades_data``.
+        """
+        if chunksize:
+            self.all_trades = stream_trades(file_paths, chunksize)
+            print(f"Total trades loaded: {len(self.all_trades)}")
+            return
         
-    def load_trade_data(self, file_paths):
-        """Step 1: Create a simple data structure to append and store the files"""
         for file_path in file_paths:
             try:
                 df = pd.read_csv(file_path)
                 
-                # Handle the exact format of user's CSV files
-                # Filter for actual trade data (not header rows)
-                df = df[df['Trades'] == 'Trades']  # Remove header rows
-                df = df[df['DataDiscriminator'] == 'Order']  # Keep only order rows (not 'Data')
-                
-                # Convert date/time column - handle the exact format from user's files
-                df['Date/Time'] = pd.to_datetime(df['Date/Time'], format='%Y-%m-%d, %H:%M:%S')
-                df['Date'] = df['Date/Time'].dt.date
-                
-                # Convert quantity to numeric, handling comma-separated values
-                df['Quantity'] = df['Quantity'].astype(str).str.replace(',', '').astype(float)
-                
-                # Convert price columns to numeric
-                df['T. Price'] = pd.to_numeric(df['T. Price'], errors='coerce')
-                df['C. Price'] = pd.to_numeric(df['C. Price'], errors='coerce')
-                df['Proceeds'] = pd.to_numeric(df['Proceeds'], errors='coerce')
-                
-                # Add any missing columns that might be needed
-                if 'Currency' not in df.columns:
-                    df['Currency'] = 'USD'
+                # Handle the exact format of user's CSV files: order rows, dates and numbers
+                df = clean_trades(df)
                 
                 self.trades_data.append(df)
                 print(f"Loaded {len(df)} trades from {file_path}")
@@ -60,275 +188,458 @@ class PortfolioAnalyzer:
                 else:
                     print("No dataframe created")
         
-        # Combine all data
+        # Combine all data into the typed trade table
         if self.trades_data:
-            self.all_trades = pd.concat(self.trades_data, ignore_index=True)
-            self.all_trades = self.all_trades.sort_values('Date/Time')
+            self.all_trades = normalize_trades(pd.concat(self.trades_data, ignore_index=True))
             print(f"Total trades loaded: {len(self.all_trades)}")
         else:
             self.all_trades = pd.DataFrame()
     
-    def create_master_holdings_list(self):
-        """Step 2: Create a master list of holdings"""
+    def create_master_holdings_list(self, symbols=None):
+        """Step 2: Create a master list of holdings
+        
+        Fees are the commissions and fees paid on all of a symbol's trades. With a
+        ``lot_method``, compute_lots adds the cost of the open lots once splits are
+        applied. With ``symbols`` only those symbols are recomputed; the other rows
+        of the existing holdings are kept.
+        """
         if self.all_trades.empty:
             return
         
-        # Group by symbol and calculate current holdings
-        holdings_summary = self.all_trades.groupby(['Symbol', 'Currency']).agg({
-            'Quantity': 'sum',
-            'Proceeds': 'sum',
-            'T. Price': lambda x: (x * self.all_trades.loc[x.index, 'Quantity']).sum() / self.all_trades.loc[x.index, 'Quantity'].sum() if self.all_trades.loc[x.index, 'Quantity'].sum() != 0 else 0
-        }).reset_index()
+        trades = self.all_trades
+        if symbols is not None:
+            trades = trades[trades['Symbol'].isin(symbols)]
+        
+        # Group by symbol and sum quantity, proceeds, fees and price x quantity in one pass
+        sums = pd.DataFrame({
+            'Symbol': trades['Symbol'],
+            'Currency': trades['Currency'],
+            'Quantity': trades['Quantity'],
+            'Proceeds': trades['Proceeds'],
+            'Fees': trade_fees(trades),
+            'Weighted': trades['Quantity'] * trades['T. Price'],
+        }).groupby(['Symbol', 'Currency'], observed=True).sum()
+        
+        # Quantity-weighted average price
+        quantity = sums['Quantity'].to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sums['T. Price'] = np.where(quantity != 0, sums['Weighted'].to_numpy() / quantity, 0.0)
+        holdings_summary = sums.drop(columns='Weighted').reset_index()
         
         # Filter out zero holdings
-        self.holdings = holdings_summary[holdings_summary['Quantity'] != 0].copy()
-        self.holdings['Avg_Price'] = self.holdings['T. Price']
-        self.holdings['Total_Invested'] = self.holdings['Quantity'] * self.holdings['Avg_Price']
+        holdings = holdings_summary[holdings_summary['Quantity'] != 0].copy()
+        holdings['Avg_Price'] = holdings['T. Price']
+        holdings['Total_Invested'] = holdings['Quantity'] * holdings['Avg_Price']
+        
+        if symbols is not None:
+            kept = self.holdings[~self.holdings['Symbol'].isin(symbols)]
+            # Share the trade table's categories so the rows stay categorical after concat
+            kept = kept.astype({column: self.all_trades[column].dtype for column in ['Symbol', 'Currency']})
+            holdings = pd.concat([kept, holdings]).sort_values(['Symbol', 'Currency']).reset_index(drop=True)
+        self.holdings = holdings
         
         print(f"Current holdings: {len(self.holdings)} symbols")
         return self.holdings
     
-    def get_stock_splits(self):
-        """Step 3: Get stock split details"""
-        symbols = self.holdings['Symbol'].unique()
+    def price_window(self):
+        """First and last day of the price history fetched: the year up to today"""
+        end = pd.Timestamp.now().normalize()
+        return end - pd.DateOffset(years=1), end
+    
+    def valuation_symbols(self, window=None):
+        """Symbols held at some point in the price window: those held now and those traded within it"""
+        start, _ = window or self.price_window()
+        symbols = set(map(str, self.holdings['Symbol'].unique()))
+        recent = (self.all_trades['Date/Time'] >= start).to_numpy()
+        symbols.update(map(str, self.all_trades['Symbol'][recent].unique()))
+        return sorted(symbols)
+    
+    def fetch_market_data(self, symbols, since=None, window=None):
+        """Fetch splits and one year of price history for ``symbols`` in one concurrent pass
+        
+        With ``since`` only history from that date on is fetched and merged into
+        the history already held, dropping days that fell out of the one-year window.
+        ``window`` is the (start, end) to cover instead of price_window().
+        """
+        start, end = window or self.price_window()
+        self.market_data_end = end
+        
+        started = datetime.now()
+        results = self.fetcher.fetch_all(list(symbols), start if since is None else pd.Timestamp(since), end)
+        
+        failed = 0
+        for symbol, result in results.items():
+            if result['error'] is not None:
+                failed += 1
+                print(f"Error getting market data for {symbol} after {result['attempts']} attempts: {result['error']}")
+                if since is not None and symbol in self.stock_splits:
+                    # Keep what the previous run had rather than dropping the symbol
+                    continue
+            self.stock_splits[symbol] = result['splits']
+            history = result['history']
+            if since is not None and symbol in self.historical_prices:
+                history = pd.concat([self.historical_prices[symbol], history])
+                history = history[~history.index.duplicated(keep='last')].sort_index()
+                days = history.index.tz_localize(None) if history.index.tz is not None else history.index
+                history = history[days >= start]
+            if not history.empty:
+                self.historical_prices[symbol] = history
         
+        elapsed = (datetime.now() - started).total_seconds()
+        print(f"Fetched market data for {len(results)} symbols in {elapsed:.1f}s ({failed} failed)")
+    
+    def refetch_market_data(self, symbols):
+        """Fetch the whole price window of ``symbols`` again, dropping their held and cached history"""
+        price_cache = self.fetcher.price_cache
         for symbol in symbols:
-            try:
-                stock = yf.Ticker(symbol)
-                splits = stock.splits
-                
-                if not splits.empty:
-                    self.stock_splits[symbol] = splits
-                    print(f"Found splits for {symbol}: {len(splits)} splits")
-                else:
-                    self.stock_splits[symbol] = pd.Series()
-                    
-            except Exception as e:
-                print(f"Error getting splits for {symbol}: {e}")
-                self.stock_splits[symbol] = pd.Series()
+            self.historical_prices.pop(symbol, None)
+            if price_cache is not None:
+                price_cache.invalidate_history(symbol)
+        print(f"Refetching price history for {len(symbols)} symbols with new splits")
+        self.fetch_market_data(sorted(symbols))
+    
+    def get_stock_splits(self):
+        """Step 3: Get stock split details
         
-        # Add a small delay to avoid rate limiting
-        import time
-        time.sleep(0.1)
+        Covers every symbol held during the price window, so positions closed
+        within it still have prices for the valuation history.
+        """
+        symbols = self.valuation_symbols()
+        
+        # Splits and price history are fetched together in a single pass
+        self.fetch_market_data(symbols)
+        
+        for symbol in symbols:
+            splits = self.stock_splits[symbol]
+            if not splits.empty:
+                print(f"Found splits for {symbol}: {len(splits)} splits")
     
     def apply_stock_splits(self):
         """Step 4: Transform input files to reflect split adjusted price and quantity"""
         if self.all_trades.empty:
             return
         
-        # Create a copy for split-adjusted data
-        self.split_adjusted_trades = self.all_trades.copy()
+        # One cumulative factor per trade from all later splits of its symbol
+        factors = split_factors(self.all_trades, self.stock_splits)
+        self.split_adjusted_trades = adjust_for_splits(self.all_trades, factors)
         
-        for symbol, splits in self.stock_splits.items():
-            if splits.empty:
-                continue
-                
-            symbol_trades = self.split_adjusted_trades[self.split_adjusted_trades['Symbol'] == symbol]
-            
-            for split_date, split_ratio in splits.items():
-                try:
-                    # Convert split_date to pandas Timestamp for proper comparison
-                    split_date_ts = pd.Timestamp(split_date)
-                    
-                    # Find trades before the split date
-                    mask = (symbol_trades['Date/Time'] < split_date_ts)
-                    
-                    # Apply split adjustment
-                    self.split_adjusted_trades.loc[mask, 'Quantity'] *= split_ratio
-                    self.split_adjusted_trades.loc[mask, 'T. Price'] /= split_ratio
-                    self.split_adjusted_trades.loc[mask, 'C. Price'] /= split_ratio
-                    self.split_adjusted_trades.loc[mask, 'Proceeds'] = (
-                        self.split_adjusted_trades.loc[mask, 'Quantity'] * 
-                        self.split_adjusted_trades.loc[mask, 'T. Price']
-                    )
-                except Exception as e:
-                    print(f"Error applying split for {symbol}: {e}")
-                    continue
+        print(f"Applied stock splits to trade data ({int((factors != 1).sum())} trades adjusted)")
+    
+    def compute_lots(self, symbols=None):
+        """Match the split-adjusted trades into closed and open lots under ``lot_method``
+        
+        Sets closed_lots, open_lots and profit_and_loss, the realized and
+        unrealized P/L of each symbol at its latest close (see lots.py), and adds
+        the ledger's open cost to holdings as Lot_Cost and Lot_Avg_Price. With
+        ``symbols`` only those symbols' lots are matched again; the other
+        symbols' lots are kept.
+        """
+        if not self.lot_method or self.all_trades.empty:
+            return
         
-        print("Applied stock splits to trade data")
+        trades = self.split_adjusted_trades
+        if symbols is not None:
+            trades = trades[trades['Symbol'].isin(symbols)]
+        closed, open_lots = match_lots(trades, self.lot_method)
+        
+        if symbols is not None:
+            # Symbols are matched one after another, so the kept rows only need regrouping
+            dtypes = {column: self.all_trades[column].dtype for column in ['Symbol', 'Currency']}
+            frames = []
+            for lots, previous in [(closed, self.closed_lots), (open_lots, self.open_lots)]:
+                kept = previous[~previous['Symbol'].isin(symbols)].astype(dtypes)
+                frames.append(pd.concat([kept, lots.astype(dtypes)]).sort_values('Symbol', kind='stable')
+                              .reset_index(drop=True))
+            closed, open_lots = frames
+        self.closed_lots, self.open_lots = closed, open_lots
+        
+        last_prices = {symbol: history['Close'].iloc[-1]
+                       for symbol, history in self.historical_prices.items() if not history.empty}
+        self.profit_and_loss = profit_and_loss(closed, open_lots, last_prices)
+        self.holdings = add_lot_costs(self.holdings, self.profit_and_loss)
+        
+        print(f"Matched lots ({self.lot_method}): {len(closed)} closed, {len(open_lots)} open, "
+              f"realized P/L {self.profit_and_loss['Realized_PL'].sum():,.2f} in trade currencies")
     
     def get_currency_rates(self):
-        """Step 5: Get historical daily currency pairing for each date"""
-        # Get unique dates from trades
-        unique_dates = self.all_trades['Date'].unique()
-        
-        # For demo purposes, we'll use a simple currency conversion
-        # In a real implementation, you would fetch from a currency API
-        base_rates = {
-            'USD': 1.0,
-            'INR': 83.0,  # Approximate USD to INR rate
-            'SGD': 1.35   # Approximate USD to SGD rate
-        }
+        """Step 5: Get historical daily currency pairing for each date
         
-        for date in unique_dates:
-            self.currency_rates[date] = base_rates.copy()
+        Builds an FXRateTable of units per USD for every trade currency and every
+        reporting currency, from the ``fx_rates`` given to the analyzer or else
+        fetched from the market data provider (and its cache). Currencies without
+        history fall back to their fixed BASE_CURRENCY_RATES value.
+        """
+        currencies = set(self.all_trades['Currency'].astype(str).unique()) | set(self.reporting_currencies)
+        self.currency_rates = self.load_currency_rates(currencies, self.all_trades['Date/Time'].min().normalize())
+    
+    def load_currency_rates(self, currencies, start, end=None):
+        """FXRateTable for ``currencies`` from ``start`` to ``end`` (today), per the analyzer's ``fx_rates``"""
+        if isinstance(self.fx_rates, FXRateTable):
+            table = self.fx_rates
+        elif self.fx_rates:
+            table = FXRateTable.read_csv(self.fx_rates)
+        else:
+            if end is None:
+                end = pd.Timestamp.now().normalize()
+            table = fetch_fx_rates(self.fetcher, currencies, start, end, fallback=BASE_CURRENCY_RATES)
         
-        print(f"Loaded currency rates for {len(unique_dates)} dates")
+        missing = sorted(currency for currency in currencies if currency not in table)
+        if missing:
+            print(f"No currency rates for {', '.join(missing)}")
+        print(f"Loaded currency rates for {len(table.currencies)} currencies over {len(table.dates)} dates")
+        return table
+    
+    def fx_table(self):
+        """Rates from step 5, or the fixed BASE_CURRENCY_RATES before it has run"""
+        if self.currency_rates is None:
+            return FXRateTable.constant(BASE_CURRENCY_RATES)
+        return self.currency_rates
     
     def compute_transaction_prices_in_currencies(self):
-        """Step 6: Compute transaction price in each currency"""
+        """Step 6: Compute transaction price and fees in each currency
+        
+        Adds Price_<CUR> and Fee_<CUR> columns (fees as a positive amount) for
+        every reporting currency, and the fee drag in the first one:
+        ``fees_by_symbol`` and ``fees_by_period`` (by month) hold the fees paid,
+        the gross value traded and their ratio (see fees.fee_drag).
+        """
         if self.all_trades.empty:
             return
         
-        # Add currency conversion columns
-        self.all_trades['Price_USD'] = self.all_trades['T. Price']
-        self.all_trades['Price_INR'] = self.all_trades['T. Price'] * 83.0
-        self.all_trades['Price_SGD'] = self.all_trades['T. Price'] * 1.35
-        
-        # Adjust based on actual currency
-        for currency in ['USD', 'INR', 'SGD']:
-            mask = self.all_trades['Currency'] == currency
-            if currency == 'USD':
-                self.all_trades.loc[mask, 'Price_USD'] = self.all_trades.loc[mask, 'T. Price']
-            elif currency == 'INR':
-                self.all_trades.loc[mask, 'Price_INR'] = self.all_trades.loc[mask, 'T. Price']
-                self.all_trades.loc[mask, 'Price_USD'] = self.all_trades.loc[mask, 'T. Price'] / 83.0
-            elif currency == 'SGD':
-                self.all_trades.loc[mask, 'Price_SGD'] = self.all_trades.loc[mask, 'T. Price']
-                self.all_trades.loc[mask, 'Price_USD'] = self.all_trades.loc[mask, 'T. Price'] / 1.35
-        
-        print("Computed transaction prices in multiple currencies")
+        # Every trade's conversion factor into every reporting currency in one trades x
+        # currencies array, at the rates in effect on each trade date; prices and fees
+        # are both scaled from it
+        trades = self.all_trades
+        factors = self.fx_table().convert_matrix(np.ones(len(trades)), trades['Date/Time'], trades['Currency'],
+                                                 self.reporting_currencies)
+        prices = factors * trades['T. Price'].to_numpy(dtype=float)[:, None]
+        fees = factors * trade_fees(trades)[:, None]
+        columns = [f'Price_{currency}' for currency in self.reporting_currencies]
+        trades[columns] = pd.DataFrame(prices, index=trades.index, columns=columns)
+        columns = [f'Fee_{currency}' for currency in self.reporting_currencies]
+        trades[columns] = pd.DataFrame(fees, index=trades.index, columns=columns)
+        
+        traded = np.abs(trades['Quantity'].to_numpy(dtype=float) * prices[:, 0])
+        self.fees_by_symbol = fee_drag(trades['Symbol'], fees[:, 0], traded, 'Symbol')
+        months = trades['Date/Time'].to_numpy().astype('datetime64[M]')
+        self.fees_by_period = fee_drag(months, fees[:, 0], traded, 'Period')
+        self.fees_by_period.index = self.fees_by_period.index.to_period('M')
+        
+        total = self.fees_by_symbol['Fees'].sum()
+        print(f"Computed transaction prices and fees in multiple currencies (fees {total:,.2f} "
+              f"{self.reporting_currencies[0]}, {total / self.fees_by_symbol['Traded'].sum():.3%} of value traded)")
     
     def get_historical_prices(self):
         """Step 7: Get split adjusted historical prices / NAVs of the stocks"""
-        symbols = self.holdings['Symbol'].unique()
+        symbols = self.valuation_symbols()
+        
+        # History normally arrives with the splits in step 3; fetch anything not attempted yet
+        missing = [symbol for symbol in symbols if symbol not in self.stock_splits]
+        if missing:
+            self.fetch_market_data(missing)
         
         for symbol in symbols:
-            try:
-                stock = yf.Ticker(symbol)
-                hist = stock.history(period="1y")
-                
-                if not hist.empty:
-                    self.historical_prices[symbol] = hist
-                    print(f"Loaded historical prices for {symbol}: {len(hist)} days")
-                else:
-                    print(f"No historical data found for {symbol}")
-                    
-            except Exception as e:
-                print(f"Error getting historical prices for {symbol}: {e}")
+            if symbol in self.historical_prices:
+                print(f"Loaded historical prices for {symbol}: {len(self.historical_prices[symbol])} days")
+            else:
+                print(f"No historical data found for {symbol}")
     
-    def compute_portfolio_values(self):
-        """Step 8: Compute daily portfolio value across currencies"""
-        if not self.historical_prices or self.holdings.empty:
+    def compute_portfolio_values(self, append=False):
+        """Step 8: Compute daily portfolio value across currencies
+        
+        Each day is valued at the units held at that day's close, rebuilt from
+        the split-adjusted trades (the price history is split adjusted too),
+        so the history reflects every buy and sell rather than today's holdings.
+        With ``append`` no trades are taken to have changed: only dates after
+        the last one already valued are computed and appended to the existing values.
+        """
+        trades = getattr(self, 'split_adjusted_trades', self.all_trades)
+        if not self.historical_prices or trades.empty:
             return
         
-        # Get all unique dates from historical data
-        all_dates = set()
-        for symbol, hist in self.historical_prices.items():
-            all_dates.update(hist.index.date)
+        # Align all Close series on one date index (as-of forward fill)
+        prices = align_close_prices(self.historical_prices, sorted(self.historical_prices))
         
-        all_dates = sorted(list(all_dates))
+        # Each symbol is quoted in its trading currency; rates vary by date
+        currencies = trades.groupby('Symbol', observed=True)['Currency'].first().astype(str)
+        currencies.index = currencies.index.astype(str)
+        rate_currencies = sorted(set(self.reporting_currencies) | set(currencies.reindex(prices.columns).dropna()))
         
-        portfolio_values = []
+        def value(prices):
+            rates = self.fx_table().frame(prices.index, rate_currencies)
+            # Date x symbol units held from cumulative sums over the trades
+            positions = PositionTimeline.from_trades(trades, prices.index, prices.columns)
+            values = compute_value_frame(prices, positions, rates, currencies, reporting=self.reporting_currencies)
+            # Net cash the day's trades put in, for time-weighted returns
+            flows = compute_flow_frame(trades, prices.index, prices.columns, rates, reporting=self.reporting_currencies)
+            return pd.concat([values, flows], axis=1)
         
-        for date in all_dates:
-            total_value_usd = 0
-            total_value_inr = 0
-            total_value_sgd = 0
-            
-            for _, holding in self.holdings.iterrows():
-                symbol = holding['Symbol']
-                quantity = holding['Quantity']
-                
-                if symbol in self.historical_prices:
-                    hist = self.historical_prices[symbol]
-                    date_str = date.strftime('%Y-%m-%d')
-                    
-                    # Find the closest available date
-                    available_dates = hist.index.date
-                    if date in available_dates:
-                        price = hist.loc[hist.index.date == date, 'Close'].iloc[0]
-                    else:
-                        # Use the most recent price before this date
-                        before_dates = [d for d in available_dates if d < date]
-                        if before_dates:
-                            closest_date = max(before_dates)
-                            price = hist.loc[hist.index.date == closest_date, 'Close'].iloc[0]
-                        else:
-                            continue
-                    
-                    value_usd = quantity * price
-                    total_value_usd += value_usd
-                    total_value_inr += value_usd * 83.0
-                    total_value_sgd += value_usd * 1.35
-            
-            portfolio_values.append({
-                'Date': date,
-                'Value_USD': total_value_usd,
-                'Value_INR': total_value_inr,
-                'Value_SGD': total_value_sgd
-            })
-        
-        if portfolio_values:
-            self.portfolio_values = pd.DataFrame(portfolio_values)
+        new_values = None
+        if append and len(self.portfolio_values) and len(prices):
+            # Value only the new tail and drop days that fell out of the price window
+            last = self.portfolio_values['Date'].iloc[-1]
+            portfolio_values = self.portfolio_values[self.portfolio_values['Date'] >= prices.index[0].date()]
+            new_prices = prices[prices.index.date > last]
+            new_values = value(new_prices) if len(new_prices) else portfolio_values.iloc[:0]
+            if len(new_prices):
+                portfolio_values = pd.concat([portfolio_values, new_values], ignore_index=True)
+        else:
+            # Value every date in every currency with matrix operations
+            portfolio_values = value(prices)
+        
+        if not portfolio_values.empty:
+            self.portfolio_values = portfolio_values
             print(f"Computed portfolio values for {len(self.portfolio_values)} days")
+            self.compute_risk(new_values)
         else:
             self.portfolio_values = pd.DataFrame()
+            self.risk = None
             print("No portfolio values computed")
     
-    def compute_xirr(self):
-        """Step 9: Compute XIRR for each holding"""
+    def get_benchmark_history(self):
+        """Price history of the benchmark over the price window, None without one"""
+        if not self.benchmark:
+            return None
+        start, end = self.price_window()
+        result = self.fetcher.fetch_all([self.benchmark], start, end)[self.benchmark]
+        if result['error'] is not None:
+            print(f"Error getting benchmark history for {self.benchmark}: {result['error']}")
+            return None
+        return result['history']
+    
+    def compute_risk(self, new_values=None):
+        """Daily time-weighted returns, drawdown and risk statistics of the portfolio value
+        
+        Measured in the first reporting currency. With ``new_values`` (days just
+        appended to the valuation) the previous run's statistics are extended
+        with those days only; days that have since left the price window stay
+        in them.
+        """
+        if new_values is None or self.risk is None:
+            self.risk, new_values = RiskAnalytics(), self.portfolio_values
+        if new_values.empty:
+            return
+        extend_risk(self.risk, new_values, self.reporting_currencies[0], self.get_benchmark_history())
+        summary = self.risk.summary()
+        print(f"Time-weighted return {summary['twr']:.2%}, max drawdown {summary['max_drawdown']:.2%} "
+              f"over {summary['days']} days")
+    
+    def compute_xirr(self, symbols=None):
+        """Step 9: Compute XIRR for each holding and for the whole portfolio
+        
+        Cash flows are the trade proceeds less fees (buys negative, sells positive) closed by
+        the current value of the position today. All series are solved together by
+        the vectorized engine in xirr.py; a holding whose flows have no XIRR falls
+        back to its simple return. The portfolio XIRR covers every trade, closed
+        positions included, converted to USD.
+        
+        With ``symbols`` only those holdings are recomputed; results for the other
+        holdings are kept.
+        """
         if self.all_trades.empty:
             return
         
+        held = self.holdings['Symbol'].unique()
         xirr_results = {}
+        if symbols is not None:
+            current = set(held)
+            xirr_results = {symbol: rate for symbol, rate in getattr(self, 'xirr_results', {}).items()
+                            if symbol in current and symbol not in symbols}
+            held = [symbol for symbol in held if symbol in symbols]
         
-        for symbol in self.holdings['Symbol'].unique():
-            symbol_trades = self.all_trades[self.all_trades['Symbol'] == symbol].copy()
-            
-            if len(symbol_trades) < 2:
-                continue
-            
-            # Calculate cash flows
-            cash_flows = []
-            dates = []
+        # Current value of each long holding with a price, dated now. Closes are split
+        # adjusted, so they are applied to the split-adjusted quantity, as in compute_lots
+        now = pd.Timestamp(datetime.now())
+        adjusted = getattr(self, 'split_adjusted_trades', self.all_trades)
+        quantities = adjusted.groupby('Symbol', observed=True)['Quantity'].sum()
+        quantities = quantities[quantities.index.isin(self.holdings['Symbol'])]
+        last_close = pd.Series({symbol: hist['Close'].iloc[-1] for symbol, hist in self.historical_prices.items()
+                                if not hist.empty}, dtype=float)
+        current_values = (quantities[quantities > 0] * last_close).dropna()
+        
+        trades = self.all_trades
+        flows = pd.DataFrame({
+            'Symbol': np.concatenate([trades['Symbol'].astype(str).to_numpy(), current_values.index.astype(str)]),
+            'Date': np.concatenate([trades['Date/Time'].to_numpy('datetime64[ns]'),
+                                    np.full(len(current_values), now.to_datetime64(), dtype='datetime64[ns]')]),
+            'Amount': np.concatenate([cash_received(trades), current_values.to_numpy(float)]),
+        })
+        currencies = self.holdings.groupby('Symbol', observed=True)['Currency'].first().astype(str)
+        flows['Currency'] = np.concatenate([trades['Currency'].astype(str).to_numpy(),
+                                            currencies.reindex(current_values.index).fillna('USD').to_numpy()])
+        
+        symbol_flows = flows[flows['Symbol'].isin(set(map(str, held)))]
+        if not symbol_flows.empty:
+            rates = group_xirr(symbol_flows['Symbol'], symbol_flows['Date'], symbol_flows['Amount'])
             
-            for _, trade in symbol_trades.iterrows():
-                # Negative for buys (outflow), positive for sells (inflow)
-                cash_flow = -trade['Proceeds']  # Negative because it's money going out
-                cash_flows.append(cash_flow)
-                dates.append(trade['Date/Time'])
+            # Simple return where the cash flows have no XIRR (e.g. no sign change)
+            amounts, by_symbol = symbol_flows['Amount'], symbol_flows['Symbol']
+            invested = -amounts.clip(upper=0).groupby(by_symbol).sum()
+            returned = amounts.clip(lower=0).groupby(by_symbol).sum()
+            simple_returns = ((returned - invested) / invested.where(invested != 0)).fillna(0.0)
             
-            # Add current value as final cash flow
-            current_holding = self.holdings[self.holdings['Symbol'] == symbol].iloc[0]
-            if current_holding['Quantity'] > 0:
-                # Get current price
-                if symbol in self.historical_prices:
-                    hist = self.historical_prices[symbol]
-                    if not hist.empty:
-                        current_price = hist['Close'].iloc[-1]
-                        current_value = current_holding['Quantity'] * current_price
-                        cash_flows.append(current_value)
-                        dates.append(datetime.now())
-            
-            # Calculate XIRR using numpy's financial functions
-            try:
-                # Try numpy_financial first
-                try:
-                    from numpy_financial import xirr
-                    xirr_rate = xirr(dates, cash_flows)
-                    xirr_results[symbol] = xirr_rate
-                except ImportError:
-                    # Fallback to simple calculation if numpy_financial not available
-                    total_invested = sum([cf for cf in cash_flows if cf < 0])
-                    current_value = sum([cf for cf in cash_flows if cf > 0])
-                    if total_invested != 0:
-                        simple_return = (current_value - total_invested) / total_invested
-                        xirr_results[symbol] = simple_return
-                    else:
-                        xirr_results[symbol] = 0
-            except:
-                # Fallback to simple calculation
-                total_invested = sum([cf for cf in cash_flows if cf < 0])
-                current_value = sum([cf for cf in cash_flows if cf > 0])
-                if total_invested != 0:
-                    simple_return = (current_value - total_invested) / total_invested
-                    xirr_results[symbol] = simple_return
-                else:
-                    xirr_results[symbol] = 0
+            # A single cash flow has no return to measure
+            rates = rates.fillna(simple_returns)[amounts.groupby(by_symbol).size() >= 2]
+            xirr_results.update(rates.to_dict())
+        
+        # Portfolio XIRR over all cash flows in USD
+        rates = self.fx_table().lookup(flows['Date'], flows['Currency'])
+        usd_amounts = flows['Amount'] / np.where(np.isnan(rates), 1.0, rates)
+        self.portfolio_xirr = group_xirr(np.zeros(len(flows), dtype=int), flows['Date'], usd_amounts).iloc[0]
         
         self.xirr_results = xirr_results
-        print(f"Computed XIRR for {len(xirr_results)} holdings")
+        print(f"Computed XIRR for {len(xirr_results)} holdings (portfolio: {self.portfolio_xirr:.2%})")
+    
+    def compute_xirr_history(self, append=False):
+        """XIRR and time-weighted return over rolling and since-inception windows, as of every valued date
+        
+        Covers every symbol valued in step 8, in its trading currency, and the
+        portfolio in the first reporting currency. ``xirr_history`` and
+        ``return_history`` map each window of performance.WINDOWS to a frame
+        indexed by date with a column per symbol and one for the portfolio.
+        With ``append`` no trade or past price is taken to have changed: the
+        existing XIRR history is kept and only windows ending on later dates
+        are solved.
+        """
+        trades = getattr(self, 'split_adjusted_trades', self.all_trades)
+        if not len(self.portfolio_values) or trades.empty:
+            self.xirr_history, self.return_history = {}, {}
+            return
+        
+        dates = pd.DatetimeIndex(pd.to_datetime(self.portfolio_values['Date']))
+        prices = align_close_prices(self.historical_prices, sorted(self.historical_prices)).reindex(dates)
+        symbols = prices.columns
+        n_symbols = len(symbols)
+        
+        # Daily value and net trade cash per symbol, then the portfolio as one more column
+        positions = PositionTimeline.from_trades(trades, dates, symbols)
+        values = positions.dense() * np.nan_to_num(prices.to_numpy(dtype=float))
+        rows, columns, keep = trade_rows(trades, dates, symbols)
+        keep &= (trades['Date/Time'] >= dates[0]).to_numpy()
+        cost = trade_costs(trades)
+        daily_flows = np.bincount(rows[keep] * n_symbols + columns[keep], weights=cost[keep],
+                                  minlength=len(dates) * n_symbols).reshape(len(dates), n_symbols)
+        currency = self.reporting_currencies[0]
+        values = np.column_stack([values, self.portfolio_values[f'Value_{currency}'].to_numpy(dtype=float)])
+        daily_flows = np.column_stack([daily_flows, self.portfolio_values[f'Flow_{currency}'].to_numpy(dtype=float)])
+        
+        # Every trade's proceeds net of fees twice: for its symbol, and converted for the portfolio
+        codes = symbol_codes(trades['Symbol'], symbols)
+        traded = trades[codes >= 0]
+        codes = codes[codes >= 0]
+        table = self.fx_table()
+        proceeds = cash_received(traded)
+        to_reporting = (table.lookup(traded['Date/Time'], currency)
+                        / table.lookup(traded['Date/Time'], traded['Currency'].astype(str).to_numpy()))
+        flow_codes = np.concatenate([codes, np.full(len(codes), n_symbols)])
+        flow_dates = np.concatenate([traded['Date/Time'].to_numpy(), traded['Date/Time'].to_numpy()])
+        flow_amounts = np.concatenate([proceeds, proceeds * to_reporting])
+        
+        self.xirr_history, self.return_history = performance_history(
+            dates, values, daily_flows, flow_codes, flow_dates, flow_amounts, list(symbols) + [PORTFOLIO],
+            previous=self.xirr_history if append else None)
+        latest = {window: frame[PORTFOLIO].iloc[-1] for window, frame in self.xirr_history.items()}
+        print("Portfolio XIRR by window: " + ", ".join(f"{window} {rate:.2%}" for window, rate in latest.items()))
     
     def get_latest_news(self, symbol):
         """Bonus: Get latest news for a symbol using multiple sources"""
@@ -385,9 +696,8 @@ class PortfolioAnalyzer:
             except Exception as e:
                 print(f"News API error: {e}")
             
-            # Method 2: Try Yahoo Finance news (fallback)
-            stock = yf.Ticker(symbol)
-            news = stock.news
+            # Method 2: Try the market data provider's news (Yahoo Finance by default)
+            news = self.provider.get_news(symbol)
             
             if news and len(news) > 0:
                 return news[:5]  # Return latest 5 news items
@@ -541,15 +851,20 @@ class PortfolioAnalyzer:
                 }
             ]
     
-    def run_complete_analysis(self, file_paths):
-        """Run the complete portfolio analysis"""
+    def run_complete_analysis(self, file_paths, chunksize=None, state_path=None):
+        """Run the complete portfolio analysis
+        
+        With ``state_path`` the result is saved there for run_incremental_analysis.
+        """
         print("Starting portfolio analysis...")
+        self.run_report = RunReport(trace_memory=self.trace_memory)
         print(f"Processing files: {file_paths}")
         
         try:
             # Step 1: Load trade data
             print("Step 1: Loading trade data...")
-            self.load_trade_data(file_paths)
+            with self._timed('load_trades'):
+                self.load_trade_data(file_paths, chunksize=chunksize)
             
             if self.all_trades.empty:
                 print("ERROR: No trade data loaded!")
@@ -559,7 +874,8 @@ class PortfolioAnalyzer:
             
             # Step 2: Create holdings list
             print("Step 2: Creating holdings list...")
-            self.create_master_holdings_list()
+            with self._timed('holdings'):
+                self.create_master_holdings_list()
             
             if self.holdings.empty:
                 print("ERROR: No holdings created!")
@@ -568,36 +884,52 @@ class PortfolioAnalyzer:
             print(f"Successfully created holdings for {len(self.holdings)} symbols")
             
             # Step 3: Get stock splits
-            print("Step 3: Getting stock splits...")
-            self.get_stock_splits()
+            print("Step 3: Getting stock splits and price history...")
+            with self._timed('stock_splits'):
+                self.get_stock_splits()
             
             # Step 4: Apply stock splits
             print("Step 4: Applying stock splits...")
-            self.apply_stock_splits()
+            with self._timed('apply_splits'):
+                self.apply_stock_splits()
+                self.compute_lots()
             
             # Step 5: Get currency rates
             print("Step 5: Getting currency rates...")
-            self.get_currency_rates()
+            with self._timed('currency_rates'):
+                self.get_currency_rates()
             
             # Step 6: Compute transaction prices in currencies
             print("Step 6: Computing transaction prices...")
-            self.compute_transaction_prices_in_currencies()
+            with self._timed('transaction_prices'):
+                self.compute_transaction_prices_in_currencies()
             
             # Step 7: Get historical prices
             print("Step 7: Getting historical prices...")
-            self.get_historical_prices()
+            with self._timed('historical_prices'):
+                self.get_historical_prices()
             
             # Step 8: Compute portfolio values
             print("Step 8: Computing portfolio values...")
-            self.compute_portfolio_values()
+            with self._timed('portfolio_values'):
+                self.compute_portfolio_values()
             
             # Step 9: Compute XIRR
             print("Step 9: Computing XIRR...")
-            self.compute_xirr()
+            with self._timed('xirr'):
+                self.compute_xirr()
+                self.compute_xirr_history()
+            
+            if state_path:
+                self.save_analysis_state(state_path, {path: file_fingerprint(path) for path in file_paths})
             
             print("Portfolio analysis completed successfully!")
             return True
             
+        except AnalysisCancelled as e:
+            print(f"Analysis cancelled: {e}")
+            raise
+        
         except Exception as e:
             print(f"Error during analysis: {e}")
             import traceback
@@ -622,10 +954,185 @@ class PortfolioAnalyzer:
             
             print("Basic analysis completed with some features disabled")
             return True
+        
+        finally:
+            self._finish_run_report()
+
+    def save_analysis_state(self, state_path, fingerprints):
+        """Save the trade table and derived results with the input file fingerprints"""
+        save_state(state_path, {
+            'fingerprints': fingerprints,
+            'trades': self.all_trades[[column for column in TRADE_SCHEMA if column in self.all_trades.columns]],
+            'holdings': self.holdings,
+            'stock_splits': self.stock_splits,
+            'historical_prices': self.historical_prices,
+            'market_data_end': self.market_data_end,
+            'currency_rates': self.currency_rates,
+            'portfolio_values': self.portfolio_values,
+            'risk': self.risk,
+            'xirr_results': self.xirr_results,
+            'xirr_history': self.xirr_history,
+            'return_history': self.return_history,
+            'closed_lots': self.closed_lots,
+            'open_lots': self.open_lots,
+            'lot_method': self.lot_method,
+            'reporting_currencies': self.reporting_currencies,
+        })
+    
+    def run_incremental_analysis(self, file_paths, state_path=None):
+        """Re-run the analysis reusing the previous run's state where the inputs allow
+        
+        Input files are fingerprinted. If every file is unchanged or only had rows
+        appended, only the new rows are parsed, holdings and XIRR are recomputed for
+        the symbols they touch, and price history and portfolio values are extended
+        from the previous run's last market data date. Anything else (a rewritten
+        or removed file, missing or unreadable state) runs the complete analysis.
+        
+        State is kept at ``state_path``, by default in a file of the current
+        directory named after the set of input files (see state_path_for).
+        """
+        if state_path is None:
+            state_path = state_path_for(file_paths)
+        started = datetime.now()
+        state = load_state(state_path)
+        previous = state['fingerprints'] if state else {}
+        fingerprints = {path: file_fingerprint(path, previous.get(path)) for path in file_paths}
+        
+        reason = None
+        if state is None:
+            reason = "no previous state"
+        elif state['lot_method'] != self.lot_method:
+            reason = "lot method changed"
+        elif state.get('reporting_currencies', list(BASE_CURRENCY_RATES)) != self.reporting_currencies:
+            reason = "reporting currencies changed"
+        else:
+            status, removed = classify_files(previous, fingerprints)
+            rewritten = [path for path, kind in status.items() if kind == 'changed']
+            if removed or rewritten:
+                reason = f"inputs rewritten or removed: {', '.join(rewritten + removed)}"
+        
+        if reason is None:
+            try:
+                self._run_incremental_steps(state, status)
+                self.save_analysis_state(state_path, fingerprints)
+                self._finish_run_report()
+                elapsed = (datetime.now() - started).total_seconds()
+                print(f"Incremental analysis completed in {elapsed:.1f}s")
+                return True
+            except AnalysisCancelled:
+                self._finish_run_report()
+                raise
+            except Exception as e:
+                print(f"Error during incremental analysis: {e}")
+                import traceback
+                traceback.print_exc()
+                reason = "incremental update failed"
+                # Start over from empty results; the fetcher and its cache are kept
+                self.trades_data = []
+                self.stock_splits = {}
+                self.currency_rates = None
+                self.historical_prices = {}
+                self.portfolio_values = {}
+        
+        print(f"Running complete analysis ({reason})")
+        return self.run_complete_analysis(file_paths, state_path=state_path)
+    
+    def _run_incremental_steps(self, state, status):
+        """Bring the previous run's state up to date with appended and new trade files"""
+        self.run_report = RunReport(trace_memory=self.trace_memory)
+        self.all_trades = state['trades']
+        self.holdings = state['holdings']
+        self.stock_splits = state['stock_splits']
+        self.historical_prices = state['historical_prices']
+        self.currency_rates = state['currency_rates']
+        self.portfolio_values = state['portfolio_values']
+        self.risk = state.get('risk')
+        self.xirr_results = state['xirr_results']
+        self.xirr_history = state.get('xirr_history', {})
+        self.return_history = state.get('return_history', {})
+        self.closed_lots = state.get('closed_lots', self.closed_lots)
+        self.open_lots = state.get('open_lots', self.open_lots)
+        self.market_data_end = previous_end = state['market_data_end']
+        
+        # Step 1: parse only what is new since the last run
+        with self._timed('load_trades'):
+            new_trades = []
+            for path, kind in status.items():
+                if kind == 'appended':
+                    df = read_appended_rows(path, state['fingerprints'][path]['size'])
+                elif kind == 'new':
+                    df = pd.read_csv(path)
+                else:
+                    continue
+                df = clean_trades(df)
+                print(f"Loaded {len(df)} new trades from {path}")
+                if not df.empty:
+                    new_trades.append(normalize_trades(df))
+        
+            affected = set()
+            if new_trades:
+                new_trades = normalize_trades(concat_compact(new_trades))
+                affected = set(new_trades['Symbol'].unique())
+                self.all_trades = normalize_trades(concat_compact([self.all_trades, new_trades]))
+                print(f"Total trades loaded: {len(self.all_trades)} ({len(new_trades)} new)")
+        
+        
+        # Step 2: holdings for the symbols with new trades only
+        if affected:
+            with self._timed('holdings'):
+                self.create_master_holdings_list(symbols=affected)
+        else:
+            self._skipped('holdings')
+        
+        # Step 3: full market data for newly held symbols, the new tail of dates for the rest
+        symbols = self.valuation_symbols()
+        new_symbols = [symbol for symbol in symbols if symbol not in self.stock_splits]
+        known_symbols = [symbol for symbol in symbols if symbol in self.stock_splits]
+        today = pd.Timestamp.now().normalize()
+        previous_splits = dict(self.stock_splits)
+        with self._timed('stock_splits'):
+            if new_symbols:
+                self.fetch_market_data(new_symbols)
+            if known_symbols and today > previous_end:
+                self.fetch_market_data(known_symbols, since=previous_end)
+            # History held or cached was adjusted under the old splits, so a fetched tail
+            # does not join it: symbols with new splits are fetched whole again
+            resplit = {symbol for symbol in known_symbols
+                       if not self.stock_splits[symbol].equals(previous_splits[symbol])}
+            if resplit:
+                self.refetch_market_data(resplit)
+        # Step 7's prices came with step 3
+        self._skipped('historical_prices')
+        
+        # Steps 4-6 are vectorized over the whole trade table
+        # Lots are matched again for symbols with new trades or splits (all of them for older state)
+        rematched = affected | set(new_symbols) | resplit if 'closed_lots' in state else None
+        with self._timed('apply_splits'):
+            self.apply_stock_splits()
+            self.compute_lots(symbols=rematched)
+        with self._timed('currency_rates'):
+            self.get_currency_rates()
+        with self._timed('transaction_prices'):
+            self.compute_transaction_prices_in_currencies()
+        
+        # Step 8: append new dates when no position or past price changed, otherwise revalue
+        with self._timed('portfolio_values'):
+            self.compute_portfolio_values(append=not (affected or new_symbols or resplit))
+        
+        # Step 9: XIRR for changed positions and for positions with a new closing price
+        repriced = (set(known_symbols) if today > previous_end else set()) | resplit
+        with self._timed('xirr'):
+            self.compute_xirr(symbols=affected | set(new_symbols) | repriced)
+            # Windows end on every valued date: with only new dates, only their windows are solved
+            if affected or new_symbols or repriced or not self.xirr_history:
+                self.compute_xirr_history(append=not (affected or new_symbols or resplit))
+        
+        print(f"Incremental update: {len(affected)} symbols with new trades, {len(new_symbols)} newly held, "
+              f"{len(repriced)} with prices extended from {previous_end.date()}")
 
 def main():
     # Initialize the analyzer
-    analyzer = PortfolioAnalyzer()
+    analyzer = PortfolioAnalyzer(price_cache=PriceCache())
     
     # File paths
     file_paths = [
@@ -634,8 +1141,8 @@ def main():
         'Stock_trading_2025.csv'
     ]
     
-    # Run complete analysis
-    analyzer.run_complete_analysis(file_paths)
+    # Run the analysis, reusing the previous run's results for unchanged inputs
+    analyzer.run_incremental_analysis(file_paths)
     
     return analyzer
 
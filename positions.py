@@ -0,0 +1,119 @@
+"""Units held of every symbol on every date, rebuilt from the trade table"""
+import numpy as np
+import pandas as pd
+
+# Share of dates with a position change above which one dense date x symbol
+# product is faster than a product per run of unchanged positions
+DENSE_SHARE = 0.25
+
+
+def trade_rows(trades, dates, symbols):
+    """Row in ``dates`` and column in ``symbols`` each trade counts from, and which trades count
+
+    A trade counts from its own date, or from the next of ``dates`` when it
+    falls between two. Trades after the last date and in symbols not in
+    ``symbols`` do not count; trades before the first date map to row 0.
+    """
+    columns = symbol_codes(trades['Symbol'], symbols)
+    days = trades['Date/Time'].to_numpy('datetime64[ns]').astype('datetime64[D]')
+    rows = np.searchsorted(pd.DatetimeIndex(dates).values.astype('datetime64[D]'), days, side='left')
+    keep = (columns >= 0) & (rows < len(dates))
+    return rows, columns, keep
+
+
+def symbol_codes(trade_symbols, symbols):
+    """Column of each trade's symbol in ``symbols``, -1 where it is not there"""
+    symbols = pd.Index(symbols).astype(str)
+    if isinstance(trade_symbols.dtype, pd.CategoricalDtype):
+        # One lookup per category instead of per trade
+        lookup = symbols.get_indexer(trade_symbols.cat.categories.astype(str))
+        codes = trade_symbols.cat.codes.to_numpy()
+        return np.where(codes >= 0, lookup[codes], -1)
+    return symbols.get_indexer(trade_symbols.astype(str))
+
+
+class PositionTimeline:
+    """Holdings over time, kept as the dates they change on and what is held from each
+
+    ``quantities[k]`` (one value per symbol) is held at the close of every
+    date from ``dates[starts[k]]`` up to the one before ``dates[starts[k + 1]]``.
+    A book that trades on most days has about one row per date, a dense
+    date x symbol matrix; a mostly flat one keeps a handful of rows however
+    long the date range.
+    """
+
+    def __init__(self, dates, symbols, starts, quantities):
+        self.dates = pd.DatetimeIndex(dates)
+        self.symbols = pd.Index(symbols)
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.quantities = np.asarray(quantities, dtype=float)
+
+    @classmethod
+    def from_trades(cls, trades, dates, symbols=None):
+        """Positions at the close of each of ``dates`` (sorted days) from ``trades``
+
+        A trade counts from its own date, or from the next of ``dates`` when it
+        falls between two. Trades before the first date make up the opening
+        positions; trades after the last are left out, as are symbols not in
+        ``symbols`` (by default every traded symbol). Trades are bucketed by
+        the date they take effect and summed per symbol in one pass, then a
+        cumulative sum over those dates gives the positions.
+        """
+        dates = pd.DatetimeIndex(dates)
+        if symbols is None:
+            symbols = sorted(trades['Symbol'].astype(str).unique()) if len(trades) else []
+        symbols = pd.Index(symbols)
+        n_symbols = len(symbols)
+        if not len(dates) or not n_symbols:
+            return cls(dates, symbols, np.zeros(min(len(dates), 1), dtype=np.int64),
+                       np.zeros((min(len(dates), 1), n_symbols)))
+
+        rows, columns, keep = trade_rows(trades, dates, symbols)
+        rows, columns = rows[keep], columns[keep]
+        units = trades['Quantity'].to_numpy(dtype=float)[keep]
+
+        # One block per date where something changes, plus the opening one
+        starts = np.unique(np.concatenate([[0], rows]))
+        blocks = np.searchsorted(starts, rows)
+        changes = np.bincount(blocks * n_symbols + columns, weights=units,
+                              minlength=len(starts) * n_symbols).reshape(len(starts), n_symbols)
+        quantities = np.cumsum(changes, axis=0)
+        # Positions closed by several fills sum to float noise rather than exactly zero
+        quantities[np.abs(quantities) < 1e-9] = 0.0
+        return cls(dates, symbols, starts, quantities)
+
+    @property
+    def is_sparse(self):
+        """Whether positions change on few enough dates to value run by run"""
+        return len(self.starts) < DENSE_SHARE * len(self.dates)
+
+    def _lengths(self):
+        return np.diff(np.append(self.starts, len(self.dates)))
+
+    def dense(self):
+        """The date x symbol matrix of units held"""
+        return np.repeat(self.quantities, self._lengths(), axis=0)
+
+    def to_frame(self):
+        return pd.DataFrame(self.dense(), index=self.dates, columns=self.symbols)
+
+    def final(self):
+        """Units held at the close of the last date, by symbol"""
+        if not len(self.quantities):
+            return pd.Series(dtype=float, index=self.symbols)
+        return pd.Series(self.quantities[-1], index=self.symbols)
+
+    def weighted_sum(self, prices, weights):
+        """``sum over symbols of prices x units held x weights``, per date and weight column
+
+        ``prices`` is a date x symbol array aligned with this timeline (no NaN)
+        and ``weights`` a symbol x k array, such as one column per quote
+        currency. Mostly flat books are valued one run of unchanged positions
+        at a time, without building the dense matrix of units.
+        """
+        if not self.is_sparse:
+            return (prices * self.dense()) @ weights
+        result = np.empty((len(self.dates), weights.shape[1]))
+        for start, length, units in zip(self.starts, self._lengths(), self.quantities):
+            result[start:start + length] = prices[start:start + length] @ (units[:, None] * weights)
+        return result
@@ -0,0 +1,318 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CACHE_PATH = 'market_data_cache.sqlite'
+
+# Columns returned by yf.Ticker.history that the cache persists
+HISTORY_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    symbol TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    open REAL, high REAL, low REAL, close REAL,
+    volume REAL, dividends REAL, stock_splits REAL,
+    PRIMARY KEY (symbol, ts)
+);
+CREATE TABLE IF NOT EXISTS history_coverage (
+    symbol TEXT PRIMARY KEY,
+    start_day TEXT NOT NULL,
+    end_day TEXT NOT NULL,
+    tz TEXT,
+    fetched_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS splits (
+    symbol TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    ratio REAL NOT NULL,
+    PRIMARY KEY (symbol, ts)
+);
+CREATE TABLE IF NOT EXISTS splits_coverage (
+    symbol TEXT PRIMARY KEY,
+    tz TEXT,
+    fetched_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+"""
+
+DB_COLUMNS = ['open', 'high', 'low', 'close', 'volume', 'dividends', 'stock_splits']
+
+
+class PriceCache:
+    """On-disk SQLite cache of daily price history and splits per symbol
+
+    History is keyed by symbol and the date range that has been fetched. A
+    request inside a fresh covered range is served from disk; otherwise only the
+    missing head or tail of the series is fetched and merged in.
+
+    Staleness: cached data older than ``max_age_hours`` is refreshed from the
+    last stored bar onwards (splits are refetched whole).
+    Eviction: symbols not read for ``max_idle_days`` are dropped, and when
+    ``max_symbols`` is set only the most recently used symbols are kept.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_age_hours=12, max_idle_days=30, max_symbols=None):
+        self.path = path
+        self.max_age_hours = max_age_hours
+        self.max_idle_days = max_idle_days
+        self.max_symbols = max_symbols
+        self.hits = 0
+        self.misses = 0
+        self.tail_fetches = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            # Readers in other processes (batch workers) do not block on a writer
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _is_fresh(self, fetched_at, now):
+        return now - fetched_at < self.max_age_hours * 3600
+
+    def stats(self):
+        """Hit/miss counters for display"""
+        with self._lock, self._connect() as conn:
+            symbols = conn.execute('SELECT COUNT(*) FROM history_coverage').fetchone()[0]
+        lookups = self.hits + self.misses + self.tail_fetches
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'tail_fetches': self.tail_fetches,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'cached_symbols': symbols,
+        }
+
+    def get_history(self, symbol, start, end, fetch):
+        """Daily history for ``symbol`` between ``start`` and ``end`` (inclusive days)
+
+        ``fetch(symbol, start, end)`` is called for whatever part of the range is
+        missing or stale and must return a frame shaped like yf.Ticker.history.
+        """
+        for fetch_start, fetch_end in self.missing_ranges(symbol, start, end):
+            self.merge_history(symbol, fetch(symbol, fetch_start, fetch_end), fetch_start, fetch_end)
+        frame = self.read_history(symbol, start, end)
+        self.evict()
+        return frame
+
+    def missing_ranges(self, symbol, start, end):
+        """Date ranges that must be fetched before start..end can be served
+
+        Returns an empty list (and counts a hit) when the cache already covers the
+        range with fresh data. Otherwise counts a miss or tail fetch and returns
+        the head and/or tail to download.
+        """
+        start = pd.Timestamp(start).normalize()
+        end = pd.Timestamp(end).normalize()
+
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                'SELECT start_day, end_day, fetched_at FROM history_coverage WHERE symbol = ?',
+                (symbol,)
+            ).fetchone()
+
+        if row is None:
+            self._count('misses')
+            return [(start, end)]
+
+        covered_start, covered_end, fetched_at = pd.Timestamp(row[0]), pd.Timestamp(row[1]), row[2]
+        ranges = []
+        if start < covered_start:
+            ranges.append((start, covered_start))
+        if end > covered_end or not self._is_fresh(fetched_at, time.time()):
+            # Refetch from the last stored bar, which may have been partial
+            tail_start = self._last_stored_day(symbol) or covered_end
+            ranges.append((tail_start, max(end, covered_end)))
+
+        self._count('tail_fetches' if ranges else 'hits')
+        return ranges
+
+    def merge_history(self, symbol, frame, start, end):
+        """Store a fetched frame and extend the symbol's covered range to start..end"""
+        start = pd.Timestamp(start).normalize()
+        end = pd.Timestamp(end).normalize()
+        now = time.time()
+
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                'SELECT start_day, end_day, fetched_at FROM history_coverage WHERE symbol = ?',
+                (symbol,)
+            ).fetchone()
+
+        fetched_at = now
+        if row is not None:
+            covered_start, covered_end = pd.Timestamp(row[0]), pd.Timestamp(row[1])
+            # Only a fetch reaching the covered end refreshes the staleness clock
+            if end < covered_end:
+                fetched_at = row[2]
+            start, end = min(start, covered_start), max(end, covered_end)
+
+        self._store_history(symbol, frame, start, end, fetched_at)
+
+    def get_splits(self, symbol, fetch):
+        """Split ratios for ``symbol``; ``fetch(symbol)`` returns a yfinance splits Series"""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                'SELECT tz, fetched_at FROM splits_coverage WHERE symbol = ?', (symbol,)
+            ).fetchone()
+
+        if row is not None and self._is_fresh(row[1], now):
+            self._count('hits')
+        else:
+            self._count('misses')
+            self._store_splits(symbol, fetch(symbol), now)
+
+        with self._lock, self._connect() as conn:
+            conn.execute('UPDATE splits_coverage SET last_access = ? WHERE symbol = ?', (now, symbol))
+            tz = conn.execute('SELECT tz FROM splits_coverage WHERE symbol = ?', (symbol,)).fetchone()[0]
+            rows = conn.execute(
+                'SELECT ts, ratio FROM splits WHERE symbol = ? ORDER BY ts', (symbol,)
+            ).fetchall()
+
+        if not rows:
+            return pd.Series(dtype=float, name='Stock Splits')
+        ts, ratios = zip(*rows)
+        index = _to_index(np.array(ts, dtype='int64'), tz)
+        return pd.Series(ratios, index=index, name='Stock Splits', dtype=float)
+
+    def evict(self):
+        """Apply the idle-time and size eviction policies"""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            stale = set()
+            if self.max_idle_days is not None:
+                cutoff = now - self.max_idle_days * 86400
+                for table in ('history_coverage', 'splits_coverage'):
+                    stale.update(r[0] for r in conn.execute(
+                        f'SELECT symbol FROM {table} WHERE last_access < ?', (cutoff,)))
+            if self.max_symbols is not None:
+                stale.update(r[0] for r in conn.execute(
+                    'SELECT symbol FROM history_coverage ORDER BY last_access DESC LIMIT -1 OFFSET ?',
+                    (self.max_symbols,)))
+            for symbol in stale:
+                for table in ('history', 'history_coverage', 'splits', 'splits_coverage'):
+                    conn.execute(f'DELETE FROM {table} WHERE symbol = ?', (symbol,))
+            self.evictions += len(stale)
+        return len(stale)
+
+    def invalidate_history(self, symbol):
+        """Drop the cached history of ``symbol`` so the next request fetches it whole
+
+        Prices are split adjusted as of when they were fetched; once the symbol
+        has a new split, the stored rows no longer match a freshly fetched tail.
+        """
+        with self._lock, self._connect() as conn:
+            for table in ('history', 'history_coverage'):
+                conn.execute(f'DELETE FROM {table} WHERE symbol = ?', (symbol,))
+
+    def clear(self):
+        """Drop every cached symbol"""
+        with self._lock, self._connect() as conn:
+            for table in ('history', 'history_coverage', 'splits', 'splits_coverage'):
+                conn.execute(f'DELETE FROM {table}')
+
+    def _last_stored_day(self, symbol):
+        with self._lock, self._connect() as conn:
+            row = conn.execute('SELECT MAX(ts) FROM history WHERE symbol = ?', (symbol,)).fetchone()
+        if row[0] is None:
+            return None
+        return pd.Timestamp(row[0], unit='ns').normalize()
+
+    def _store_history(self, symbol, frame, start, end, fetched_at):
+        tz = None
+        records = []
+        if frame is not None and not frame.empty:
+            index = pd.DatetimeIndex(frame.index)
+            # Bars are stored as exchange wall-clock time; the zone name is kept alongside
+            tz = str(index.tz) if index.tz is not None else None
+            ts = (index.tz_localize(None) if tz else index).as_unit('ns').asi8
+            values = frame.reindex(columns=HISTORY_COLUMNS).to_numpy(dtype=float)
+            values = np.where(np.isnan(values), None, values.astype(object))
+            records = [(symbol, int(t), *row) for t, row in zip(ts, values.tolist())]
+
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                f'INSERT OR REPLACE INTO history (symbol, ts, {", ".join(DB_COLUMNS)}) '
+                f'VALUES (?, ?, {", ".join("?" * len(DB_COLUMNS))})',
+                records
+            )
+            conn.execute(
+                'INSERT INTO history_coverage (symbol, start_day, end_day, tz, fetched_at, last_access) '
+                'VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(symbol) DO UPDATE SET start_day = excluded.start_day, '
+                'end_day = excluded.end_day, tz = COALESCE(excluded.tz, tz), '
+                'fetched_at = excluded.fetched_at',
+                (symbol, start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'), tz, fetched_at, fetched_at)
+            )
+
+    def read_history(self, symbol, start, end):
+        """Cached history for ``symbol`` between ``start`` and ``end``"""
+        start = pd.Timestamp(start).normalize()
+        end = pd.Timestamp(end).normalize()
+        with self._lock, self._connect() as conn:
+            conn.execute('UPDATE history_coverage SET last_access = ? WHERE symbol = ?', (time.time(), symbol))
+            coverage = conn.execute('SELECT tz FROM history_coverage WHERE symbol = ?', (symbol,)).fetchone()
+            if coverage is None:
+                # Nothing was ever stored for the symbol (e.g. its first fetch failed)
+                return pd.DataFrame(columns=HISTORY_COLUMNS)
+            tz = coverage[0]
+            rows = conn.execute(
+                f'SELECT ts, {", ".join(DB_COLUMNS)} FROM history WHERE symbol = ? ORDER BY ts',
+                (symbol,)
+            ).fetchall()
+
+        if not rows:
+            return pd.DataFrame(columns=HISTORY_COLUMNS)
+
+        data = np.array(rows, dtype=float)
+        wall_time = pd.DatetimeIndex(data[:, 0].astype('int64').astype('datetime64[ns]'), name='Date')
+        days = wall_time.normalize()
+        index = wall_time.tz_localize(tz, ambiguous='NaT', nonexistent='shift_forward') if tz else wall_time
+        frame = pd.DataFrame(data[:, 1:], index=index, columns=HISTORY_COLUMNS).dropna(axis=1, how='all')
+        return frame[(days >= start) & (days <= end)]
+
+    def _store_splits(self, symbol, splits, fetched_at):
+        tz = None
+        records = []
+        if splits is not None and not splits.empty:
+            index = pd.DatetimeIndex(splits.index)
+            tz = str(index.tz) if index.tz is not None else None
+            ts = (index.tz_convert('UTC') if tz else index).as_unit('ns').asi8
+            records = [(symbol, int(t), float(r)) for t, r in zip(ts, splits.to_numpy(dtype=float))]
+
+        with self._lock, self._connect() as conn:
+            conn.execute('DELETE FROM splits WHERE symbol = ?', (symbol,))
+            conn.executemany('INSERT INTO splits (symbol, ts, ratio) VALUES (?, ?, ?)', records)
+            conn.execute(
+                'INSERT OR REPLACE INTO splits_coverage (symbol, tz, fetched_at, last_access) VALUES (?, ?, ?, ?)',
+                (symbol, tz, fetched_at, fetched_at)
+            )
+
+
+def _to_index(ts, tz):
+    index = pd.DatetimeIndex(pd.to_datetime(ts, unit='ns', utc=True), name='Date')
+    return index.tz_convert(tz) if tz else index.tz_localize(None)
@@ -0,0 +1,159 @@
+"""In-memory LRU cache of finished analyses, shared across sessions
+
+Results are keyed on the content of the trade files, the market data
+snapshot date and the analyzer options, so two sessions with the same book
+on the same day get the same key whatever the files are called. The cache
+holds at most ``max_bytes`` of results, evicting the least recently used.
+Concurrent requests for a key that is still being computed wait for that
+computation instead of starting their own.
+"""
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from incremental import file_fingerprint
+
+DEFAULT_MAX_BYTES = 512 * 2**20
+
+
+def market_data_snapshot():
+    """The market data date a run started now would see: prices up to today"""
+    return pd.Timestamp.now().normalize().strftime('%Y-%m-%d')
+
+
+def analysis_key(file_paths, snapshot=None, **options):
+    """Hash of the files' contents (in any order or naming), the snapshot date and ``options``"""
+    digest = hashlib.sha256()
+    for content in sorted(file_fingerprint(path)['sha256'] for path in file_paths):
+        digest.update(content.encode())
+    digest.update((snapshot or market_data_snapshot()).encode())
+    for name in sorted(options):
+        digest.update(f'{name}={options[name]!r}'.encode())
+    return digest.hexdigest()
+
+
+def estimate_size(value, _seen=None):
+    """Approximate bytes held by ``value``, following frames, arrays, containers and attributes"""
+    seen = _seen if _seen is not None else set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = value.memory_usage(deep=True, index=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k, seen) + estimate_size(v, seen) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_size(item, seen) for item in value)
+    if hasattr(value, '__dict__') and not isinstance(value, type):
+        # Objects such as PortfolioAnalyzer or FXRateTable
+        return sys.getsizeof(value) + sum(estimate_size(item, seen) for item in vars(value).values())
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """Thread-safe LRU cache with a byte budget and shared in-flight computations"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key, value, size=None):
+        """Store ``value``, evicting old entries to fit; values larger than the budget are not kept"""
+        size = estimate_size(value) if size is None else size
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return False
+            while self._entries and self._bytes + size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+            self._entries[key] = (value, size)
+            self._bytes += size
+            return True
+
+    def get_or_compute(self, key, compute):
+        """Cached value for ``key``, or ``compute()`` run once however many callers ask at the same time
+
+        A computation that raises or returns None is not cached; callers that
+        were waiting on it then compute for themselves.
+        """
+        waited = False
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    if not waited:
+                        self.hits += 1
+                    return self._entries[key][0]
+                pending = self._pending.get(key)
+                if pending is None:
+                    pending = self._pending[key] = threading.Event()
+                    self.misses += 1
+                    break
+                if not waited:
+                    self.shared += 1
+                    waited = True
+            # Someone else is computing this key: wait, then look again
+            pending.wait()
+
+        try:
+            value = compute()
+            if value is not None:
+                self.put(key, value)
+            return value
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Counters and memory use for display"""
+        with self._lock:
+            lookups = self.hits + self.misses + self.shared
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'shared': self.shared,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hit_rate': (self.hits + self.shared) / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,187 @@
+"""Daily returns, drawdown and risk statistics of a portfolio's valuation history
+
+Daily returns are time weighted: each day's change in value is measured net
+of the cash put in or taken out by trades that day, so buying more does not
+count as a gain. A day that starts with money invested is measured against
+the previous close, with that day's flows settling at its close:
+
+    r = (value - flow) / previous value - 1
+
+A day that starts from nothing (the first purchase after being flat) is
+measured against the cash put in instead, r = value / flow - 1. Chaining the
+returns gives the time-weighted return and a wealth index, whose running
+peak gives the drawdown.
+
+RiskAnalytics keeps only running sums and the last few returns between
+updates, so appending new days costs time proportional to the days added
+(plus the volatility window), however long the history already is. The
+per-day table is joined from the updates' columns only when it is read.
+"""
+import numpy as np
+import pandas as pd
+
+from valuation import close_arrays
+
+TRADING_DAYS = 252
+
+DAILY_COLUMNS = ['Date', 'Value', 'Flow', 'Return', 'TWR', 'Drawdown', 'Volatility', 'Benchmark_Return']
+
+
+def daily_returns(values, flows, previous=np.nan):
+    """Time-weighted return of each day; ``previous`` is the value before the first day
+
+    ``values`` and ``flows`` are one value per day, or dates x series
+    arrays for several series at once. The first day has no return when
+    ``previous`` is NaN, and a day with nothing invested before or after its
+    flows returns 0.
+    """
+    values = np.asarray(values, dtype=float)
+    flows = np.asarray(flows, dtype=float)
+    before = np.concatenate([np.full((1,) + values.shape[1:], previous), values[:-1]])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.where(before > 0, (values - flows) / before - 1,
+                           np.where(flows > 0, values / flows - 1, 0.0))
+    returns[np.isnan(before)] = np.nan
+    return returns
+
+
+class RiskAnalytics:
+    """Returns and risk statistics of a valuation history, updated as days are appended
+
+    ``update`` takes the next days' values and net trade flows (see
+    valuation.compute_flow_frame) and, optionally, a benchmark's price
+    history for beta. ``daily`` holds one row per day with its return,
+    cumulative time-weighted return, drawdown and rolling ``window``-day
+    annualized volatility; ``summary()`` gives the statistics over every day
+    seen. Sharpe and Sortino ratios are annualized and measured against
+    ``risk_free_rate``, an annual rate.
+    """
+
+    def __init__(self, window=21, risk_free_rate=0.0, periods_per_year=TRADING_DAYS):
+        self.window = window
+        self.risk_free_rate = risk_free_rate
+        self.periods_per_year = periods_per_year
+        # Columns of the days added by each update, joined into ``daily`` when it is read
+        self._chunks = []
+        self._daily = None
+        self._last_date = None
+        self._last_value = np.nan
+        self._wealth = 1.0
+        self._peak = 1.0
+        self._max_drawdown = 0.0
+        # Returns still inside the volatility window
+        self._recent = np.empty(0)
+        # Running sums of excess returns: count, sum, sum of squares, sum of squared shortfalls
+        self._moments = np.zeros(4)
+        # Benchmark: last close seen and running co-moments with the portfolio (n, r, b, rb, bb)
+        self._benchmark = None
+        self._benchmark_close = np.nan
+        self._co_moments = np.zeros(5)
+
+    @property
+    def daily_risk_free(self):
+        return (1 + self.risk_free_rate) ** (1 / self.periods_per_year) - 1
+
+    @property
+    def daily(self):
+        """One row per day seen: DAILY_COLUMNS"""
+        if self._daily is None:
+            columns = {column: np.concatenate([chunk[column] for chunk in self._chunks])
+                       for column in DAILY_COLUMNS} if self._chunks else {}
+            self._daily = pd.DataFrame(columns, columns=DAILY_COLUMNS)
+            # Keep the joined columns as the one chunk later updates append to
+            self._chunks = [{column: self._daily[column].to_numpy() for column in DAILY_COLUMNS}] if self._chunks else []
+        return self._daily
+
+    def _benchmark_closes(self, benchmark, dates):
+        # The same history passed on every update is converted to arrays once
+        if self._benchmark is None or self._benchmark[0] is not benchmark:
+            self._benchmark = (benchmark, *close_arrays(benchmark))
+        _, days, closes = self._benchmark
+        positions = np.searchsorted(days, dates.astype('datetime64[ns]'), side='right') - 1
+        return np.where(positions >= 0, closes[np.maximum(positions, 0)], np.nan)
+
+    def update(self, dates, values, flows=None, benchmark=None):
+        """Append the days ``dates`` (after any already seen) with their closing ``values``"""
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        values = np.asarray(values, dtype=float)
+        flows = np.zeros(len(values)) if flows is None else np.asarray(flows, dtype=float)
+        if self._last_date is not None:
+            new = dates > self._last_date
+            dates, values, flows = dates[new], values[new], flows[new]
+        if not len(dates):
+            return self
+
+        returns = daily_returns(values, flows, self._last_value)
+        growth = np.nan_to_num(returns, nan=0.0) + 1
+        wealth = self._wealth * np.cumprod(growth)
+        peak = np.maximum.accumulate(np.concatenate([[self._peak], wealth]))[1:]
+        drawdown = wealth / peak - 1
+
+        # Rolling volatility over the returns of this update and the window's worth before it
+        counted = returns[~np.isnan(returns)]
+        recent = np.concatenate([self._recent, counted])
+        volatility = np.full(len(returns), np.nan)
+        if len(recent) >= self.window > 1:
+            windows = np.lib.stride_tricks.sliding_window_view(recent, self.window)[-len(counted):]
+            rolling = windows.std(axis=1, ddof=1) * np.sqrt(self.periods_per_year)
+            volatility[np.flatnonzero(~np.isnan(returns))[len(counted) - len(rolling):]] = rolling
+
+        excess = counted - self.daily_risk_free
+        self._moments += [len(excess), excess.sum(), (excess ** 2).sum(), (np.minimum(excess, 0) ** 2).sum()]
+
+        benchmark_returns = np.full(len(returns), np.nan)
+        if benchmark is not None and not benchmark.empty:
+            closes = self._benchmark_closes(benchmark, dates)
+            benchmark_returns = closes / np.concatenate([[self._benchmark_close], closes[:-1]]) - 1
+            both = ~np.isnan(returns) & ~np.isnan(benchmark_returns)
+            r, b = returns[both], benchmark_returns[both]
+            self._co_moments += [len(r), r.sum(), b.sum(), (r * b).sum(), (b * b).sum()]
+            if not np.isnan(closes[-1]):
+                self._benchmark_close = closes[-1]
+
+        self._chunks.append({
+            'Date': dates.astype(object), 'Value': values, 'Flow': flows, 'Return': returns,
+            'TWR': wealth - 1, 'Drawdown': drawdown, 'Volatility': volatility,
+            'Benchmark_Return': benchmark_returns,
+        })
+        self._daily = None
+
+        self._last_date, self._last_value = dates[-1], values[-1]
+        self._wealth, self._peak = wealth[-1], peak[-1]
+        self._max_drawdown = min(self._max_drawdown, drawdown.min())
+        self._recent = recent[-(self.window - 1):] if self.window > 1 else np.empty(0)
+        return self
+
+    def summary(self):
+        """Statistics over every day seen; NaN where there are too few returns"""
+        count, total, squares, shortfalls = self._moments
+        mean = total / count if count else np.nan
+        variance = (squares - total * mean) / (count - 1) if count > 1 else np.nan
+        std = np.sqrt(max(variance, 0.0))
+        downside = np.sqrt(shortfalls / count) if count else np.nan
+        annual = np.sqrt(self.periods_per_year)
+
+        n, r, b, rb, bb = self._co_moments
+        benchmark_variance = bb - b * b / n if n > 1 else np.nan
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return {
+                'days': int(count),
+                'twr': float(self._wealth - 1),
+                'annualized_return': float(self._wealth ** (self.periods_per_year / count) - 1) if count else np.nan,
+                'volatility': float(std * annual),
+                'max_drawdown': float(self._max_drawdown),
+                'sharpe': float(mean / std * annual) if std > 0 else np.nan,
+                'sortino': float(mean / downside * annual) if downside > 0 else np.nan,
+                'beta': float((rb - r * b / n) / benchmark_variance) if benchmark_variance > 0 else np.nan,
+            }
+
+
+def extend_risk(risk, portfolio_values, currency='USD', benchmark=None):
+    """Feed ``risk`` the days of ``portfolio_values`` after the last one it has seen"""
+    if portfolio_values.empty:
+        return risk
+    flows = portfolio_values.get(f'Flow_{currency}')
+    return risk.update(pd.to_datetime(portfolio_values['Date']), portfolio_values[f'Value_{currency}'],
+                       None if flows is None else flows.to_numpy(), benchmark)
@@ -0,0 +1,83 @@
+"""Vectorized stock split adjustment for the typed trade table"""
+import numpy as np
+import pandas as pd
+
+
+def split_table(stock_splits):
+    """One row per (symbol, split date) from {symbol: Series of ratios indexed by date}
+
+    Split dates are taken as wall-clock days. Factor is the product of this
+    split's ratio and every later one for the symbol: the total adjustment for
+    a trade made before this split (and after the previous one). A 2:1 split
+    has ratio 2, a 1:10 reverse split ratio 0.1; missing or non-positive
+    ratios are ignored.
+    """
+    symbols, dates, ratios = [], [], []
+    for symbol, splits in stock_splits.items():
+        if splits is None or splits.empty:
+            continue
+        days = pd.DatetimeIndex(splits.index)
+        if days.tz is not None:
+            days = days.tz_localize(None)
+        symbols.extend([symbol] * len(splits))
+        dates.append(days.normalize().to_numpy('datetime64[ns]'))
+        ratios.append(splits.to_numpy(dtype=float))
+
+    table = pd.DataFrame({
+        'Symbol': pd.Series(symbols, dtype=object),
+        'Split_Date': np.concatenate(dates) if dates else np.array([], dtype='datetime64[ns]'),
+        'Ratio': np.concatenate(ratios) if ratios else np.array([], dtype=float),
+    })
+    table = table[np.isfinite(table['Ratio']) & (table['Ratio'] > 0)]
+
+    # Two entries on one day act as one split
+    table = table.groupby(['Symbol', 'Split_Date'], as_index=False)['Ratio'].prod()
+
+    # Product of this and all later ratios = symbol total / product of the earlier ones
+    by_symbol = table.groupby('Symbol')['Ratio']
+    table['Factor'] = by_symbol.transform('prod') / (by_symbol.cumprod() / table['Ratio'])
+    return table
+
+
+def split_factors(trades, stock_splits):
+    """Cumulative split factor for every trade, aligned with ``trades``
+
+    A trade is adjusted by every split dated after it, found for all trades
+    at once with a forward merge-as-of against the split table.
+    """
+    factors = np.ones(len(trades))
+    table = split_table(stock_splits)
+    if table.empty or trades.empty:
+        return factors
+
+    # Join on integer symbol codes shared by both sides
+    categories = pd.Index(sorted(set(trades['Symbol'].astype(str).unique()) | set(table['Symbol'])))
+    left = pd.DataFrame({
+        'Code': categories.get_indexer(trades['Symbol'].astype(str)),
+        'Date/Time': trades['Date/Time'].to_numpy('datetime64[ns]'),
+        'Row': np.arange(len(trades)),
+    }).sort_values('Date/Time', kind='stable')
+    right = pd.DataFrame({
+        'Code': categories.get_indexer(table['Symbol']),
+        'Split_Date': table['Split_Date'].to_numpy('datetime64[ns]'),
+        'Factor': table['Factor'].to_numpy(),
+    }).sort_values('Split_Date', kind='stable')
+
+    # First split strictly after each trade; trades on or after the split day are already adjusted
+    matched = pd.merge_asof(left, right, left_on='Date/Time', right_on='Split_Date', by='Code',
+                            direction='forward', allow_exact_matches=False)
+    factors[matched['Row'].to_numpy()] = matched['Factor'].fillna(1.0).to_numpy()
+    return factors
+
+
+def adjust_for_splits(trades, factors):
+    """Copy of ``trades`` with quantities multiplied and prices divided by ``factors``
+
+    Proceeds, fees and P/L are cash amounts and do not change with a split.
+    """
+    adjusted = trades.copy()
+    adjusted['Quantity'] = trades['Quantity'].to_numpy() * factors
+    for column in ['T. Price', 'C. Price']:
+        if column in adjusted.columns:
+            adjusted[column] = (trades[column].to_numpy() / factors).astype(trades[column].dtype)
+    return adjusted
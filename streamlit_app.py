@@ -13,6 +13,9 @@ warnings.filterwarnings('ignore')
 
 # Import the PortfolioAnalyzer class
 from portfolio_analyzer import PortfolioAnalyzer
+from app_common import (collect_finished_job, current_job, show_analysis_job, show_job_timing,
+                        show_performance_history, show_price_cache_stats, show_risk, show_run_report,
+                        start_analysis_job, waiting)
 
 def create_demo_data():
     """Create demo CSV files matching the exact format of user's data"""
@@ -281,6 +284,129 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+def show_dashboard(analyzer, ready=lambda stage: True):
+    """Every dashboard section, drawing only those whose steps ``ready(stage)`` says are done"""
+    # Portfolio Overview
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        if hasattr(analyzer, 'portfolio_values') and not analyzer.portfolio_values.empty:
+            latest_value = analyzer.portfolio_values['Value_USD'].iloc[-1]
+            st.metric("Portfolio Value (USD)", f"${latest_value:,.2f}")
+        else:
+            st.metric("Portfolio Value (USD)", "Calculating...")
+    
+    with col2:
+        if hasattr(analyzer, 'holdings') and not analyzer.holdings.empty:
+            total_holdings = len(analyzer.holdings)
+            st.metric("Total Holdings", f"{total_holdings} symbols")
+        else:
+            st.metric("Total Holdings", "Calculating...")
+    
+    with col3:
+        if hasattr(analyzer, 'xirr_results') and analyzer.xirr_results:
+            avg_xirr = np.mean(list(analyzer.xirr_results.values())) * 100
+            st.metric("Average XIRR", f"{avg_xirr:.2f}%")
+        else:
+            st.metric("Average XIRR", "Calculating...")
+    
+    # Holdings Table
+    st.markdown("### 📋 Current Holdings")
+    if not ready('holdings'):
+        waiting("holdings")
+    elif hasattr(analyzer, 'holdings') and not analyzer.holdings.empty:
+        st.dataframe(analyzer.holdings, use_container_width=True)
+    
+    # Portfolio Performance Chart
+    st.markdown("### 📈 Portfolio Performance")
+    if not ready('portfolio_values'):
+        waiting("portfolio valuation")
+    elif hasattr(analyzer, 'portfolio_values') and not analyzer.portfolio_values.empty:
+        fig = px.line(analyzer.portfolio_values, x='Date', y='Value_USD', 
+                     title='Portfolio Value Over Time',
+                     labels={'Value_USD': 'Portfolio Value (USD)', 'Date': 'Date'})
+        fig.update_layout(height=400)
+        st.plotly_chart(fig, use_container_width=True)
+        show_risk(getattr(analyzer, 'risk', None))
+    
+    # XIRR Results
+    st.markdown("### 💰 XIRR Analysis")
+    if not ready('xirr'):
+        waiting("XIRR")
+    elif hasattr(analyzer, 'xirr_results') and analyzer.xirr_results:
+        xirr_df = pd.DataFrame(list(analyzer.xirr_results.items()), 
+                             columns=['Symbol', 'XIRR'])
+        xirr_df['XIRR_Percentage'] = xirr_df['XIRR'] * 100
+        st.dataframe(xirr_df, use_container_width=True)
+    if ready('xirr'):
+        show_performance_history(getattr(analyzer, 'xirr_history', {}), getattr(analyzer, 'return_history', {}))
+    
+    # News Section
+    st.markdown("### 📰 Latest Market News & Analysis")
+    
+    col1, col2 = st.columns([3, 1])
+    
+    with col1:
+        if hasattr(analyzer, 'holdings') and not analyzer.holdings.empty:
+            symbols = analyzer.holdings['Symbol'].tolist()
+            selected_symbol = st.selectbox("Select Symbol for News:", symbols)
+        else:
+            selected_symbol = st.selectbox("Select Symbol for News:", ["AAPL", "MSFT", "GOOGL"])
+    
+    with col2:
+        if st.button("📰 Get News", use_container_width=True):
+            with st.spinner("Fetching latest news..."):
+                try:
+                    news_items = analyzer.get_latest_news(selected_symbol)
+                    st.session_state.news_items = news_items
+                    st.session_state.selected_symbol = selected_symbol
+                    st.success(f"✅ Found {len(news_items)} news articles!")
+                except Exception as e:
+                    st.error(f"❌ Error fetching news: {e}")
+    
+    # Display news
+    if 'news_items' in st.session_state and 'selected_symbol' in st.session_state:
+        if st.session_state.selected_symbol == selected_symbol:
+            news_items = st.session_state.news_items
+            
+            for i, news in enumerate(news_items[:5]):
+                # Color code based on publisher/content
+                if any(word in news.get('publisher', '').lower() for word in ['bloomberg', 'reuters', 'cnbc']):
+                    color_class = "news-card"
+                elif 'technical' in news.get('title', '').lower():
+                    color_class = "news-card"
+                elif 'earnings' in news.get('title', '').lower():
+                    color_class = "news-card"
+                else:
+                    color_class = "news-card"
+                
+                st.markdown(f"""
+                <div class="{color_class}">
+                    <div class="news-title">{news.get('title', 'No title')}</div>
+                    <div class="news-summary">{news.get('summary', 'No summary available')}</div>
+                    <div class="news-meta">
+                        📅 {news.get('published', 'Unknown')} | 
+                        📰 {news.get('publisher', 'Unknown')}
+                    </div>
+                    <a href="{news.get('link', '#')}" target="_blank" class="news-link">
+                        📖 Read Full Article
+                    </a>
+                </div>
+                """, unsafe_allow_html=True)
+    
+    # News Features Tips
+    st.markdown("""
+    <div class="welcome-card">
+        <h3>📰 News Features</h3>
+        <div class="feature-list">
+            <div class="feature-item">🔍 Real-time news from NewsAPI.org</div>
+            <div class="feature-item">📊 Contextual analysis based on stock performance</div>
+            <div class="feature-item">🌐 Multiple news sources and fallbacks</div>
+            <div class="feature-item">⚡ Fast loading with error handling</div>
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+
 def main():
     # Header
     st.markdown('<div class="main-header">🚀 Portfolio Analyzer Pro</div>', unsafe_allow_html=True)
@@ -328,12 +454,11 @@ def main():
         st.markdown("---")
         
         # Analysis button
-        if st.button("🔍 Run Portfolio Analysis", use_container_width=True):
+        collect_finished_job()
+        running = current_job() is not None
+        if st.button("🔍 Run Portfolio Analysis", use_container_width=True, disabled=running):
             with st.spinner("Analyzing portfolio data..."):
                 try:
-                    # Initialize analyzer
-                    analyzer = PortfolioAnalyzer()
-                    
                     # Handle file analysis - prioritize user's actual files
                     import os
                     
@@ -382,16 +507,10 @@ def main():
                     else:
                         st.success(f"✅ Using all your portfolio data files!")
                     
-                    # Run analysis with available files
-                    success = analyzer.run_complete_analysis(available_files)
-                    
-                    if success:
-                        st.session_state.analyzer = analyzer
-                        st.session_state.analysis_complete = True
-                        st.success("✅ Analysis completed successfully!")
-                        st.rerun()
-                    else:
-                        st.error("❌ Analysis failed. Please check your data files.")
+                    # Run analysis in the background, or reuse another session's result for the same files today
+                    start_analysis_job(available_files)
+                    st.session_state.job_message = None
+                    st.rerun()
                         
                 except Exception as e:
                     st.error(f"❌ Error during analysis: {e}")
@@ -407,6 +526,16 @@ def main():
                         st.write("3. Try the demo mode to test the application")
                         st.write("4. Ensure your files are not corrupted")
         
+        if running:
+            st.info("🔄 Analysis running in the background...")
+        elif st.session_state.get('job_message'):
+            st.error(f"❌ {st.session_state.job_message}. Please check your data files.")
+        elif st.session_state.get('analysis_complete'):
+            st.success("✅ Analysis completed successfully!")
+            show_job_timing()
+        
+        show_price_cache_stats()
+        
         st.markdown("---")
         st.markdown("### 📊 Features")
         st.markdown("""
@@ -418,120 +547,12 @@ def main():
         """)
     
     # Main content
-    if 'analysis_complete' in st.session_state and st.session_state.analysis_complete and hasattr(st.session_state, 'analyzer'):
+    if current_job() is not None:
+        show_analysis_job(show_dashboard)
+    elif 'analysis_complete' in st.session_state and st.session_state.analysis_complete and hasattr(st.session_state, 'analyzer'):
         analyzer = st.session_state.analyzer
-        
-        # Portfolio Overview
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            if hasattr(analyzer, 'portfolio_values') and not analyzer.portfolio_values.empty:
-                latest_value = analyzer.portfolio_values['Value_USD'].iloc[-1]
-                st.metric("Portfolio Value (USD)", f"${latest_value:,.2f}")
-            else:
-                st.metric("Portfolio Value (USD)", "Calculating...")
-        
-        with col2:
-            if hasattr(analyzer, 'holdings') and not analyzer.holdings.empty:
-                total_holdings = len(analyzer.holdings)
-                st.metric("Total Holdings", f"{total_holdings} symbols")
-            else:
-                st.metric("Total Holdings", "Calculating...")
-        
-        with col3:
-            if hasattr(analyzer, 'xirr_results') and analyzer.xirr_results:
-                avg_xirr = np.mean(list(analyzer.xirr_results.values())) * 100
-                st.metric("Average XIRR", f"{avg_xirr:.2f}%")
-            else:
-                st.metric("Average XIRR", "Calculating...")
-        
-        # Holdings Table
-        st.markdown("### 📋 Current Holdings")
-        if hasattr(analyzer, 'holdings') and not analyzer.holdings.empty:
-            st.dataframe(analyzer.holdings, use_container_width=True)
-        
-        # Portfolio Performance Chart
-        st.markdown("### 📈 Portfolio Performance")
-        if hasattr(analyzer, 'portfolio_values') and not analyzer.portfolio_values.empty:
-            fig = px.line(analyzer.portfolio_values, x='Date', y='Value_USD', 
-                         title='Portfolio Value Over Time',
-                         labels={'Value_USD': 'Portfolio Value (USD)', 'Date': 'Date'})
-            fig.update_layout(height=400)
-            st.plotly_chart(fig, use_container_width=True)
-        
-        # XIRR Results
-        st.markdown("### 💰 XIRR Analysis")
-        if hasattr(analyzer, 'xirr_results') and analyzer.xirr_results:
-            xirr_df = pd.DataFrame(list(analyzer.xirr_results.items()), 
-                                 columns=['Symbol', 'XIRR'])
-            xirr_df['XIRR_Percentage'] = xirr_df['XIRR'] * 100
-            st.dataframe(xirr_df, use_container_width=True)
-        
-        # News Section
-        st.markdown("### 📰 Latest Market News & Analysis")
-        
-        col1, col2 = st.columns([3, 1])
-        
-        with col1:
-            if hasattr(analyzer, 'holdings') and not analyzer.holdings.empty:
-                symbols = analyzer.holdings['Symbol'].tolist()
-                selected_symbol = st.selectbox("Select Symbol for News:", symbols)
-            else:
-                selected_symbol = st.selectbox("Select Symbol for News:", ["AAPL", "MSFT", "GOOGL"])
-        
-        with col2:
-            if st.button("📰 Get News", use_container_width=True):
-                with st.spinner("Fetching latest news..."):
-                    try:
-                        news_items = analyzer.get_latest_news(selected_symbol)
-                        st.session_state.news_items = news_items
-                        st.session_state.selected_symbol = selected_symbol
-                        st.success(f"✅ Found {len(news_items)} news articles!")
-                    except Exception as e:
-                        st.error(f"❌ Error fetching news: {e}")
-        
-        # Display news
-        if 'news_items' in st.session_state and 'selected_symbol' in st.session_state:
-            if st.session_state.selected_symbol == selected_symbol:
-                news_items = st.session_state.news_items
-                
-                for i, news in enumerate(news_items[:5]):
-                    # Color code based on publisher/content
-                    if any(word in news.get('publisher', '').lower() for word in ['bloomberg', 'reuters', 'cnbc']):
-                        color_class = "news-card"
-                    elif 'technical' in news.get('title', '').lower():
-                        color_class = "news-card"
-                    elif 'earnings' in news.get('title', '').lower():
-                        color_class = "news-card"
-                    else:
-                        color_class = "news-card"
-                    
-                    st.markdown(f"""
-                    <div class="{color_class}">
-                        <div class="news-title">{news.get('title', 'No title')}</div>
-                        <div class="news-summary">{news.get('summary', 'No summary available')}</div>
-                        <div class="news-meta">
-                            📅 {news.get('published', 'Unknown')} | 
-                            📰 {news.get('publisher', 'Unknown')}
-                        </div>
-                        <a href="{news.get('link', '#')}" target="_blank" class="news-link">
-                            📖 Read Full Article
-                        </a>
-                    </div>
-                    """, unsafe_allow_html=True)
-        
-        # News Features Tips
-        st.markdown("""
-        <div class="welcome-card">
-            <h3>📰 News Features</h3>
-            <div class="feature-list">
-                <div class="feature-item">🔍 Real-time news from NewsAPI.org</div>
-                <div class="feature-item">📊 Contextual analysis based on stock performance</div>
-                <div class="feature-item">🌐 Multiple news sources and fallbacks</div>
-                <div class="feature-item">⚡ Fast loading with error handling</div>
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
+        show_run_report(analyzer)
+        show_dashboard(analyzer)
         
     else:
         # Welcome message
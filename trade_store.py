@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Format of the Date/Time column in broker exports
+DATE_FORMAT = '%Y-%m-%d, %H:%M:%S'
+
+# Broker columns holding numbers, possibly with thousands separators
+NUMERIC_COLUMNS = ['Quantity', 'T. Price', 'C. Price', 'Proceeds', 'Comm/Fee',
+                   'Basis', 'Realized P/L', 'MTM P/L']
+
+# Internal trade table: column order and storage type. Amounts that feed cost
+# basis, cash flows and P/L stay float64; the closing price and MTM P/L are only
+# displayed, so float32 is enough. Timestamps are int64 nanoseconds.
+TRADE_SCHEMA = {
+    'Date/Time': 'datetime64[ns]',
+    'Symbol': 'category',
+    'Currency': 'category',
+    'Asset Category': 'category',
+    'Code': 'category',
+    'Quantity': 'float64',
+    'T. Price': 'float64',
+    'C. Price': 'float32',
+    'Proceeds': 'float64',
+    'Comm/Fee': 'float64',
+    'Basis': 'float64',
+    'Realized P/L': 'float64',
+    'MTM P/L': 'float32',
+}
+
+
+def clean_trades(df):
+    """Keep order rows of a broker export and convert dates and numbers"""
+    # Filter for actual trade data (not header rows), then order rows (not 'Data')
+    df = df[(df['Trades'] == 'Trades') & (df['DataDiscriminator'] == 'Order')].copy()
+
+    df['Date/Time'] = pd.to_datetime(df['Date/Time'], format=DATE_FORMAT)
+
+    for column in NUMERIC_COLUMNS:
+        if column not in df.columns:
+            continue
+        values = df[column]
+        if not pd.api.types.is_numeric_dtype(values):
+            # Handle comma-separated values such as "1,000"
+            values = values.astype(str).str.replace(',', '')
+        df[column] = pd.to_numeric(values, errors='coerce').astype(float)
+
+    if 'Currency' not in df.columns:
+        df['Currency'] = 'USD'
+    return df
+
+
+def compact_trades(df):
+    """Store the text columns of a cleaned trade frame as categoricals"""
+    for column in df.columns:
+        if column == 'Date/Time' or pd.api.types.is_numeric_dtype(df[column]):
+            continue
+        df[column] = df[column].astype('category')
+    return df
+
+
+def concat_compact(frames):
+    """Concatenate compact frames, merging categories instead of falling back to strings"""
+    names = list(dict.fromkeys(name for frame in frames for name in frame.columns))
+    data = {}
+    for name in names:
+        parts = [frame[name] if name in frame.columns else pd.Series(np.nan, index=frame.index)
+                 for frame in frames]
+        if any(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            data[name] = union_categoricals([part.astype('category') for part in parts], sort_categories=True)
+        else:
+            data[name] = np.concatenate([part.to_numpy() for part in parts])
+    return pd.DataFrame(data)
+
+
+def stream_trades(file_paths, chunksize=100_000):
+    """Read broker exports chunk by chunk into one compact, time-sorted trade frame
+
+    Each chunk is filtered to order rows and cast to categoricals/floats as soon
+    as it is read, so only the compact chunks are held until the single final
+    concatenation.
+    """
+    frames = []
+    for file_path in file_paths:
+        # A file failing part way through contributes none of its chunks
+        parts = []
+        try:
+            # Read as text so every chunk parses the same way regardless of content
+            for chunk in pd.read_csv(file_path, chunksize=chunksize, dtype=str):
+                chunk = clean_trades(chunk)
+                if chunk.empty:
+                    continue
+                parts.append(compact_trades(chunk))
+        except Exception as e:
+            print(f"Error loading {file_path}: {e}")
+            continue
+        frames.extend(parts)
+        print(f"Loaded {sum(len(part) for part in parts)} trades from {file_path}")
+
+    if not frames:
+        return pd.DataFrame()
+
+    trades = concat_compact(frames)
+    del frames
+    return normalize_trades(trades)
+
+
+def normalize_trades(df):
+    """Convert cleaned trades to the internal typed table
+
+    Keeps the TRADE_SCHEMA columns in schema order with their storage types,
+    dropping the constant Trades/Header/DataDiscriminator columns and anything
+    else the analysis does not use, and sorts by Date/Time.
+    """
+    columns = [column for column in TRADE_SCHEMA if column in df.columns]
+    trades = df[columns].astype({column: TRADE_SCHEMA[column] for column in columns})
+    return trades.sort_values('Date/Time', kind='stable').reset_index(drop=True)
+
+
+def memory_report(frames):
+    """Per-column memory in bytes for each {label: DataFrame}, with a total row"""
+    report = pd.DataFrame({
+        label: frame.memory_usage(index=True, deep=True) for label, frame in frames.items()
+    })
+    report.loc['Total'] = report.sum()
+    return report
@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+
+from fees import trade_costs
+from positions import PositionTimeline, trade_rows
+
+
+def close_arrays(hist):
+    """Return (dates, closes) for a history frame, one entry per calendar date
+
+    Dates are datetime64[ns] day values in the exchange's local time, the same
+    days ``hist.index.date`` yields. The first quote wins when a date repeats.
+    """
+    index = pd.DatetimeIndex(hist.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    days = index.values.astype('datetime64[D]')
+    days, first = np.unique(days, return_index=True)
+    closes = hist['Close'].to_numpy(dtype=float)[first]
+    return days.astype('datetime64[ns]'), closes
+
+
+def align_close_prices(historical_prices, symbols=None):
+    """Align every symbol's Close series on a single date index
+
+    The index is the union of all history dates. Gaps are forward filled so each
+    cell holds the most recent price on or before that date (as-of semantics);
+    dates before a symbol's first quote stay NaN.
+    """
+    if symbols is None:
+        symbols = list(historical_prices.keys())
+
+    columns, day_chunks, close_chunks, code_chunks = [], [], [], []
+    for symbol in symbols:
+        hist = historical_prices.get(symbol)
+        if hist is None or hist.empty:
+            continue
+        days, closes = close_arrays(hist)
+        code_chunks.append(np.full(len(days), len(columns)))
+        columns.append(symbol)
+        day_chunks.append(days)
+        close_chunks.append(closes)
+
+    if not columns:
+        return pd.DataFrame()
+
+    # Scatter every quote into a dense date x symbol matrix in one step
+    all_dates, rows = np.unique(np.concatenate(day_chunks), return_inverse=True)
+    matrix = np.full((len(all_dates), len(columns)), np.nan)
+    matrix[rows, np.concatenate(code_chunks)] = np.concatenate(close_chunks)
+
+    prices = pd.DataFrame(matrix, index=pd.DatetimeIndex(all_dates), columns=columns)
+    return prices.ffill()
+
+
+def compute_value_frame(prices, quantities, rates, currencies=None, reporting=None):
+    """Value a date x symbol price matrix in several currencies
+
+    ``quantities`` is a Series of units held keyed by symbol, or a
+    PositionTimeline over the same dates and symbols as ``prices`` for
+    holdings that change over time. ``rates`` gives
+    units of each currency per USD, either as a dict of fixed rates or as a
+    DataFrame indexed like ``prices`` with one column per currency.
+    ``currencies`` maps each symbol to the currency its prices are quoted in
+    (USD when omitted); every such currency needs a rate. Output columns are
+    the ``reporting`` currencies, by default every currency in ``rates``.
+    Symbols without a price yet contribute nothing on that date.
+    """
+    names = list(rates.keys()) if isinstance(rates, dict) else list(rates.columns)
+    reporting = names if reporting is None else list(reporting)
+    columns = ['Date'] + [f'Value_{currency}' for currency in reporting]
+    if prices.empty:
+        return pd.DataFrame(columns=columns)
+
+    if isinstance(rates, dict):
+        rate_matrix = np.broadcast_to(np.fromiter(rates.values(), dtype=float), (len(prices), len(names)))
+    else:
+        rate_matrix = rates.reindex(prices.index).to_numpy(dtype=float)
+
+    price_matrix = np.nan_to_num(prices.to_numpy(dtype=float), nan=0.0)
+    if isinstance(quantities, PositionTimeline):
+        if not quantities.symbols.equals(prices.columns) or len(quantities.dates) != len(prices):
+            raise ValueError("PositionTimeline must cover the same dates and symbols as prices")
+        product = quantities.weighted_sum
+    else:
+        qty = quantities.reindex(prices.columns).fillna(0).to_numpy(dtype=float)
+        def product(price_matrix, weights):
+            return price_matrix @ (qty[:, None] * weights)
+
+    if currencies is None:
+        value_usd = product(price_matrix, np.ones((len(prices.columns), 1)))[:, 0]
+    else:
+        # Value per quote currency in one product (dates x currencies), then convert to USD
+        quote = currencies.reindex(prices.columns).fillna('USD').astype(str)
+        missing = sorted(set(quote) - set(names))
+        if missing:
+            raise ValueError(f"No rates for quote currencies: {', '.join(missing)}")
+        used = sorted(set(quote))
+        weights = np.zeros((len(quote), len(used)))
+        weights[np.arange(len(quote)), [used.index(currency) for currency in quote]] = 1.0
+        value_local = product(price_matrix, weights)
+        value_usd = (value_local / rate_matrix[:, [names.index(currency) for currency in used]]).sum(axis=1)
+
+    values = value_usd[:, None] * rate_matrix[:, [names.index(currency) for currency in reporting]]
+
+    frame = pd.DataFrame(values, columns=columns[1:])
+    frame.insert(0, 'Date', prices.index.date)
+    return frame
+
+
+def compute_flow_frame(trades, dates, symbols, rates, reporting=None):
+    """Net cash put into the positions in ``symbols`` on each of ``dates``, in several currencies
+
+    Buys add their cost (Quantity x T. Price plus fees, in the trade's
+    currency) and sells take out their proceeds less fees. Each trade is counted on the date it
+    enters the positions PositionTimeline rebuilds, so the flows line up
+    with the value frame of the same dates and symbols; trades before the
+    first date are part of the opening positions and are not flows.
+    ``rates`` is as for compute_value_frame. Output columns are
+    Flow_<CUR> for the ``reporting`` currencies.
+    """
+    names = list(rates.keys()) if isinstance(rates, dict) else list(rates.columns)
+    reporting = names if reporting is None else list(reporting)
+    dates = pd.DatetimeIndex(dates)
+    columns = [f'Flow_{currency}' for currency in reporting]
+    if not len(dates):
+        return pd.DataFrame(columns=columns)
+
+    if isinstance(rates, dict):
+        rate_matrix = np.broadcast_to(np.fromiter(rates.values(), dtype=float), (len(dates), len(names)))
+    else:
+        rate_matrix = rates.reindex(dates).to_numpy(dtype=float)
+
+    rows, _, keep = trade_rows(trades, dates, symbols)
+    keep &= (trades['Date/Time'] >= dates[0]).to_numpy()
+    quote = trades['Currency'].astype(str).to_numpy()[keep]
+    used = sorted(set(quote))
+    missing = sorted(set(used) - set(names))
+    if missing:
+        raise ValueError(f"No rates for trade currencies: {', '.join(missing)}")
+
+    # Net amount per date and trade currency in one bincount, then to USD on that date's rates
+    codes = np.searchsorted(used, quote)
+    amounts = trade_costs(trades)[keep]
+    local = np.bincount(rows[keep] * len(used) + codes, weights=amounts,
+                        minlength=len(dates) * len(used)).reshape(len(dates), len(used))
+    flow_usd = (local / rate_matrix[:, [names.index(currency) for currency in used]]).sum(axis=1)
+    flows = flow_usd[:, None] * rate_matrix[:, [names.index(currency) for currency in reporting]]
+    return pd.DataFrame(flows, columns=columns)
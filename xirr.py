@@ -0,0 +1,363 @@
+"""XIRR for many cash-flow series at once
+
+Every series is a row of a padded (n_series, max_flows) array of amounts and
+year offsets from the series' first flow; padding is zero and does not change
+the net present value. Newton's method runs on all rows together in
+x = log(1 + rate), where the NPV is a sum of exponentials, with each step
+capped at MAX_STEP so it walks to the root nearest the guess rather than
+jumping between the several roots non-conventional flows can have. Rows it
+cannot settle are finished by bisection on a bracket where the NPV changes
+sign. Rows without a sign change in their cash flows have no XIRR and come
+back as NaN.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+# Rates are searched in (MIN_RATE, MAX_RATE); -100% itself is a pole of the NPV
+MIN_RATE = -0.9999
+MAX_RATE = 1e6
+
+# Largest Newton step in log(1 + rate)
+MAX_STEP = 0.5
+
+# Largest steps in a row after which windowed_xirr hands a row to bisection:
+# Newton is heading for a rate far off, or for none at all
+RUNAWAY_STEPS = 8
+
+# Highest rate a warm start begins from; above it the NPV is too flat to steer by
+MAX_STEP_RATE = 10.0
+
+DAYS_PER_YEAR = 365.0
+
+
+def pad_cash_flows(codes, years, amounts, n_series=None):
+    """Scatter flat flows into padded arrays by series code (0..n_series-1)
+
+    Returns (amounts, years) of shape (n_series, max_flows); each row's year
+    offsets are relative to that series' earliest flow.
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    years = np.asarray(years, dtype=float)
+    amounts = np.asarray(amounts, dtype=float)
+    if n_series is None:
+        n_series = int(codes.max()) + 1 if len(codes) else 0
+
+    order = np.argsort(codes, kind='stable')
+    codes, years, amounts = codes[order], years[order], amounts[order]
+    counts = np.bincount(codes, minlength=n_series)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    slots = np.arange(len(codes)) - starts[codes]
+
+    width = int(counts.max()) if len(codes) else 0
+    padded_amounts = np.zeros((n_series, width))
+    padded_years = np.zeros((n_series, width))
+    padded_amounts[codes, slots] = amounts
+    padded_years[codes, slots] = years
+
+    first = np.full(n_series, np.inf)
+    np.minimum.at(first, codes, years)
+    first[~np.isfinite(first)] = 0.0
+    padded_years -= first[:, None]
+    padded_years[padded_amounts == 0] = 0.0
+    return padded_amounts, padded_years
+
+
+def xnpv(rates, amounts, years):
+    """Net present value of each row at its rate"""
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        return (amounts * (1.0 + rates[:, None]) ** -years).sum(axis=1)
+
+
+def _npv_and_slope(x, amounts, years):
+    """NPV and its derivative with respect to x = log(1 + rate)"""
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        discounted = amounts * np.exp(-years * x[:, None])
+        npv = discounted.sum(axis=1)
+        slope = -(years * discounted).sum(axis=1)
+    return npv, slope
+
+
+def solve_xirr(amounts, years, guess=0.1, tol=1e-10, max_iter=50, bisect_iter=200, runaway_steps=None):
+    """XIRR of every row of padded ``amounts``/``years`` arrays; NaN where undefined
+
+    ``guess`` is one starting rate for every row or an array with one per row.
+    With ``runaway_steps``, a row whose Newton steps are capped that many
+    times in a row is left to bisection, which may find another root.
+    """
+    amounts = np.asarray(amounts, dtype=float)
+    years = np.asarray(years, dtype=float)
+    n_series = amounts.shape[0]
+    rates = np.full(n_series, np.nan)
+    if n_series == 0:
+        return rates
+
+    # IRR is scale invariant; normalise so the tolerance means the same for every row
+    scale = np.abs(amounts).max(axis=1)
+    solvable = ((amounts > 0).any(axis=1) & (amounts < 0).any(axis=1)) & (scale > 0)
+    amounts = amounts[solvable] / scale[solvable, None]
+    years = years[solvable]
+
+    x_min, x_max = math.log1p(MIN_RATE), math.log1p(MAX_RATE)
+    x = np.log1p(np.broadcast_to(np.asarray(guess, dtype=float), (n_series,))[solvable])
+    active = np.ones(len(amounts), dtype=bool)
+    converged = np.zeros(len(amounts), dtype=bool)
+    runaway = np.zeros(len(amounts), dtype=np.int64)
+    # Rows iterated on and their flows, gathered again only once half of them are done
+    index = np.arange(len(amounts))
+    work_amounts, work_years = amounts, years
+    for _ in range(max_iter):
+        live = active[index]
+        if not live.any():
+            break
+        if 2 * live.sum() <= len(index):
+            index, work_amounts, work_years = index[live], work_amounts[live], work_years[live]
+            live = live[live]
+        npv, slope = _npv_and_slope(x[index], work_amounts, work_years)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            step = np.clip(npv / slope, -MAX_STEP, MAX_STEP)
+        new_x = x[index] - step
+
+        bad = ~np.isfinite(new_x) | (new_x <= x_min) | (new_x >= x_max)
+        if runaway_steps:
+            runaway[index] = np.where(np.abs(step) == MAX_STEP, runaway[index] + 1, 0)
+            bad |= runaway[index] >= runaway_steps
+        # Judge convergence by the step: at very high rates every discounted flow,
+        # and so the NPV, is near zero without being a root
+        done = ~bad & (np.abs(step) < tol)
+        x[index[live & ~bad]] = new_x[live & ~bad]
+        converged[index[live & done]] = True
+        active[index[live & (bad | done)]] = False
+
+    rate = np.expm1(x)
+    pending = ~converged
+    if pending.any():
+        rate[pending] = _bisect(amounts[pending], years[pending], tol, bisect_iter)
+
+    rates[solvable] = rate
+    return rates
+
+
+def _bisect(amounts, years, tol, max_iter):
+    """Bisection on [MIN_RATE, hi], widening hi until the NPV changes sign"""
+    n_series = len(amounts)
+    lo = np.full(n_series, MIN_RATE)
+    hi = np.ones(n_series)
+    f_lo = xnpv(lo, amounts, years)
+    f_hi = xnpv(hi, amounts, years)
+
+    # Widen the upper end where there is no sign change yet
+    while True:
+        widen = (np.sign(f_lo) == np.sign(f_hi)) & (hi < MAX_RATE)
+        if not widen.any():
+            break
+        hi[widen] *= 10.0
+        f_hi[widen] = xnpv(hi[widen], amounts[widen], years[widen])
+
+    bracketed = (np.sign(f_lo) != np.sign(f_hi)) & np.isfinite(f_lo) & np.isfinite(f_hi)
+    for _ in range(max_iter):
+        mid = (lo + hi) / 2.0
+        f_mid = xnpv(mid, amounts, years)
+        left = np.sign(f_mid) == np.sign(f_lo)
+        lo = np.where(left, mid, lo)
+        f_lo = np.where(left, f_mid, f_lo)
+        hi = np.where(left, hi, mid)
+        if np.all((hi - lo)[bracketed] < tol):
+            break
+
+    return np.where(bracketed, (lo + hi) / 2.0, np.nan)
+
+
+def windowed_xirr(codes, days, amounts, dates, values, starts=None, stride=10, guess=0.1, warm=False,
+                  max_cells=2_000_000, ends=None):
+    """XIRR of each series over a window ending on each of ``dates``; a dates x series array
+
+    ``codes``, ``days`` and ``amounts`` are the series' cash flows: series
+    code (0..n_series-1), integer day number and amount received (buys
+    negative). ``dates`` are day numbers too, and ``values`` (dates x
+    series) is what each series holds at the close of each date, counted as
+    received on the window's last date. ``starts`` gives, per date, the
+    index of the date its window opens on: the value held at that close is
+    counted as paid in, and only flows after that date count. -1 marks a
+    window opening before the first date, which gets no XIRR. Without
+    ``starts`` every window runs from the series' first flow (since
+    inception). With ``ends`` (indices into ``dates``) only the windows
+    ending on those dates are solved; the other rows are NaN.
+
+    By default every window starts Newton from ``guess``. With ``warm`` every
+    ``stride``-th date is solved first and each remaining window starts from
+    the rate of the nearest solved date for its series. Solving every window
+    together already makes the extra Newton steps cheap, so this rarely
+    pays: in bench_xirr_history it is slightly faster only for long
+    since-inception histories and slower for short windows. Where a
+    window's flows have several rates, a warm start may settle on a
+    different root than a cold one.
+    """
+    dates = np.asarray(dates, dtype=np.int64)
+    values = np.asarray(values, dtype=float)
+    n_dates, n_series = values.shape
+    rates = np.full((n_dates, n_series), np.nan)
+    if not n_dates or not n_series:
+        return rates
+
+    # Flows sorted by series then day; one key finds any series' flows up to a day
+    codes = np.asarray(codes, dtype=np.int64)
+    days = np.asarray(days, dtype=np.int64)
+    amounts = np.asarray(amounts, dtype=float)
+    base = min(days.min(), dates.min()) - 1 if len(days) else dates.min() - 1
+    span = max(days.max() if len(days) else 0, dates.max()) - base + 1
+    order = np.lexsort((days, codes))
+    keys = codes[order] * span + (days[order] - base)
+    # Flows of one series on the same day discount alike: one flow per series and day
+    first = np.flatnonzero(np.diff(keys, prepend=-1)) if len(keys) else np.zeros(0, dtype=np.int64)
+    amounts = np.add.reduceat(amounts[order], first) if len(keys) else amounts
+    keys = keys[first]
+    days = keys % span + base
+
+    def solve(ends, guesses):
+        """Rates of every series' window ending on each of ``ends``, from ``guesses`` (ends x series)"""
+        end = np.repeat(ends, n_series)
+        series = np.tile(np.arange(n_series), len(ends))
+        if starts is None:
+            lo = np.searchsorted(keys, series * span, side='left')
+            opening, start_day, valid = np.zeros(len(end)), None, np.ones(len(end), dtype=bool)
+        else:
+            start = np.asarray(starts)[end]
+            valid = start >= 0
+            start_day = dates[np.maximum(start, 0)]
+            lo = np.searchsorted(keys, series * span + (start_day - base), side='right')
+            opening = np.where(valid, -values[np.maximum(start, 0), series], 0.0)
+        hi = np.searchsorted(keys, series * span + (dates[end] - base), side='right')
+        counts = hi - lo
+        guesses = np.clip(np.where(np.isfinite(guesses), guesses, guess), MIN_RATE / 2, MAX_STEP_RATE).ravel()
+
+        solved = np.full(len(end), np.nan)
+        # Rows are padded to the widest in their chunk: chunk them narrowest first,
+        # each chunk at most twice as wide as its first row and within max_cells
+        by_width = np.argsort(counts, kind='stable')
+        widths = counts[by_width] + 2
+        i = 0
+        while i < len(end):
+            cells = np.arange(1, len(end) - i + 1) * widths[i:]
+            j = min(i + int(np.searchsorted(cells, max_cells, side='right')),
+                    int(np.searchsorted(widths, 2 * widths[i], side='right')))
+            j = max(j, i + 1)
+            rows = by_width[i:j]
+            i = j
+            padded_amounts, padded_years = _window_rows(
+                lo[rows], counts[rows], opening[rows], values[end[rows], series[rows]], days, amounts,
+                dates[end[rows]], None if start_day is None else start_day[rows])
+            solved[rows] = solve_xirr(padded_amounts, padded_years, guess=guesses[rows],
+                                      runaway_steps=RUNAWAY_STEPS)
+        solved[~valid] = np.nan
+        return solved.reshape(len(ends), n_series)
+
+    ends = np.arange(n_dates) if ends is None else np.unique(np.asarray(ends, dtype=np.int64))
+    if not len(ends):
+        return rates
+    if not warm:
+        rates[ends] = solve(ends, np.full((len(ends), n_series), guess))
+        return rates
+
+    anchors = np.unique(np.append(ends[::stride], ends[-1]))
+    rates[anchors] = solve(anchors, np.full((len(anchors), n_series), guess))
+    others = np.setdiff1d(ends, anchors)
+    if len(others):
+        # Nearest anchor at or after each date, or the one before when that is closer
+        after = np.searchsorted(anchors, others)
+        before = np.maximum(after - 1, 0)
+        nearest = np.where(others - anchors[before] <= anchors[after] - others, anchors[before], anchors[after])
+        rates[others] = solve(others, rates[nearest])
+        # A warm start can miss a rate that ``guess`` finds: solve those windows again from it
+        retry = others[(np.isnan(rates[others]) & ~np.isnan(rates[nearest])).any(axis=1)]
+        if len(retry):
+            rates[retry] = np.where(np.isnan(rates[retry]), solve(retry, np.full((len(retry), n_series), guess)),
+                                    rates[retry])
+    return rates
+
+
+def _window_rows(lo, counts, opening, closing, days, amounts, end_day, start_day):
+    """Padded rows of opening value, the flows ``lo[r]:lo[r] + counts[r]`` and closing value"""
+    n_rows = len(lo)
+    width = int(counts.max()) + 2 if n_rows else 2
+    # Year offsets from the window's first day: its opening date, or its first flow
+    if start_day is not None:
+        origin = np.asarray(start_day)
+    elif len(days):
+        origin = np.where(counts > 0, days[np.minimum(lo, len(days) - 1)], end_day)
+    else:
+        origin = np.asarray(end_day)
+
+    # Ragged gather: every flow of every row in one masked assignment
+    filled = np.arange(width - 2) < counts[:, None]
+    flow = (lo[:, None] + np.arange(width - 2))[filled]
+    padded_amounts = np.zeros((n_rows, width))
+    padded_years = np.zeros((n_rows, width))
+    padded_amounts[:, 1:-1][filled] = amounts[flow]
+    padded_years[:, 1:-1][filled] = (days[flow] - np.repeat(origin, counts)) / DAYS_PER_YEAR
+    padded_amounts[:, 0] = opening
+    padded_amounts[:, -1] = closing
+    padded_years[:, -1] = (end_day - origin) / DAYS_PER_YEAR
+    padded_years[padded_amounts == 0] = 0.0
+    return padded_amounts, padded_years
+
+
+def group_xirr(keys, dates, amounts):
+    """XIRR per key for flat flows (key, date, amount); returns a Series indexed by key"""
+    codes, uniques = pd.factorize(pd.Series(keys), sort=True)
+    days = pd.to_datetime(pd.Series(dates)).to_numpy('datetime64[ns]').astype('int64') / 86400e9
+    padded_amounts, padded_years = pad_cash_flows(codes, days / DAYS_PER_YEAR, amounts, len(uniques))
+    return pd.Series(solve_xirr(padded_amounts, padded_years), index=uniques)
+
+
+def xirr_scalar(years, amounts, guess=0.1, tol=1e-10, max_iter=50, bisect_iter=200):
+    """Reference XIRR for one series in plain Python (Newton, then bisection)"""
+    years = [t - min(years) for t in years]
+    if not (any(a > 0 for a in amounts) and any(a < 0 for a in amounts)):
+        return math.nan
+    scale = max(abs(a) for a in amounts)
+    amounts = [a / scale for a in amounts]
+
+    def npv(rate):
+        try:
+            return sum(a * (1.0 + rate) ** -t for a, t in zip(amounts, years))
+        except OverflowError:
+            return math.nan
+
+    # Newton in x = log(1 + rate) with capped steps, as in solve_xirr
+    x = math.log1p(guess)
+    for _ in range(max_iter):
+        try:
+            discounted = [a * math.exp(-t * x) for a, t in zip(amounts, years)]
+        except OverflowError:
+            break
+        value = sum(discounted)
+        slope = -sum(t * d for t, d in zip(years, discounted))
+        if slope == 0 or math.isnan(value):
+            break
+        step = max(-MAX_STEP, min(MAX_STEP, value / slope))
+        new_x = x - step
+        if not math.isfinite(new_x) or new_x <= math.log1p(MIN_RATE) or new_x >= math.log1p(MAX_RATE):
+            break
+        x = new_x
+        if abs(step) < tol:
+            return math.expm1(x)
+
+    lo, hi = MIN_RATE, 1.0
+    f_lo, f_hi = npv(lo), npv(hi)
+    while (f_lo > 0) == (f_hi > 0) and hi < MAX_RATE:
+        hi *= 10.0
+        f_hi = npv(hi)
+    if (f_lo > 0) == (f_hi > 0) or math.isnan(f_lo) or math.isnan(f_hi):
+        return math.nan
+    for _ in range(bisect_iter):
+        mid = (lo + hi) / 2.0
+        f_mid = npv(mid)
+        if (f_mid > 0) == (f_lo > 0):
+            lo, f_lo = mid, f_mid
+        else:
+            hi = mid
+        if hi - lo < tol:
+            break
+    return (lo + hi) / 2.0